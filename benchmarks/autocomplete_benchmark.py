@@ -0,0 +1,53 @@
+"""Measures prefix suggestion latency on a synthetic catalogue.
+
+Run from the project root:
+    python -m benchmarks.autocomplete_benchmark [number_of_podcasts]
+"""
+import random
+import sys
+import time
+
+from benchmarks.search_benchmark import make_catalogue
+from podcast.adapters.autocomplete import PrefixIndex
+
+
+def percentile(timings, fraction: float) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def main(size: int, lookups: int = 20_000):
+    podcasts = make_catalogue(size)
+
+    start = time.perf_counter()
+    index = PrefixIndex()
+    for podcast in podcasts:
+        index.add(podcast)
+    for field in ('title', 'author', 'category'):
+        # The sorted arrays are built on the first lookup.
+        index.suggest('a', field)
+    print(f'{size} podcasts, index built in {time.perf_counter() - start:.2f} s')
+
+    # Prefixes of one to six characters taken from real titles and author names, like a user typing.
+    random.seed(8)
+    prefixes = []
+    for _ in range(lookups):
+        podcast = random.choice(podcasts)
+        if random.random() < 0.8:
+            prefixes.append((podcast.title[:random.randint(1, 6)], 'title'))
+        else:
+            prefixes.append((podcast.author.name[:random.randint(1, 6)], 'author'))
+
+    timings = []
+    for prefix, field in prefixes:
+        start = time.perf_counter()
+        suggestions = index.suggest(prefix, field, 8)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert len(suggestions) > 0, prefix
+
+    print(f'{lookups} lookups: p50 {percentile(timings, 0.5):.3f} ms, p99 {percentile(timings, 0.99):.3f} ms, '
+          f'max {max(timings):.3f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
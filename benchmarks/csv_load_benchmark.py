@@ -0,0 +1,50 @@
+"""Measures the time and memory it takes CSVDataReader to load podcasts/adapters/data.
+
+Reports the best of several load times, the memory the loaded reader holds as traced by tracemalloc, and how
+many distinct Author, language string and upload datetime objects the Podcasts and Episodes point at. Run it on
+an older checkout to compare.
+
+Run from the project root:
+    python -m benchmarks.csv_load_benchmark [repeats]
+"""
+import sys
+import time
+import tracemalloc
+
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+
+
+def load():
+    reader = CSVDataReader()
+    reader.load_podcasts()
+    reader.load_episodes()
+    return reader
+
+
+def distinct_objects(values) -> int:
+    return len({id(value) for value in values})
+
+
+def main(repeats: int):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    reader = load()
+    held_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    podcasts = list(reader.podcasts.values())
+    print(f'{len(podcasts)} podcasts, {len(reader.episodes)} episodes')
+    print(f'load time   {min(seconds) * 1000:8.1f} ms (best of {repeats})')
+    print(f'held        {held_bytes / 1024 / 1024:8.2f} MB (peak {peak_bytes / 1024 / 1024:.2f} MB)')
+    print(f'authors     {distinct_objects(podcast.author for podcast in podcasts):8}')
+    print(f'languages   {distinct_objects(podcast.language for podcast in podcasts):8}')
+    print(f'upload dates{distinct_objects(episode.upload_date for episode in reader.episodes):8}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
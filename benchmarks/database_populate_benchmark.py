@@ -0,0 +1,84 @@
+"""Compares populating a SQLite database from podcasts/adapters/data one object at a time with bulk_load.
+
+Both passes read the CSV files the same way populate does with database_mode=True. The first then adds every
+podcast, episode, author and category through the repository's add methods, each merged and committed on its
+own, as populate did before bulk_load; the second hands them all to SqlAlchemyRepository.bulk_load. Both
+databases are files in a temporary directory with the full-text search table enabled beforehand, as create_app
+does. The tables are compared afterwards.
+
+Run from the project root:
+    python -m benchmarks.database_populate_benchmark
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from podcast.adapters.database_repository import SqlAlchemyRepository
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.orm import mapper_registry, map_model_to_tables
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+TABLES = ['authors', 'podcasts', 'categories', 'podcasts_categories', 'episodes']
+
+
+def new_repository(database_file: Path):
+    clear_mappers()
+    engine = create_engine(f'sqlite:///{database_file}')
+    mapper_registry.metadata.create_all(engine)
+    map_model_to_tables()
+    repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+    repo.enable_full_text_search()
+    return engine, repo
+
+
+def read_catalogue():
+    data_reader = CSVDataReader(DATA_PATH / 'podcasts.csv', DATA_PATH / 'episodes.csv')
+    data_reader.load_podcasts(True)
+    data_reader.load_episodes()
+    return data_reader
+
+
+def one_at_a_time(repo, data_reader):
+    for podcast in data_reader.podcasts.values():
+        repo.add_podcast(podcast)
+    for episode in data_reader.episodes:
+        repo.add_episode(episode)
+    for author in data_reader.author_objects.values():
+        repo.add_author(author)
+    for category in data_reader.categories.values():
+        repo.add_category(category)
+
+
+def bulk(repo, data_reader):
+    repo.bulk_load(data_reader.author_objects.values(), data_reader.podcasts.values(),
+                   data_reader.categories.values(), data_reader.episodes)
+
+
+def table_contents(engine):
+    with engine.connect() as connection:
+        return {table: connection.exec_driver_sql(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+                for table in TABLES}
+
+
+def main():
+    contents = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, load in [('one at a time', one_at_a_time), ('bulk_load', bulk)]:
+            engine, repo = new_repository(Path(directory) / f'{load.__name__}.db')
+            data_reader = read_catalogue()
+            start = time.perf_counter()
+            load(repo, data_reader)
+            seconds = time.perf_counter() - start
+            contents.append(table_contents(engine))
+            rows = sum(len(table_rows) for table_rows in contents[-1].values())
+            print(f'{name:<15}{seconds:>8.2f} s  {rows} rows')
+            engine.dispose()
+    assert contents[0] == contents[1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Compares syncing a database with edited CSV files against wiping it and populating it again.
+
+Populates a SQLite file in a temporary directory from copies of podcasts/adapters/data and stores the row
+hashes, as create_app does. Then edits the copies: changes, deletes and adds a few podcasts, and many more
+episodes. Then times sync_from_csv against deleting every table and populating again. Both databases must end
+up with the same podcasts and episodes.
+
+Run from the project root:
+    python -m benchmarks.database_sync_benchmark [edited podcasts] [edited episodes]
+"""
+import csv
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from podcast.adapters.database_repository import SqlAlchemyRepository
+from podcast.adapters.database_sync import csv_row_hashes_table
+from podcast.adapters.orm import mapper_registry, map_model_to_tables
+from podcast.adapters.repo_populate import populate
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+
+
+def new_repository(database_file: Path, data_path: Path):
+    clear_mappers()
+    engine = create_engine(f'sqlite:///{database_file}')
+    mapper_registry.metadata.create_all(engine)
+    map_model_to_tables()
+    repo = SqlAlchemyRepository(sessionmaker(autocommit=False, autoflush=True, bind=engine))
+    repo.enable_full_text_search()
+    populate(data_path, repo, True)
+    repo.sync_from_csv(data_path, existing_rows_current=True)
+    return engine, repo
+
+
+def edit_file(path: Path, edits: int, title_column: int):
+    """ Changes the titles of edits rows, deletes edits more and adds edits copies with new ids. """
+    with open(path, encoding='utf-8-sig', newline='') as csv_file:
+        header, *rows = list(csv.reader(csv_file))
+    step = max(len(rows) // (2 * edits), 1)
+    for row in rows[:2 * edits * step:2 * step]:
+        row[title_column] += ' (edited)'
+    next_id = max(int(row[0]) for row in rows) + 1
+    added = [[str(next_id + number)] + row[1:] for number, row in enumerate(rows[:edits])]
+    rows = [row for index, row in enumerate(rows) if index % (2 * step) != step or index >= 2 * edits * step]
+    with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv.writer(csv_file).writerows([header] + rows + added)
+
+
+def catalogue(engine):
+    with engine.connect() as connection:
+        return [connection.exec_driver_sql(f'SELECT * FROM {table} ORDER BY id').fetchall()
+                for table in ('podcasts', 'episodes')]
+
+
+def main(podcast_edits: int, episode_edits: int):
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = Path(directory) / 'data'
+        shutil.copytree(DATA_PATH, data_path)
+        sync_engine, sync_repo = new_repository(Path(directory) / 'sync.db', data_path)
+        edit_file(data_path / 'podcasts.csv', podcast_edits, 1)
+        edit_file(data_path / 'episodes.csv', episode_edits, 2)
+
+        start = time.perf_counter()
+        report = sync_repo.sync_from_csv(data_path)
+        sync_seconds = time.perf_counter() - start
+        for source in ('podcasts', 'episodes'):
+            counts = report[source]
+            print(f'{source:<10}{counts["inserted"]:>5} inserted{counts["changed"]:>5} changed'
+                  f'{counts["deleted"]:>5} deleted{counts["unchanged"]:>6} unchanged'
+                  f'{report["seconds"][source]:>8.3f} s')
+        print(f'diff {report["seconds"]["diff"]:.3f} s, sync {sync_seconds:.2f} s in all')
+
+        reload_engine, reload_repo = new_repository(Path(directory) / 'reload.db', DATA_PATH)
+        start = time.perf_counter()
+        with reload_engine.begin() as connection:
+            for table in reversed(mapper_registry.metadata.sorted_tables):
+                connection.execute(table.delete())
+        csv_row_hashes_table.drop(reload_engine, checkfirst=True)
+        populate(data_path, reload_repo, True)
+        reload_repo.sync_from_csv(data_path, existing_rows_current=True)
+        print(f'wipe and populate {time.perf_counter() - start:.2f} s')
+
+        assert catalogue(sync_engine)[1] == catalogue(reload_engine)[1]
+        # Authors are numbered differently, so podcasts are compared without them.
+        assert [row[:1] + row[2:] for row in catalogue(sync_engine)[0]] == \
+            [row[:1] + row[2:] for row in catalogue(reload_engine)[0]]
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
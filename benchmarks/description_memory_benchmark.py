@@ -0,0 +1,55 @@
+"""Measures how much memory Episode descriptions take in a memory repository loaded with the full dataset.
+
+Reports the resident set size after loading, and the bytes held by the sanitised descriptions and their
+snippets compared with the raw description HTML in episodes.csv. Run it on an older checkout to compare resident
+sizes across versions.
+
+Run from the project root (Linux only, as it reads /proc):
+    python -m benchmarks.description_memory_benchmark
+"""
+import gc
+import sys
+import time
+
+from podcast.adapters.datareader.csvdatareader import read_csv_file
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repo_populate import populate
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+
+
+def resident_megabytes() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def string_megabytes(strings) -> float:
+    return sum(sys.getsizeof(string) for string in strings) / 1024 / 1024
+
+
+def main():
+    before = resident_megabytes()
+    start = time.perf_counter()
+    repo = MemoryRepository()
+    populate(DATA_PATH, repo)
+    load_seconds = time.perf_counter() - start
+    gc.collect()
+    after = resident_megabytes()
+
+    episodes = repo.get_episodes_by_id(range(1, repo.get_number_of_episodes() + 1))
+    raw = [row[5] for row in read_csv_file(str(DATA_PATH / 'episodes.csv'))]
+    print(f'{len(episodes)} episodes loaded in {load_seconds:.2f} s, '
+          f'resident size {after:.1f} MB ({after - before:.1f} MB for the repository)')
+    print(f'raw description HTML   {string_megabytes(raw):6.2f} MB')
+    print(f'sanitised descriptions {string_megabytes(episode.description for episode in episodes):6.2f} MB')
+    # Short descriptions share one string with their snippet, which is only counted once.
+    snippets = [episode.snippet for episode in episodes if episode.snippet is not episode.description]
+    print(f'separate snippets      {string_megabytes(snippets):6.2f} MB ({len(snippets)} episodes)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Measures the episode search index on the episodes in podcast/adapters/data.
+
+Reports how long stripping and indexing takes, how much memory the index holds (traced with tracemalloc,
+so build time is reported from a separate untraced run), and query latency compared with a scan that
+searches the raw description HTML.
+
+Run from the project root:
+    python -m benchmarks.episode_search_benchmark
+"""
+import time
+import tracemalloc
+
+from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.adapters.episode_search import EpisodeSearchIndex, terms
+
+QUERIES = ['moviepass', 'god', 'jesus christ', 'football season', 'the', 'interview with the author']
+
+
+def build_index(episodes) -> EpisodeSearchIndex:
+    index = EpisodeSearchIndex()
+    for episode in episodes:
+        index.add(episode)
+    return index
+
+
+def scan_search(query: str, episodes):
+    # Checks every word against the raw title and HTML, as a search without the index would.
+    query_terms = terms(query)
+    return [episode.id for episode in episodes
+            if all(term in episode.title.lower() or term in episode.description.lower() for term in query_terms)]
+
+
+def time_call(function, repeat: int = 20) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    reader = CSVDataReader()
+    reader.load_podcasts()
+    reader.load_episodes()
+    episodes = reader.episodes
+    raw_bytes = sum(len(episode.description.encode()) for episode in episodes)
+
+    start = time.perf_counter()
+    index = build_index(episodes)
+    build_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    traced_index = build_index(episodes)
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stats = traced_index.stats()
+    print(f'{stats["episodes"]} episodes, {raw_bytes / 1024 / 1024:.1f} MB of description HTML')
+    print(f'index built in {build_seconds:.2f} s, {stats["terms"]} terms, {stats["postings"]} postings '
+          f'({stats["postings_bytes"] / 1024:.0f} KB of arrays), {index_bytes / 1024 / 1024:.1f} MB traced')
+
+    print(f'{"query":<28}{"hits":>7}{"scan ms":>10}{"index ms":>10}')
+    for query in QUERIES:
+        _, hits = index.search(query, 15)
+        scan_ms = time_call(lambda: scan_search(query, episodes), repeat=3)
+        index_ms = time_call(lambda: index.search(query, 15))
+        print(f'{query!r:<28}{hits:>7}{scan_ms:>10.2f}{index_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
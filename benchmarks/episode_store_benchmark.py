@@ -0,0 +1,97 @@
+"""Compares ColumnarEpisodeStore with keeping Episode objects in a dict, on synthetic episodes.
+
+Reports the memory each holds, as traced by tracemalloc, and the time taken by range scans by podcast, by
+upload date and by length, plus the time to read Episodes back out of the store.
+
+Run from the project root:
+    python -m benchmarks.episode_store_benchmark [number_of_episodes]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from podcast.adapters.episode_store import ColumnarEpisodeStore, to_microseconds
+from podcast.domainmodel.model import Author, Episode, Podcast
+
+NUMBER_OF_PODCASTS = 1000
+FIRST_UPLOAD = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+def make_episodes(size: int, podcasts: dict):
+    random.seed(235)
+    for episode_id in range(1, size + 1):
+        podcast = podcasts[random.randint(1, NUMBER_OF_PODCASTS)]
+        yield Episode(episode_id, podcast, f'Episode {episode_id} of {podcast.title}',
+                      f'https://cdn.example.com/{podcast.id}/{episode_id}.mp3', random.randint(60, 7200),
+                      f'Notes for episode {episode_id}.', FIRST_UPLOAD + timedelta(seconds=random.randint(0, 10 ** 8)))
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    held_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held_bytes, seconds
+
+
+def timed(scan, repeats: int = 3):
+    best, result = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = scan()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, len(result)
+
+
+def main(size: int):
+    author = Author(1, 'Benchmark')
+    podcasts = {podcast_id: Podcast(podcast_id, author, f'Podcast {podcast_id}')
+                for podcast_id in range(1, NUMBER_OF_PODCASTS + 1)}
+    print(f'{size} episodes over {NUMBER_OF_PODCASTS} podcasts')
+
+    def build_store():
+        store = ColumnarEpisodeStore(podcasts.get)
+        for episode in make_episodes(size, podcasts):
+            store.add(episode)
+        return store
+
+    store, store_bytes, store_seconds = traced(build_store)
+    objects, object_bytes, object_seconds = traced(
+        lambda: {episode.id: episode for episode in make_episodes(size, podcasts)})
+    print(f'{"":<10}{"held MB":>10}{"build s":>10}')
+    print(f'{"objects":<10}{object_bytes / 1024 / 1024:>10.1f}{object_seconds:>10.1f}')
+    print(f'{"columnar":<10}{store_bytes / 1024 / 1024:>10.1f}{store_seconds:>10.1f}')
+
+    start, end = FIRST_UPLOAD + timedelta(days=100), FIRST_UPLOAD + timedelta(days=130)
+    start_us, end_us = to_microseconds(start), to_microseconds(end)
+    scans = [
+        ('podcast', lambda: [episode.id for episode in objects.values() if episode.podcast.id == 7],
+         lambda: store.ids_for_podcast(7)),
+        ('date', lambda: [episode.id for episode in objects.values()
+                          if start_us <= to_microseconds(episode.upload_date) < end_us],
+         lambda: store.ids_uploaded_between(start, end)),
+        ('length', lambda: [episode.id for episode in objects.values() if 600 <= episode.length <= 900],
+         lambda: store.ids_with_length_between(600, 900)),
+    ]
+    print(f'{"scan":<10}{"objects ms":>12}{"columnar ms":>12}{"matches":>10}')
+    for name, object_scan, store_scan in scans:
+        object_seconds, matches = timed(object_scan)
+        store_seconds, store_matches = timed(store_scan)
+        assert matches == store_matches
+        print(f'{name:<10}{object_seconds * 1000:>12.1f}{store_seconds * 1000:>12.1f}{matches:>10}')
+
+    episode_ids = random.sample(range(1, size + 1), 1000)
+    start_time = time.perf_counter()
+    store.get_many(episode_ids)
+    print(f'reading 1000 uncached Episodes from the store: {(time.perf_counter() - start_time) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,63 @@
+"""Compares a memory repository loaded with the full dataset with and without lazy_descriptions.
+
+For each way of storing Episodes, reports the time populate takes, the memory the repository holds afterwards as
+traced by tracemalloc, the size of the description file, and the time to read 1000 descriptions of random
+Episodes twice over (the second pass is answered from the Episode cache or the description cache).
+
+Run from the project root:
+    python -m benchmarks.lazy_description_benchmark
+"""
+import gc
+import random
+import time
+import tracemalloc
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repo_populate import populate
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+
+OPTIONS = [
+    ('objects', {}),
+    ('objects, lazy', {'lazy_descriptions': True}),
+    ('columnar', {'columnar_episodes': True}),
+    ('columnar, lazy', {'columnar_episodes': True, 'lazy_descriptions': True}),
+]
+
+
+def load(options: dict):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    repo = MemoryRepository(**options)
+    populate(DATA_PATH, repo)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    held_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return repo, held_bytes, seconds
+
+
+def read_descriptions(repo, episode_ids) -> float:
+    start = time.perf_counter()
+    for episode_id in episode_ids:
+        repo.get_episode(episode_id).description
+    return time.perf_counter() - start
+
+
+def main():
+    print(f'{"":<16}{"load s":>8}{"held MB":>9}{"file MB":>9}{"1st read ms":>13}{"2nd read ms":>13}')
+    for name, options in OPTIONS:
+        repo, held_bytes, seconds = load(options)
+        random.seed(235)
+        episode_ids = random.sample(range(1, repo.get_number_of_episodes() + 1), 1000)
+        first = read_descriptions(repo, episode_ids)
+        second = read_descriptions(repo, episode_ids)
+        file_bytes = repo.get_index_stats().get('descriptions', {}).get('file_bytes', 0)
+        print(f'{name:<16}{seconds:>8.2f}{held_bytes / 1024 / 1024:>9.1f}{file_bytes / 1024 / 1024:>9.2f}'
+              f'{first * 1000:>13.1f}{second * 1000:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measures the size and construction speed of the domain model classes, and the memory a populated
+MemoryRepository holds.
+
+For each class, builds a batch of instances and reports the bytes each one holds (as traced by tracemalloc,
+so including its __dict__ if it has one) and how many can be built per second, the best of five untraced
+runs. Run it on an older checkout to compare.
+
+Run from the project root:
+    python -m benchmarks.model_slots_benchmark [batch_size]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repo_populate import populate
+from podcast.domainmodel.model import Author, Category, Episode, Playlist, Podcast, Review, User
+from path_utils.utils import get_project_root
+
+UPLOADED = datetime(2017, 12, 1, tzinfo=timezone.utc)
+
+
+def factories():
+    author = Author(1, 'Author')
+    podcast = Podcast(1, author, 'Podcast')
+    user = User(1, 'listener', 'password1')
+    episode = Episode(1, podcast, 'Episode')
+    return [
+        ('Author', lambda index: Author(index, 'Author name')),
+        ('Podcast', lambda index: Podcast(index, author, 'Podcast title', 'image.jpg', 'About', 'site', 1, 'English')),
+        ('Category', lambda index: Category(index, 'Comedy')),
+        ('User', lambda index: User(index, 'listener', 'password1')),
+        ('Episode', lambda index: Episode(index, podcast, 'Episode title', 'audio.mp3', 60, 'Notes', UPLOADED)),
+        ('Review', lambda index: Review(index, user, 4, 'Good', podcast, episode)),
+        ('Playlist', lambda index: Playlist(index, user, 'Favourites')),
+    ]
+
+
+def main(batch_size: int):
+    print(f'{"":<10}{"bytes each":>12}{"built/s":>12}')
+    for name, factory in factories():
+        seconds = None
+        for _ in range(5):
+            start = time.perf_counter()
+            [factory(index) for index in range(batch_size)]
+            elapsed = time.perf_counter() - start
+            seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+        gc.collect()
+        tracemalloc.start()
+        instances = [factory(index) for index in range(batch_size)]
+        held_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Leave out the list holding the instances.
+        held_bytes -= sys.getsizeof(instances)
+        print(f'{name:<10}{held_bytes / batch_size:>12.0f}{batch_size / seconds:>12.0f}')
+        del instances
+
+    gc.collect()
+    tracemalloc.start()
+    repo = MemoryRepository()
+    populate(get_project_root() / 'podcast' / 'adapters' / 'data', repo)
+    held_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'populated MemoryRepository holds {held_bytes / 1024 / 1024:.1f} MB')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,82 @@
+"""Times parsing a synthetic episodes.csv in one process and in pools of processes, and the timestamp fast path.
+
+Writes a file of number_of_rows episodes with multi-line HTML descriptions to a temporary directory, then
+parses it with episode_records(read_csv_file(...)) as CSVDataReader.load_episodes does with one process, and
+with parse_episodes_in_parallel for each pool size. Every pass must give the same records, which is checked
+through a digest of them rather than by keeping them all. The speed-up depends on the cores available; it is
+printed alongside os.cpu_count().
+
+Run from the project root:
+    python -m benchmarks.parallel_csv_benchmark [number_of_rows] [pool sizes, e.g. 2,4,8]
+"""
+import csv
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from podcast.adapters.datareader.csvdatareader import episode_records, parse_episodes_in_parallel, read_csv_file, \
+    to_strptime
+
+
+def write_episodes(path: Path, number_of_rows: int):
+    random.seed(235)
+    with open(path, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(['id', 'podcast_id', 'title', 'audio', 'audio_length', 'description', 'pub_date'])
+        for episode_id in range(1, number_of_rows + 1):
+            description = (f'<p>Episode {episode_id}: we talk about "podcasts" &amp; more.</p>\n'
+                           f'<p>Notes:<br>\n<a href="https://example.com/{episode_id}">show notes</a></p>')
+            writer.writerow([episode_id, random.randint(1, 1000), f'Episode {episode_id}',
+                             f'https://cdn.example.com/{episode_id}.mp3', random.randint(60, 7200), description,
+                             f'20{random.randint(10, 19)}-{random.randint(1, 12):02}-{random.randint(1, 28):02} '
+                             f'{random.randint(0, 23):02}:{random.randint(0, 59):02}:{random.randint(0, 59):02}+00'])
+
+
+def digest_of(records) -> tuple:
+    digest = hashlib.sha256()
+    count = 0
+    for record in records:
+        digest.update(repr(record).encode('utf-8'))
+        count += 1
+    return count, digest.hexdigest()
+
+
+def main(number_of_rows: int, pool_sizes):
+    with tempfile.TemporaryDirectory() as directory:
+        episodes_file = str(Path(directory) / 'episodes.csv')
+        write_episodes(Path(episodes_file), number_of_rows)
+        print(f'{number_of_rows} rows, {os.path.getsize(episodes_file) / 1024 / 1024:.0f} MB, '
+              f'{os.cpu_count()} CPUs')
+
+        start = time.perf_counter()
+        expected = digest_of(episode_records(read_csv_file(episodes_file)))
+        one_process = time.perf_counter() - start
+        print(f'{"processes":<10}{"seconds":>9}{"speed-up":>10}')
+        print(f'{1:<10}{one_process:>9.1f}{1:>10.2f}')
+        for processes in pool_sizes:
+            start = time.perf_counter()
+            result = digest_of(parse_episodes_in_parallel(episodes_file, processes))
+            seconds = time.perf_counter() - start
+            assert result == expected
+            print(f'{processes:<10}{seconds:>9.1f}{one_process / seconds:>10.2f}')
+
+        dates = [row[6] for _, row in zip(range(100_000), read_csv_file(episodes_file))]
+    start = time.perf_counter()
+    for date_string in dates:
+        datetime.strptime(date_string + '00', '%Y-%m-%d %H:%M:%S%z')
+    strptime_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for date_string in dates:
+        to_strptime(date_string)
+    fast_seconds = time.perf_counter() - start
+    print(f'{len(dates)} timestamps: strptime {strptime_seconds * 1000:.0f} ms, to_strptime {fast_seconds * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         [int(size) for size in sys.argv[2].split(',')] if len(sys.argv) > 2 else [2, 4])
@@ -0,0 +1,82 @@
+"""Compares the trigram search index with the original full scan on a synthetic catalogue.
+
+Run from the project root:
+    python -m benchmarks.search_benchmark [number_of_podcasts]
+"""
+import random
+import sys
+import time
+
+from podcast.adapters.search_index import PodcastSearchIndex
+from podcast.domainmodel.model import Author, Podcast, Category
+
+WORDS = ['radio', 'show', 'daily', 'news', 'podcast', 'comedy', 'hour', 'sports', 'talk', 'church', 'music',
+         'history', 'science', 'network', 'weekly', 'stories', 'culture', 'tech', 'health', 'business', 'crime',
+         'politics', 'film', 'games', 'kids', 'family', 'faith', 'money', 'life', 'world', 'orange', 'mandarin']
+CATEGORIES = ['Comedy', 'News & Politics', 'Society & Culture', 'Sports & Recreation', 'Religion & Spirituality',
+              'Technology', 'Arts', 'Business', 'Health', 'Education', 'Music', 'TV & Film', 'Kids & Family']
+QUERIES = [('cast', 'title'), ('radio net', 'title'), ('mandarin orange', 'title'), ('xyz', 'title'),
+           ('smith', 'author'), ('culture', 'category'), ('a', 'title')]
+
+
+def make_catalogue(size: int):
+    random.seed(235)
+    categories = [Category(index + 1, name) for index, name in enumerate(CATEGORIES)]
+    authors = [Author(index + 1, f'{random.choice(WORDS).title()} {random.choice(["Smith", "Lee", "Ng", "Brown"])} {index}')
+               for index in range(size // 10)]
+    podcasts = []
+    for podcast_id in range(1, size + 1):
+        title = ' '.join(random.choice(WORDS) for _ in range(random.randint(2, 5))).title()
+        podcast = Podcast(podcast_id, random.choice(authors), title)
+        for category in random.sample(categories, random.randint(1, 3)):
+            podcast.add_category(category)
+        podcasts.append(podcast)
+    return sorted(podcasts)
+
+
+def scan_search(query: str, filter_by: str, podcasts):
+    # The matching loop search_podcast used before the index, without building dicts.
+    query_lower = query.lower()
+    matching_ids = []
+    for podcast in podcasts:
+        if filter_by == 'title' and query_lower in podcast.title.lower():
+            matching_ids.append(podcast.id)
+        elif filter_by == 'category':
+            for category in podcast.categories:
+                if query_lower in category.name.lower():
+                    matching_ids.append(podcast.id)
+                    break
+        elif filter_by == 'author' and query_lower in podcast.author.name.lower():
+            matching_ids.append(podcast.id)
+    return matching_ids
+
+
+def time_call(function, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(size: int):
+    podcasts = make_catalogue(size)
+
+    start = time.perf_counter()
+    index = PodcastSearchIndex()
+    for podcast in podcasts:
+        index.add(podcast)
+    print(f'{size} podcasts, index built in {time.perf_counter() - start:.2f} s')
+
+    print(f'{"query":<20}{"field":<10}{"results":>9}{"scan ms":>10}{"index ms":>10}')
+    for query, field in QUERIES:
+        expected = scan_search(query, field, podcasts)
+        assert index.search(query, field) == expected, query
+        scan_ms = time_call(lambda: scan_search(query, field, podcasts))
+        index_ms = time_call(lambda: index.search(query, field))
+        print(f'{query!r:<20}{field:<10}{len(expected):>9}{scan_ms:>10.2f}{index_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,57 @@
+"""Compares populating a memory repository from podcasts/adapters/data with loading it from a snapshot.
+
+For each way of storing Episodes, times populate (which also writes the snapshot, timed separately), then the
+best of several snapshot loads, including hashing the CSV files. Snapshots are written to a temporary directory.
+
+Run from the project root:
+    python -m benchmarks.snapshot_benchmark [repeats]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repo_populate import populate
+from podcast.adapters.snapshot import read_snapshot, snapshot_key, source_hash, write_snapshot
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+
+OPTIONS = [
+    ('objects', {}),
+    ('columnar', {'columnar_episodes': True}),
+    ('lazy descriptions', {'lazy_descriptions': True}),
+]
+
+
+def main(repeats: int):
+    start = time.perf_counter()
+    source_hash(DATA_PATH)
+    print(f'hashing the CSV files: {(time.perf_counter() - start) * 1000:.1f} ms')
+    print(f'{"":<20}{"populate s":>12}{"write s":>9}{"load s":>8}{"snapshot MB":>13}')
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        snapshot_file = Path(snapshot_dir) / 'memory_repository.snapshot'
+        for name, options in OPTIONS:
+            start = time.perf_counter()
+            repo = MemoryRepository(**options)
+            populate(DATA_PATH, repo)
+            populate_seconds = time.perf_counter() - start
+            key = snapshot_key(DATA_PATH, options)
+            start = time.perf_counter()
+            write_snapshot(snapshot_file, key, repo, populate_seconds)
+            write_seconds = time.perf_counter() - start
+
+            load_seconds = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                loaded = read_snapshot(snapshot_file, snapshot_key(DATA_PATH, options))
+                seconds = time.perf_counter() - start
+                load_seconds = seconds if load_seconds is None else min(load_seconds, seconds)
+                assert loaded[0].get_number_of_episodes() == repo.get_number_of_episodes()
+            size = snapshot_file.stat().st_size / 1024 / 1024
+            print(f'{name:<20}{populate_seconds:>12.2f}{write_seconds:>9.2f}{load_seconds:>8.2f}{size:>13.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,92 @@
+"""Compares building the dataset's Podcasts and Episodes with the validating constructors and with the trusted ones.
+
+The rows of podcasts/adapters/data are read once up front. Each pass then builds every Podcast and Episode
+from them: the validating way calls Podcast(...) and Episode(...) as CSVDataReader used to; the trusted way
+checks each row with check_podcast_row or check_episode_row and calls Podcast.trusted and Episode.trusted, as
+CSVDataReader does now.
+Episodes are built twice, with their real descriptions and with empty ones: sanitising the description HTML is
+the same work either way and takes most of the time. Reports the best of several passes, and the time of
+CSVDataReader's loads for comparison with an older checkout.
+
+Run from the project root:
+    python -m benchmarks.trusted_construction_benchmark [repeats]
+"""
+import sys
+import time
+
+from podcast.adapters.datareader.csvdatareader import (
+    CSVDataReader, check_episode_row, check_podcast_row, read_csv_file, to_strptime)
+from podcast.domainmodel.model import Author, Episode, Podcast
+from path_utils.utils import get_project_root
+
+DATA_PATH = get_project_root() / 'podcast' / 'adapters' / 'data'
+
+
+def best_of(repeats: int, build) -> float:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        build()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main(repeats: int):
+    author = Author(1, 'Benchmark')
+    podcast_rows = list(read_csv_file(str(DATA_PATH / 'podcasts.csv')))
+    episode_rows = list(read_csv_file(str(DATA_PATH / 'episodes.csv')))
+    podcast = Podcast(1, author, 'Benchmark')
+    dates = {row[6]: to_strptime(row[6]) for row in episode_rows}
+    plain_rows = [row[:5] + [''] + row[6:] for row in episode_rows]
+
+    def validating_podcasts():
+        podcasts = []
+        for row in podcast_rows:
+            podcasts.append(Podcast(int(row[0]), author, row[1], row[2], row[3], row[6], int(row[8]), row[4]))
+        return podcasts
+
+    def trusted_podcasts():
+        podcasts = []
+        for row in podcast_rows:
+            check_podcast_row(row)
+            podcasts.append(Podcast.trusted(int(row[0]), author, row[1], row[2], row[3], row[6], int(row[8]), row[4]))
+        return podcasts
+
+    def validating_episodes(rows):
+        def build():
+            episodes = []
+            for row in rows:
+                episodes.append(Episode(int(row[0]), podcast, row[2], row[3], int(row[4]), row[5], dates[row[6]]))
+            return episodes
+        return build
+
+    def trusted_episodes(rows):
+        def build():
+            episodes = []
+            for row in rows:
+                check_episode_row(row)
+                episodes.append(Episode.trusted(int(row[0]), podcast, row[2], row[3], int(row[4]), row[5],
+                                                dates[row[6]]))
+            return episodes
+        return build
+
+    passes = [
+        (f'{len(podcast_rows)} Podcasts', validating_podcasts, trusted_podcasts),
+        (f'{len(episode_rows)} Episodes', validating_episodes(episode_rows), trusted_episodes(episode_rows)),
+        ('  without descriptions', validating_episodes(plain_rows), trusted_episodes(plain_rows)),
+    ]
+    print(f'{"":<24}{"validating ms":>15}{"trusted ms":>12}')
+    for name, validating, trusted in passes:
+        print(f'{name:<24}{best_of(repeats, validating) * 1000:>15.1f}{best_of(repeats, trusted) * 1000:>12.1f}')
+
+    def load():
+        reader = CSVDataReader()
+        reader.load_podcasts()
+        reader.load_episodes()
+    print(f'load_podcasts           {best_of(repeats, lambda: CSVDataReader().load_podcasts()) * 1000:>15.1f} ms')
+    print(f'load_podcasts and load_episodes {best_of(repeats, load) * 1000:>7.1f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
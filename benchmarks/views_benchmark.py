@@ -0,0 +1,80 @@
+"""Compares the read-only views built by the services with the plain dicts they replaced.
+
+Builds the view of every Podcast in podcast/adapters/data (with its Episodes and their Reviews) both ways and
+reports the build time, the memory the results hold and the number of allocated blocks they keep alive, as
+traced by tracemalloc. Build times come from separate untraced runs. The last row is the time to serve every
+Podcast again from the view cache in services.podcast_id.
+
+Run from the project root:
+    python -m benchmarks.views_benchmark
+"""
+import time
+import tracemalloc
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repo_populate import populate
+from podcast.podcasts import services
+from path_utils.utils import get_project_root
+
+
+# The dict-building functions as they were before the views, for comparison.
+def review_to_plain_dict(review):
+    return {'review_id': review.id, 'user_name': review.user.username, 'rating': review.user_rating,
+            'content': review.content, 'podcast_id': review.podcast.id, 'episode_id': review.episode.id,
+            'timestamp': review.post_date}
+
+
+def episode_to_plain_dict(episode):
+    return {'id': episode.id, 'podcast_id': episode.podcast.id, 'title': episode.title, 'audio': episode.audio,
+            'description': episode.description, 'upload_date': episode.upload_date,
+            'reviews': [review_to_plain_dict(review) for review in episode.reviews]}
+
+
+def podcast_to_plain_dict(podcast):
+    return {'id': podcast.id, 'author': podcast.author, 'title': podcast.title, 'image': podcast.image,
+            'description': podcast.description, 'website': podcast.website, 'itunes_id': podcast.itunes_id,
+            'language': podcast.language, 'categories': services.categories_to_string(podcast.categories),
+            'episodes': [episode_to_plain_dict(episode) for episode in podcast.episodes]}
+
+
+def build_all(to_view, podcasts):
+    return [to_view(podcast) for podcast in podcasts]
+
+
+def measure(to_view, podcasts):
+    start = time.perf_counter()
+    build_all(to_view, podcasts)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    views = build_all(to_view, podcasts)
+    held_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    blocks = sum(statistic.count for statistic in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del views
+    return seconds, held_bytes, peak_bytes, blocks
+
+
+def main():
+    repo = MemoryRepository()
+    populate(get_project_root() / 'podcast' / 'adapters' / 'data', repo)
+    podcasts = repo.get_list_of_podcasts()
+    print(f'{len(podcasts)} podcasts, {repo.get_number_of_episodes()} episodes')
+
+    print(f'{"":<8}{"build ms":>10}{"held MB":>10}{"peak MB":>10}{"blocks":>10}')
+    for name, to_view in [('dicts', podcast_to_plain_dict), ('views', services.podcast_to_dict)]:
+        seconds, held_bytes, peak_bytes, blocks = measure(to_view, podcasts)
+        print(f'{name:<8}{seconds * 1000:>10.1f}{held_bytes / 1024 / 1024:>10.2f}'
+              f'{peak_bytes / 1024 / 1024:>10.2f}{blocks:>10}')
+
+    # Views can be shared, so podcast_id builds each one once and serves it until the Podcast changes.
+    for podcast in podcasts:
+        services.podcast_id(podcast.id, repo)
+    start = time.perf_counter()
+    for podcast in podcasts:
+        services.podcast_id(podcast.id, repo)
+    print(f'{"cached":<8}{(time.perf_counter() - start) * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -18,10 +18,31 @@ class Config:
 
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Keep the memory repository's Episodes in arrays, building Episode objects only when they are read.
+    COLUMNAR_EPISODES = environ.get('COLUMNAR_EPISODES', 'False').lower().strip() == 'true'
+
+    # Keep the memory repository's Episode descriptions in a temporary file, reading them back when shown.
+    LAZY_DESCRIPTIONS = environ.get('LAZY_DESCRIPTIONS', 'False').lower().strip() == 'true'
+
+    # Where the memory repository keeps a snapshot of itself to start from; empty to always populate from CSV.
+    SNAPSHOT_DIR = environ.get('SNAPSHOT_DIR', '')
+
+    # Number of processes that parse episodes.csv when a repository is populated.
+    INGEST_PROCESSES = int(environ.get('INGEST_PROCESSES', 1))
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
+    # Apply changes to the csv files to an existing database at startup, instead of leaving it as it is.
+    DATABASE_SYNC = environ.get('DATABASE_SYNC', 'False').lower().strip() == 'true'
+
     echo_string = environ.get('SQLALCHEMY_ECHO')
     SQLALCHEMY_ECHO = False
     if echo_string.lower().strip() == "true":
         SQLALCHEMY_ECHO = True
+
+    # Build the fuzzy search index at startup, rather than on the first fuzzy search.
+    FUZZY_INDEX_AT_STARTUP = environ.get('FUZZY_INDEX_AT_STARTUP', 'False').lower().strip() == 'true'
+
+    # Memory budget, in bytes, for cached search results.
+    SEARCH_CACHE_BYTES = int(environ.get('SEARCH_CACHE_BYTES', 4 * 1024 * 1024))
@@ -10,13 +10,16 @@ from sqlalchemy.pool import NullPool
 
 from podcast.domainmodel.model import Podcast
 from podcast.podcasts import podcasts
+import podcast.podcasts.services as podcast_services
 
 import podcast.adapters.repository as repo
 from podcast.adapters.database_repository import SqlAlchemyRepository
 from podcast.adapters import memory_repository, database_repository, repo_populate
 from podcast.adapters.memory_repository import MemoryRepository
 from podcast.adapters.repo_populate import populate
-from podcast.adapters.orm import mapper_registry, map_model_to_tables
+from podcast.adapters.snapshot import load_memory_repository
+from podcast.adapters.orm import mapper_registry, map_model_to_tables, create_missing_indexes
+from podcast.adapters.database_sync import csv_row_hashes_table
 
 
 def create_app(test_config=None):
@@ -37,11 +40,13 @@ def create_app(test_config=None):
     # persistent database data storage for our application.
 
     if app.config['REPOSITORY'] == 'memory':
-        # Create the MemoryRepository implementation for a memory-based repository.
-        repo.repo_instance = memory_repository.MemoryRepository()
-        # fill the content of the repository from the provided csv files (has to be done every time we start app!)
-        database_mode = False
-        populate(data_path, repo.repo_instance, database_mode)
+        # Create the MemoryRepository implementation for a memory-based repository, filled with the content of
+        # the provided csv files. That has to be done every time we start the app, so it starts from a snapshot of
+        # the filled repository when there is one for the same csv files.
+        repo.repo_instance = load_memory_repository(data_path, app.config.get('SNAPSHOT_DIR'),
+                                                    processes=app.config.get('INGEST_PROCESSES', 1),
+                                                    columnar_episodes=app.config.get('COLUMNAR_EPISODES', False),
+                                                    lazy_descriptions=app.config.get('LAZY_DESCRIPTIONS', False))
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
@@ -72,17 +77,48 @@ def create_app(test_config=None):
             for table in reversed(mapper_registry.metadata.sorted_tables):
                 with database_engine.connect() as conn:
                     conn.execute(table.delete())
+            # Hashes of rows synced before describe rows that are no longer there.
+            csv_row_hashes_table.drop(database_engine, checkfirst=True)
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
             database_mode = True
-            populate(data_path, repo.repo_instance, database_mode)
+            populate(data_path, repo.repo_instance, database_mode, app.config.get('INGEST_PROCESSES', 1))
+            if app.config.get('DATABASE_SYNC'):
+                # Store the hashes of the rows just loaded, for the next start to sync against.
+                repo.repo_instance.sync_from_csv(data_path, existing_rows_current=True)
             print("REPOPULATING DATABASE... FINISHED")
 
         else:
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
+            # The database may predate some of the indexes; those are only made by the branch above otherwise.
+            with database_engine.begin() as connection:
+                create_missing_indexes(connection)
+
+            if app.config.get('DATABASE_SYNC'):
+                # Pick up changes to the csv files without losing users, reviews and playlists.
+                sync = repo.repo_instance.sync_from_csv(data_path)
+                for source in ('podcasts', 'episodes'):
+                    counts = sync[source]
+                    print(f"Synced {source}: {counts['inserted']} inserted, {counts['changed']} changed, "
+                          f"{counts['deleted']} deleted, {counts['unchanged']} unchanged, "
+                          f"in {sync['seconds'][source]:.2f} s.")
+                print(f"Compared the csv files in {sync['seconds']['diff']:.2f} s; added {sync['authors']} "
+                      f"authors and {sync['categories']} categories.")
+
+        # Search goes through an FTS5 table that is kept in sync by triggers once it exists.
+        if not repo.repo_instance.enable_full_text_search():
+            print("SQLite has no FTS5 trigram support, search will scan the podcasts table.")
+
+    # Cached search results belong to the previous repository; start over with the configured budget.
+    podcast_services.search_cache.clear()
+    podcast_services.search_cache.resize(app.config['SEARCH_CACHE_BYTES'])
+
+    # Otherwise the fuzzy search index is built by the first fuzzy search.
+    if app.config.get('FUZZY_INDEX_AT_STARTUP'):
+        repo.repo_instance.build_fuzzy_index()
 
     with app.app_context():
         # Register blueprints
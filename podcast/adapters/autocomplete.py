@@ -0,0 +1,111 @@
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import Callable, Dict, List
+
+# Fields that suggestions are offered for, matching the filter options of the search form.
+TITLE = 'title'
+AUTHOR = 'author'
+CATEGORY = 'category'
+SUGGESTION_FIELDS = (TITLE, AUTHOR, CATEGORY)
+
+# Sorts after any character a prefix can continue with, so prefix + PREFIX_END bounds the prefix's range.
+PREFIX_END = '\U0010ffff'
+
+# Prefixes matching more keys than this keep their top suggestions until the index next changes.
+CACHED_RANGE_SIZE = 1024
+
+
+def podcast_suggestion_texts(podcast) -> Dict[str, List[str]]:
+    """ Returns the texts a Podcast can be suggested under, for each suggestion field. """
+    texts = {
+        TITLE: [podcast.title],
+        AUTHOR: [podcast.author.name] if podcast.author is not None else [],
+        CATEGORY: [category.name for category in podcast.categories],
+    }
+    return texts
+
+
+def number_of_episodes(podcast) -> int:
+    return len(podcast.episodes)
+
+
+def popularity(field: str, podcasts: dict, episode_count: Callable = number_of_episodes) -> int:
+    """ Scores a suggestion: titles by their number of Episodes, authors and categories by their number of
+    Podcasts. """
+    if field == TITLE:
+        return sum(episode_count(podcast) for podcast in podcasts.values())
+    return len(podcasts)
+
+
+class PrefixIndex:
+    """ Sorted, case-folded keys over Podcast titles, author names and category names, for autocomplete.
+
+    Each field keeps its distinct texts sorted by their case-folded form, so the texts starting with a prefix
+    are one contiguous range found with two bisects. The best suggestions in the range are picked by
+    popularity, ties going to the alphabetically first text. The sorted arrays are rebuilt lazily on the
+    first lookup after a change, which keeps bulk loading cheap. episode_count gives a Podcast's number of
+    Episodes, for repositories that don't keep them in Podcast.episodes.
+    """
+
+    def __init__(self, episode_count: Callable = number_of_episodes):
+        self.__episode_count = episode_count
+        self.__podcasts: Dict[str, Dict[str, dict]] = {field: dict() for field in SUGGESTION_FIELDS}
+        self.__keys: Dict[str, List[str]] = {field: [] for field in SUGGESTION_FIELDS}
+        self.__texts: Dict[str, List[str]] = {field: [] for field in SUGGESTION_FIELDS}
+        self.__ranked: Dict[str, List[tuple]] = {field: [] for field in SUGGESTION_FIELDS}
+        self.__cache: Dict[str, dict] = {field: dict() for field in SUGGESTION_FIELDS}
+        self.__stale = set(SUGGESTION_FIELDS)
+
+    def add(self, podcast):
+        for field, texts in podcast_suggestion_texts(podcast).items():
+            for text in texts:
+                self.add_value(podcast, field, text)
+
+    def add_value(self, podcast, field: str, text: str):
+        """ Makes a Podcast suggestible under one more text, e.g. a newly tagged Category. """
+        self.__podcasts[field].setdefault(text, dict())[podcast.id] = podcast
+        self.__stale.add(field)
+
+    def remove(self, podcast):
+        for field, podcasts_by_text in self.__podcasts.items():
+            for text in [text for text, podcasts in podcasts_by_text.items() if podcast.id in podcasts]:
+                del podcasts_by_text[text][podcast.id]
+                if len(podcasts_by_text[text]) == 0:
+                    del podcasts_by_text[text]
+            self.__stale.add(field)
+
+    def popularity_changed(self, field: str = TITLE):
+        """ Marks a field's scores as out of date, e.g. after an Episode is added to a Podcast. """
+        self.__stale.add(field)
+
+    def suggest(self, prefix: str, field: str, limit: int = 10) -> List[str]:
+        """ Returns up to limit texts of field starting with prefix (ignoring case), most popular first. """
+        if field not in self.__podcasts or prefix == '' or limit <= 0:
+            return []
+        if field in self.__stale:
+            self.__rebuild(field)
+
+        prefix = prefix.casefold()
+        cached = self.__cache[field].get(prefix)
+        if cached is not None and len(cached) >= limit:
+            return cached[:limit]
+
+        keys = self.__keys[field]
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, start)
+        best = nsmallest(limit, self.__ranked[field][start:end])
+        suggestions = [self.__texts[field][position] for _, position in best]
+        if end - start > CACHED_RANGE_SIZE:
+            self.__cache[field][prefix] = suggestions
+        return suggestions
+
+    def __rebuild(self, field: str):
+        entries = sorted((text.casefold(), text) for text in self.__podcasts[field])
+        self.__keys[field] = [key for key, _ in entries]
+        self.__texts[field] = [text for _, text in entries]
+        # (negated score, position) sorts most popular first, then alphabetically.
+        podcasts_by_text = self.__podcasts[field]
+        self.__ranked[field] = [(-popularity(field, podcasts_by_text[text], self.__episode_count), position)
+                                for position, (_, text) in enumerate(entries)]
+        self.__cache[field] = dict()
+        self.__stale.discard(field)
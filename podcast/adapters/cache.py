@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from podcast.adapters.indexes import approximate_size
+
+# Used when the application config doesn't set SEARCH_CACHE_BYTES.
+DEFAULT_CACHE_BYTES = 4 * 1024 * 1024
+
+
+class ResultCache:
+    """ Least recently used cache with a budget in bytes rather than entries.
+
+    Entry sizes are estimated with approximate_size when they are stored. Storing an entry that takes the
+    total over max_bytes evicts the least recently used entries until it fits; entries larger than the whole
+    budget are not stored. Keys are expected to include whatever version makes old results invalid, so stale
+    entries are never looked up again and simply age out. Every request thread shares the cache, so each
+    method holds a lock while it uses the entries.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.__entries: OrderedDict = OrderedDict()
+        self.__sizes = dict()
+        self.__lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self.__lock:
+            value = self.__entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value):
+        size = approximate_size(key) + approximate_size(value)
+        with self.__lock:
+            if key in self.__entries:
+                self.__discard(key)
+            if size > self.max_bytes:
+                return
+            self.__entries[key] = value
+            self.__sizes[key] = size
+            self.bytes += size
+            self.__evict()
+
+    def resize(self, max_bytes: int):
+        with self.__lock:
+            self.max_bytes = max_bytes
+            self.__evict()
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__sizes.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {'entries': len(self.__entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    # __evict and __discard are only called with the lock held.
+    def __evict(self):
+        while self.bytes > self.max_bytes and len(self.__entries) > 0:
+            key = next(iter(self.__entries))
+            self.__discard(key)
+            self.evictions += 1
+
+    def __discard(self, key: Hashable):
+        del self.__entries[key]
+        self.bytes -= self.__sizes.pop(key)
@@ -1,13 +1,21 @@
 from abc import ABC
+from datetime import datetime
 from typing import List
 
-from sqlalchemy import desc, asc, func, delete, text
+from sqlalchemy import desc, asc, func, delete, text, select, insert, and_, or_
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 from sqlalchemy.orm import scoped_session
-from podcast.adapters.orm import playlists_episodes_association_table
-from podcast.domainmodel.model import Author, User, Podcast, Episode, Review, Playlist, Category, PodcastSubscription
+from podcast.adapters.orm import playlists_episodes_association_table, episodes_table, podcasts_table, \
+    authors_table, categories_table, podcasts_categories_association_table, reviews_table, \
+    create_full_text_search, drop_full_text_search, has_full_text_search
+from podcast.domainmodel.model import Author, User, Podcast, Episode, Review, Playlist, Category, PodcastSubscription, \
+    PodcastSummary
 from podcast.adapters.repository import AbstractRepository
+from podcast.adapters.database_sync import SYNC_BATCH_ROWS, sync_csv_files
+from podcast.adapters.fuzzy_index import FuzzyIndex
+from podcast.adapters.episode_search import EpisodeSearchIndex
+from podcast.adapters.paging import Page, decode_cursor, page_of
 
 
 class SessionContextManager:
@@ -43,6 +51,21 @@ class SessionContextManager:
 class SqlAlchemyRepository(AbstractRepository, ABC):
     def __init__(self, session_factory):
         self._session_cm = SessionContextManager(session_factory)
+        self._full_text_search = False
+        self._fuzzy_index = None
+        self._episode_search_index = None
+        # Each repository starts from its own version, as the database may already hold data.
+        self.record_mutation()
+
+    def enable_full_text_search(self) -> bool:
+        """ Creates (or refreshes) the podcasts_fts table and uses it for search_podcasts.
+
+        Returns False, leaving search on plain SQL substring matching, if SQLite lacks FTS5 trigram support.
+        """
+        with self._session_cm as scm:
+            self._full_text_search = create_full_text_search(scm.session.connection())
+            scm.commit()
+        return self._full_text_search
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -50,10 +73,80 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
     def reset_session(self):
         self._session_cm.reset_session()
 
+    def bulk_load(self, authors, podcasts, categories, episodes):
+        """ Inserts the objects of a whole catalogue, e.g. those a CSVDataReader read, into empty tables.
+
+        Unlike the add methods, which merge and commit one object at a time, this runs one executemany-style
+        insert per table in a single transaction. The podcasts and episodes indexes and the full-text search
+        table (if there is one) are dropped first and built again once the rows are in.
+        """
+        podcasts, episodes = list(podcasts), list(episodes)
+        with self._session_cm as scm:
+            connection = scm.session.connection()
+            indexes = [index for table in (podcasts_table, episodes_table) for index in table.indexes]
+            for index in indexes:
+                index.drop(connection, checkfirst=True)
+            full_text_search = has_full_text_search(connection)
+            for statement in drop_full_text_search:
+                connection.exec_driver_sql(statement)
+
+            rows = [
+                (authors_table, [{'id': author.id, 'name': author.name} for author in authors]),
+                (podcasts_table, [{
+                    'id': podcast.id,
+                    'author_id': podcast.author.id if podcast.author is not None else None,
+                    'title': podcast.title,
+                    'image_url': podcast.image,
+                    'description': podcast.description,
+                    'language': podcast.language,
+                    'website_url': podcast.website,
+                    'itunes_id': podcast.itunes_id,
+                } for podcast in podcasts]),
+                (categories_table, [{'id': category.id, 'name': category.name} for category in categories]),
+                (podcasts_categories_association_table, [
+                    {'podcast_id': podcast.id, 'category_id': category.id}
+                    for podcast in podcasts for category in podcast.categories]),
+                (episodes_table, [{
+                    'id': episode.id,
+                    'podcast_id': episode.podcast.id if episode.podcast is not None else None,
+                    'title': episode.title,
+                    'audio_url': episode.audio,
+                    'description': episode.description,
+                    'upload_date': episode.upload_date,
+                } for episode in episodes]),
+            ]
+            for table, table_rows in rows:
+                if table_rows:
+                    connection.execute(insert(table), table_rows)
+
+            for index in indexes:
+                index.create(connection)
+            if full_text_search:
+                self._full_text_search = create_full_text_search(connection)
+            scm.commit()
+        self._fuzzy_index = None
+        self._episode_search_index = None
+        self.record_mutation()
+
+    def sync_from_csv(self, data_path, batch_rows: int = SYNC_BATCH_ROWS, existing_rows_current: bool = False) -> dict:
+        """ Applies only what changed in the CSV files in data_path since they were last synced, rather than
+        repopulating the database, so users, playlists and reviews are kept. See database_sync.sync_csv_files,
+        which returns the row counts and timings reported here.
+        """
+        with self._session_cm as scm:
+            report = sync_csv_files(scm.session, data_path, batch_rows, existing_rows_current)
+        if any(report[source][change] for source in ('podcasts', 'episodes')
+               for change in ('inserted', 'changed', 'deleted')):
+            self._fuzzy_index = None
+            self._episode_search_index = None
+            self.record_mutation()
+        return report
+
     def add_author(self, author: Author):
         with self._session_cm as scm:
             scm.session.merge(author)
             scm.commit()
+        self.record_mutation()
 
     def get_author(self, author_name: str) -> Author:
         author = None
@@ -68,6 +161,9 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
         with self._session_cm as scm:
             scm.session.merge(podcast)
             scm.commit()
+        if self._fuzzy_index is not None:
+            self._fuzzy_index.add(podcast)
+        self.record_mutation()
 
     def get_podcast(self, podcast_id) -> Podcast:
         podcast = None
@@ -78,6 +174,44 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
 
         return podcast
 
+    def get_podcast_summaries(self, limit: int, offset: int = 0, filters: dict = None, cursor: str = None) -> Page:
+        conditions = self._facet_conditions(filters or {})
+        total = self._session_cm.session.execute(
+            select(func.count()).select_from(podcasts_table).where(*conditions)).scalar()
+        statement = (select(podcasts_table.c.id, podcasts_table.c.title, podcasts_table.c.image_url,
+                            authors_table.c.name)
+                     .select_from(podcasts_table.outerjoin(authors_table))
+                     .where(*conditions)
+                     .order_by(asc(podcasts_table.c.title), asc(podcasts_table.c.id))
+                     .limit(limit + 1))
+        after = decode_cursor(cursor, (str, int))
+        if after is not None:
+            # Seek along the (title, id) index instead of skipping rows, so deep pages cost the same as the first.
+            title, podcast_id = after
+            statement = statement.where(or_(podcasts_table.c.title > title,
+                                            and_(podcasts_table.c.title == title, podcasts_table.c.id > podcast_id)))
+        else:
+            statement = statement.offset(max(offset, 0))
+        summaries = [PodcastSummary(*row) for row in self._session_cm.session.execute(statement)]
+        return page_of(summaries, [(summary.title, summary.id) for summary in summaries], limit, total)
+
+    def get_podcast_version(self, podcast_id: int):
+        # add_episode and add_review don't change mutation_version, but they change the counts and highest ids
+        # of the podcast's episodes and reviews. Every other write to a podcast's rows changes mutation_version:
+        # add_podcast, add_category, bulk_load, and sync_from_csv, which also edits and deletes episodes, and
+        # deletes reviews, without necessarily changing those counts.
+        row = self._session_cm.session.execute(
+            text('SELECT (SELECT count(*) FROM episodes WHERE podcast_id = :podcast_id), '
+                 '(SELECT max(id) FROM episodes WHERE podcast_id = :podcast_id), '
+                 '(SELECT count(*) FROM reviews WHERE podcast_id = :podcast_id), '
+                 '(SELECT max(id) FROM reviews WHERE podcast_id = :podcast_id) '
+                 'FROM podcasts WHERE id = :podcast_id'),
+            {'podcast_id': podcast_id}
+        ).first()
+        if row is None:
+            return None
+        return (self.mutation_version,) + tuple(row)
+
     def get_number_of_podcasts(self) -> int:
         number_of_podcasts = self._session_cm.session.query(Podcast).count()
         return number_of_podcasts
@@ -110,14 +244,161 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
         return podcast_ids
 
     def get_podcast_ids_by_language(self, language: str):
-        # Actually returns podcasts, but I don't think this method gets used anyway.
-        podcasts = self._session_cm.session.query(Podcast).filter(Podcast._language == language).all()
-        return podcasts
+        return self.get_podcast_ids_by_facets({'language': language})
+
+    def search_podcast_ids(self, query: str, filter_by: str):
+        if filter_by == 'fuzzy':
+            return self._built_fuzzy_index().search(query)
+        statement = self._substring_search_statement(query, filter_by)
+        if statement is None:
+            return []
+        return list(self._session_cm.session.execute(statement).scalars())
+
+    def search_podcasts(self, query: str, filter_by: str, limit: int, offset: int = 0):
+        if filter_by == 'fuzzy':
+            podcast_ids = self.search_podcast_ids(query, filter_by)
+            return podcast_ids[offset:offset + limit], len(podcast_ids)
+
+        column = {'title': 'title', 'author': 'author', 'category': 'categories'}.get(filter_by)
+        if column is None:
+            return [], 0
+
+        if not self._full_text_search or len(query) < 3:
+            # Too short for a trigram lookup; fall back to substring matching, still paged in SQL.
+            statement = self._substring_search_statement(query, filter_by)
+            total = self._session_cm.session.execute(
+                select(func.count()).select_from(statement.subquery())).scalar()
+            page_ids = self._session_cm.session.execute(statement.limit(limit).offset(offset)).scalars()
+            return list(page_ids), total
+
+        # The trigram tokenizer matches a quoted phrase anywhere in the column, ignoring case.
+        phrase = '"' + query.replace('"', '""') + '"'
+        total = self._session_cm.session.execute(
+            text(f'SELECT count(*) FROM podcasts_fts WHERE {column} MATCH :phrase'),
+            {'phrase': phrase}
+        ).scalar()
+        page_ids = self._session_cm.session.execute(
+            text(f'SELECT rowid FROM podcasts_fts WHERE {column} MATCH :phrase '
+                 f'ORDER BY rank, title, rowid LIMIT :limit OFFSET :offset'),
+            {'phrase': phrase, 'limit': limit, 'offset': offset}
+        ).scalars()
+        return list(page_ids), total
+
+    def build_fuzzy_index(self) -> dict:
+        return self._built_fuzzy_index().stats()
+
+    def _built_fuzzy_index(self) -> FuzzyIndex:
+        # The index lives in memory, built from one query; podcasts added through this repository are
+        # added to it as well.
+        if self._fuzzy_index is None:
+            # Filled before it is stored, so a search in another thread never sees it half built.
+            fuzzy_index = FuzzyIndex()
+            rows = self._session_cm.session.execute(
+                select(podcasts_table.c.id, podcasts_table.c.title, authors_table.c.name)
+                .select_from(podcasts_table.outerjoin(authors_table)))
+            for podcast_id, title, author_name in rows:
+                fuzzy_index.add_texts(podcast_id, title, [title, author_name or ''])
+            self._fuzzy_index = fuzzy_index
+        return self._fuzzy_index
+
+    def _substring_search_statement(self, query: str, filter_by: str):
+        # py_lower (see orm.register_python_lower) folds the case of any letter, not just ASCII ones.
+        query = query.lower()
+        if filter_by == 'title':
+            condition = func.instr(func.py_lower(podcasts_table.c.title), query) > 0
+        elif filter_by == 'author':
+            author_ids = select(authors_table.c.id).where(func.instr(func.py_lower(authors_table.c.name), query) > 0)
+            condition = podcasts_table.c.author_id.in_(author_ids)
+        elif filter_by == 'category':
+            tagged_ids = (select(podcasts_categories_association_table.c.podcast_id)
+                          .join(categories_table)
+                          .where(func.instr(func.py_lower(categories_table.c.name), query) > 0))
+            condition = podcasts_table.c.id.in_(tagged_ids)
+        else:
+            return None
+
+        return (select(podcasts_table.c.id)
+                .where(condition)
+                .order_by(asc(podcasts_table.c.title), asc(podcasts_table.c.id)))
+
+    def get_search_suggestions(self, prefix: str, filter_by: str, limit: int = 10):
+        if filter_by == 'title':
+            text_column = podcasts_table.c.title
+            popularity = func.count(episodes_table.c.id)
+            source = podcasts_table.outerjoin(episodes_table)
+        elif filter_by == 'author':
+            text_column = authors_table.c.name
+            popularity = func.count(podcasts_table.c.id)
+            source = authors_table.join(podcasts_table)
+        elif filter_by == 'category':
+            text_column = categories_table.c.name
+            popularity = func.count(podcasts_categories_association_table.c.podcast_id)
+            source = categories_table.join(podcasts_categories_association_table)
+        else:
+            return []
+        if prefix == '' or limit <= 0:
+            return []
+
+        prefix = prefix.lower()
+        statement = (select(text_column)
+                     .select_from(source)
+                     .where(func.substr(func.py_lower(text_column), 1, len(prefix)) == prefix)
+                     .group_by(text_column)
+                     .order_by(desc(popularity), asc(func.py_lower(text_column)), asc(text_column))
+                     .limit(limit))
+        return list(self._session_cm.session.execute(statement).scalars())
+
+    def get_podcast_ids_by_facets(self, filters: dict):
+        statement = (select(podcasts_table.c.id)
+                     .where(*self._facet_conditions(filters))
+                     .order_by(asc(podcasts_table.c.id)))
+        return list(self._session_cm.session.execute(statement).scalars())
+
+    def get_facet_counts(self, filters: dict, facets=('category', 'language', 'author')):
+        counts = dict()
+        for facet in facets:
+            other_filters = {other: value for other, value in filters.items() if other != facet}
+            matching_ids = select(podcasts_table.c.id).where(*self._facet_conditions(other_filters))
+
+            if facet == 'category':
+                value_column = categories_table.c.name
+                statement = (select(value_column, func.count())
+                             .select_from(podcasts_categories_association_table.join(categories_table))
+                             .where(podcasts_categories_association_table.c.podcast_id.in_(matching_ids)))
+            elif facet == 'author':
+                value_column = authors_table.c.name
+                statement = (select(value_column, func.count())
+                             .select_from(podcasts_table.join(authors_table))
+                             .where(podcasts_table.c.id.in_(matching_ids)))
+            else:
+                value_column = podcasts_table.c.language
+                statement = (select(value_column, func.count())
+                             .where(podcasts_table.c.id.in_(matching_ids), value_column != ''))
+
+            rows = self._session_cm.session.execute(statement.group_by(value_column)).all()
+            counts[facet] = {value: count for value, count in rows if value is not None}
+        return counts
+
+    def _facet_conditions(self, filters: dict):
+        conditions = []
+        for facet, value in filters.items():
+            if facet == 'category':
+                tagged_ids = (select(podcasts_categories_association_table.c.podcast_id)
+                              .join(categories_table)
+                              .where(categories_table.c.name == value))
+                conditions.append(podcasts_table.c.id.in_(tagged_ids))
+            elif facet == 'language':
+                conditions.append(podcasts_table.c.language == value)
+            elif facet == 'author':
+                author_ids = select(authors_table.c.id).where(authors_table.c.name == value)
+                conditions.append(podcasts_table.c.author_id.in_(author_ids))
+        return conditions
 
     def add_category(self, category: Category):
         with self._session_cm as scm:
             scm.session.merge(category)
             scm.commit()
+        self.record_mutation()
 
     def get_categories(self):
         categories = self._session_cm.session.query(Category).all()
@@ -153,6 +434,8 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
         with self._session_cm as scm:
             scm.session.merge(episode)
             scm.commit()
+        if self._episode_search_index is not None:
+            self._episode_search_index.add(episode)
 
     def get_episode(self, episode_id):
         episode = None
@@ -179,13 +462,69 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
         episodes = self._session_cm.session.query(Episode).filter(Episode._id.in_(id_list)).all()
         return episodes
 
+    def get_episodes_for_podcast(self, podcast_id: int) -> List[Episode]:
+        statement = select(Episode).where(episodes_table.c.podcast_id == podcast_id).order_by(asc(episodes_table.c.id))
+        return self._session_cm.session.execute(statement).scalars().all()
+
+    def get_episode_page(self, podcast_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        total = self._session_cm.session.execute(
+            select(func.count()).select_from(episodes_table).where(episodes_table.c.podcast_id == podcast_id)).scalar()
+        statement = (select(Episode)
+                     .where(episodes_table.c.podcast_id == podcast_id)
+                     .order_by(asc(episodes_table.c.upload_date), asc(episodes_table.c.id))
+                     .limit(limit + 1))
+        after = decode_cursor(cursor, (str, int))
+        upload_date = None
+        if after is not None:
+            try:
+                upload_date = datetime.fromisoformat(after[0])
+            except ValueError:
+                pass
+        if upload_date is not None:
+            statement = statement.where(or_(episodes_table.c.upload_date > upload_date,
+                                            and_(episodes_table.c.upload_date == upload_date,
+                                                 episodes_table.c.id > after[1])))
+        else:
+            statement = statement.offset(max(offset, 0))
+        episodes = self._session_cm.session.execute(statement).scalars().all()
+        keys = [(episode.upload_date.isoformat(), episode.id) for episode in episodes]
+        return page_of(episodes, keys, limit, total)
+
+    def search_episodes(self, query: str, limit: int, offset: int = 0):
+        if self._episode_search_index is None:
+            # Stripping every description takes a while, so the index is only built once it is needed.
+            self._episode_search_index = EpisodeSearchIndex()
+            rows = self._session_cm.session.execute(
+                select(episodes_table.c.id, episodes_table.c.title, episodes_table.c.description))
+            for episode_id, title, description in rows:
+                self._episode_search_index.add_text(episode_id, title, description)
+        return self._episode_search_index.search(query, limit, offset)
+
     def get_next_episode_id(self, episode: Episode):
-        # Unimplemented
-        return None
+        return self._adjacent_episode_id(episode, newer=True)
 
     def get_previous_episode_id(self, episode: Episode):
-        # Unimplemented
-        return None
+        return self._adjacent_episode_id(episode, newer=False)
+
+    def _adjacent_episode_id(self, episode: Episode, newer: bool):
+        # Window query over the (podcast_id, upload_date) index: one row either side of the episode.
+        if episode.podcast is None or episode.upload_date is None:
+            return None
+        upload_date = episode.upload_date
+        if newer:
+            after = or_(episodes_table.c.upload_date > upload_date,
+                        and_(episodes_table.c.upload_date == upload_date, episodes_table.c.id > episode.id))
+            order = (asc(episodes_table.c.upload_date), asc(episodes_table.c.id))
+        else:
+            after = or_(episodes_table.c.upload_date < upload_date,
+                        and_(episodes_table.c.upload_date == upload_date, episodes_table.c.id < episode.id))
+            order = (desc(episodes_table.c.upload_date), desc(episodes_table.c.id))
+
+        statement = (select(episodes_table.c.id)
+                     .where(episodes_table.c.podcast_id == episode.podcast.id, after)
+                     .order_by(*order)
+                     .limit(1))
+        return self._session_cm.session.execute(statement).scalar()
 
     def add_review(self, review: Review):
         with self._session_cm as scm:
@@ -196,6 +535,21 @@ class SqlAlchemyRepository(AbstractRepository, ABC):
         reviews = self._session_cm.session.query(Review).all()
         return reviews
 
+    def get_review_page(self, episode_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        total = self._session_cm.session.execute(
+            select(func.count()).select_from(reviews_table).where(reviews_table.c.episode_id == episode_id)).scalar()
+        statement = (select(Review)
+                     .where(reviews_table.c.episode_id == episode_id)
+                     .order_by(asc(reviews_table.c.id))
+                     .limit(limit + 1))
+        after = decode_cursor(cursor, (int,))
+        if after is not None:
+            statement = statement.where(reviews_table.c.id > after[0])
+        else:
+            statement = statement.offset(max(offset, 0))
+        reviews = self._session_cm.session.execute(statement).scalars().all()
+        return page_of(reviews, [(review.id,) for review in reviews], limit, total)
+
     def get_number_of_reviews(self) -> int:
         number_of_reviews = self._session_cm.session.query(Review).count()
         return number_of_reviews
@@ -0,0 +1,258 @@
+import hashlib
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Set
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, select, insert, update, delete, bindparam, func
+from sqlalchemy.orm import Session
+
+from podcast.adapters.datareader.csvdatareader import read_csv_file, check_podcast_row, check_episode_row, \
+    category_names, episode_records, to_strptime, missing_author
+from podcast.adapters.orm import authors_table, podcasts_table, categories_table, episodes_table, \
+    podcasts_categories_association_table, reviews_table, playlists_episodes_association_table
+
+# Rows written per transaction when a delta is applied.
+SYNC_BATCH_ROWS = 1000
+
+# The row hashes are kept apart from mapper_registry.metadata: they are no part of the domain model, and only a
+# database that has been synced has the table.
+sync_metadata = MetaData()
+
+csv_row_hashes_table = Table(
+    'csv_row_hashes', sync_metadata,
+    Column('source', String(16), primary_key=True),
+    Column('row_id', Integer, primary_key=True),
+    Column('row_hash', String(32), nullable=False)
+)
+
+
+def hash_row(row: List[str]) -> str:
+    """ Digest of a CSV row as read_csv_file yields it. """
+    return hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RowDelta(NamedTuple):
+    """ How one CSV file differs from the rows last synced from it.
+
+    rows holds the CSV row of every inserted or changed id. hashes holds the hash of each of those rows and of
+    every other row whose stored hash is missing or out of date, and stale the ids whose stored hashes belong to
+    rows no longer in the file.
+    """
+    rows: Dict[int, List[str]]
+    inserted: List[int]
+    changed: List[int]
+    deleted: List[int]
+    unchanged: int
+    hashes: Dict[int, str]
+    stale: List[int]
+
+    def counts(self) -> dict:
+        return {'rows': len(self.rows) + self.unchanged, 'inserted': len(self.inserted),
+                'changed': len(self.changed), 'deleted': len(self.deleted), 'unchanged': self.unchanged}
+
+
+def diff_csv_file(filename: str, check_row: Callable, stored: Dict[int, str], existing_ids: Set[int],
+                  existing_rows_current: bool = False, relinked_podcasts: Set[int] = frozenset()) -> RowDelta:
+    """ Compares the rows of filename with the hashes stored for them and the ids already in their table.
+
+    With existing_rows_current, rows that are in the table but have no stored hash are taken to match the file,
+    as they do straight after populate. Episodes whose podcast is in relinked_podcasts count as changed even if
+    their own row hasn't, so their podcast_id follows the podcast coming or going.
+    """
+    rows, inserted, changed, hashes = dict(), [], [], dict()
+    unchanged = 0
+    seen = set()
+    for row in read_csv_file(filename):
+        check_row(row)
+        row_id = int(row[0])
+        row_hash = hash_row(row)
+        seen.add(row_id)
+        stored_hash = stored.get(row_id)
+        if stored_hash != row_hash:
+            hashes[row_id] = row_hash
+        if row_id not in existing_ids:
+            inserted.append(row_id)
+        elif (stored_hash == row_hash or (stored_hash is None and existing_rows_current)) \
+                and not (relinked_podcasts and int(row[1]) in relinked_podcasts):
+            unchanged += 1
+            continue
+        else:
+            changed.append(row_id)
+        rows[row_id] = row
+        hashes[row_id] = row_hash
+    deleted = sorted(existing_ids - seen)
+    stale = [row_id for row_id in stored if row_id not in seen]
+    return RowDelta(rows, inserted, changed, deleted, unchanged, hashes, stale)
+
+
+def in_batches(session: Session, ids: List[int], batch_rows: int, apply: Callable):
+    """ Calls apply(connection, batch) for every batch_rows ids, committing each batch on its own. """
+    for start in range(0, len(ids), batch_rows):
+        apply(session.connection(), ids[start:start + batch_rows])
+        session.commit()
+
+
+def stored_hashes(connection, source: str) -> Dict[int, str]:
+    statement = select(csv_row_hashes_table.c.row_id, csv_row_hashes_table.c.row_hash) \
+        .where(csv_row_hashes_table.c.source == source)
+    return dict(connection.execute(statement).all())
+
+
+def write_hashes(connection, source: str, hashes: Dict[int, str], ids: List[int]):
+    """ Replaces the stored hashes of ids with the ones in hashes; ids without one there are only removed. """
+    connection.execute(delete(csv_row_hashes_table).where(csv_row_hashes_table.c.source == source,
+                                                           csv_row_hashes_table.c.row_id.in_(ids)))
+    rows = [{'source': source, 'row_id': row_id, 'row_hash': hashes[row_id]} for row_id in ids if row_id in hashes]
+    if rows:
+        connection.execute(insert(csv_row_hashes_table), rows)
+
+
+def name_ids(connection, table: Table, names: Iterable[str]) -> Dict[str, int]:
+    """ Ids of the authors or categories called names, adding the names the table doesn't hold yet. """
+    ids = dict(connection.execute(select(table.c.name, table.c.id)).all())
+    next_id = (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+    new_rows = []
+    for name in names:
+        if name not in ids:
+            ids[name] = next_id
+            new_rows.append({'id': next_id, 'name': name})
+            next_id += 1
+    if new_rows:
+        connection.execute(insert(table), new_rows)
+    return ids
+
+
+def write_rows(connection, table: Table, rows: List[dict], inserted: Set[int]):
+    """ Inserts the rows whose id is in inserted and updates the others. """
+    new_rows = [row for row in rows if row['id'] in inserted]
+    if new_rows:
+        connection.execute(insert(table), new_rows)
+    # The id goes in as row_id, so the rest of each row is what the update sets.
+    changed_rows = [{column if column != 'id' else 'row_id': value for column, value in row.items()}
+                    for row in rows if row['id'] not in inserted]
+    if changed_rows:
+        connection.execute(update(table).where(table.c.id == bindparam('row_id')), changed_rows)
+
+
+def sync_podcasts(session: Session, delta: RowDelta, batch_rows: int) -> dict:
+    """ Applies delta to the podcasts table, its categories and the reviews of deleted podcasts. Returns the
+    numbers of authors and categories added. """
+    rows = delta.rows
+    author_names = {row[7] or missing_author().name for row in rows.values()}
+    names = {name for row in rows.values() for name in category_names(row)}
+    connection = session.connection()
+    number_of_authors = connection.execute(select(func.count(authors_table.c.id))).scalar()
+    number_of_categories = connection.execute(select(func.count(categories_table.c.id))).scalar()
+    author_ids = name_ids(connection, authors_table, sorted(author_names))
+    category_ids = name_ids(connection, categories_table, sorted(names))
+    session.commit()
+    inserted = set(delta.inserted)
+
+    def write(connection, ids):
+        podcast_rows = [{
+            'id': podcast_id,
+            'author_id': author_ids[rows[podcast_id][7] or missing_author().name],
+            'title': rows[podcast_id][1],
+            'image_url': rows[podcast_id][2],
+            'description': rows[podcast_id][3],
+            'language': rows[podcast_id][4],
+            'website_url': rows[podcast_id][6],
+            'itunes_id': int(rows[podcast_id][8]),
+        } for podcast_id in ids]
+        write_rows(connection, podcasts_table, podcast_rows, inserted)
+        connection.execute(delete(podcasts_categories_association_table)
+                           .where(podcasts_categories_association_table.c.podcast_id.in_(ids)))
+        category_rows = [{'podcast_id': podcast_id, 'category_id': category_ids[name]}
+                         for podcast_id in ids for name in category_names(rows[podcast_id])]
+        if category_rows:
+            connection.execute(insert(podcasts_categories_association_table), category_rows)
+        write_hashes(connection, 'podcasts', delta.hashes, ids)
+
+    def remove(connection, ids):
+        connection.execute(delete(reviews_table).where(reviews_table.c.podcast_id.in_(ids)))
+        connection.execute(delete(podcasts_categories_association_table)
+                           .where(podcasts_categories_association_table.c.podcast_id.in_(ids)))
+        connection.execute(delete(podcasts_table).where(podcasts_table.c.id.in_(ids)))
+        write_hashes(connection, 'podcasts', delta.hashes, ids)
+
+    apply_delta(session, 'podcasts', delta, batch_rows, write, remove)
+    return {'authors': len(author_ids) - number_of_authors, 'categories': len(category_ids) - number_of_categories}
+
+
+def sync_episodes(session: Session, delta: RowDelta, podcast_ids: Set[int], batch_rows: int):
+    """ Applies delta to the episodes table, and to the reviews and playlist entries of deleted episodes.
+    Episodes of podcasts that aren't in podcast_ids are written without a podcast, as populate leaves them. """
+    inserted = set(delta.inserted)
+
+    def write(connection, ids):
+        episode_rows = [{
+            'id': episode_id,
+            'podcast_id': podcast_id if podcast_id in podcast_ids else None,
+            'title': title,
+            'audio_url': audio,
+            'description': description,
+            'upload_date': to_strptime(date_string),
+        } for episode_id, podcast_id, title, audio, _, description, _, date_string
+            in episode_records(delta.rows[episode_id] for episode_id in ids)]
+        write_rows(connection, episodes_table, episode_rows, inserted)
+        write_hashes(connection, 'episodes', delta.hashes, ids)
+
+    def remove(connection, ids):
+        connection.execute(delete(reviews_table).where(reviews_table.c.episode_id.in_(ids)))
+        connection.execute(delete(playlists_episodes_association_table)
+                           .where(playlists_episodes_association_table.c.episode_id.in_(ids)))
+        connection.execute(delete(episodes_table).where(episodes_table.c.id.in_(ids)))
+        write_hashes(connection, 'episodes', delta.hashes, ids)
+
+    apply_delta(session, 'episodes', delta, batch_rows, write, remove)
+
+
+def apply_delta(session: Session, source: str, delta: RowDelta, batch_rows: int, write: Callable, remove: Callable):
+    """ Writes the inserted and changed rows of delta, removes the deleted ones, then brings the stored hashes
+    of the remaining rows up to date, all in batches. """
+    written = delta.inserted + delta.changed
+    in_batches(session, written, batch_rows, write)
+    in_batches(session, delta.deleted, batch_rows, remove)
+    done = set(written)
+    done.update(delta.deleted)
+    rest = [row_id for row_id in delta.hashes if row_id not in done]
+    rest += [row_id for row_id in delta.stale if row_id not in done]
+    in_batches(session, rest, batch_rows, lambda connection, ids: write_hashes(connection, source, delta.hashes, ids))
+
+
+def sync_csv_files(session: Session, data_path: Path, batch_rows: int = SYNC_BATCH_ROWS,
+                   existing_rows_current: bool = False) -> dict:
+    """ Brings the podcasts and episodes tables in line with the CSV files in data_path, only writing the rows
+    that were inserted, changed or deleted since the last sync. Users, their playlists and their reviews are
+    kept, except for reviews and playlist entries of podcasts and episodes that are deleted.
+
+    Every row's hash is stored in csv_row_hashes to compare the next sync against. Changes are committed every
+    batch_rows rows. Authors and categories are added as podcasts name them, and never deleted.
+
+    Returns a dict of row counts for podcasts and episodes, the numbers of authors and categories added, and
+    the seconds spent in each phase: reading and comparing the files (diff), then applying each delta.
+    """
+    data_path = Path(data_path)
+    seconds = dict()
+    start = time.perf_counter()
+    connection = session.connection()
+    csv_row_hashes_table.create(connection, checkfirst=True)
+    podcast_ids = set(connection.execute(select(podcasts_table.c.id)).scalars())
+    episode_ids = set(connection.execute(select(episodes_table.c.id)).scalars())
+    podcasts = diff_csv_file(str(data_path / 'podcasts.csv'), check_podcast_row,
+                             stored_hashes(connection, 'podcasts'), podcast_ids, existing_rows_current)
+    episodes = diff_csv_file(str(data_path / 'episodes.csv'), check_episode_row,
+                             stored_hashes(connection, 'episodes'), episode_ids, existing_rows_current,
+                             set(podcasts.inserted) | set(podcasts.deleted))
+    session.commit()
+    seconds['diff'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    added = sync_podcasts(session, podcasts, batch_rows)
+    seconds['podcasts'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sync_episodes(session, episodes, (podcast_ids | set(podcasts.inserted)) - set(podcasts.deleted), batch_rows)
+    seconds['episodes'] = time.perf_counter() - start
+
+    return dict(added, podcasts=podcasts.counts(), episodes=episodes.counts(), seconds=seconds)
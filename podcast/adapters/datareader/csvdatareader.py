@@ -1,10 +1,29 @@
 import csv
-from datetime import datetime
-from podcast.domainmodel.model import Podcast, Episode, Author, Category, make_category_association
-from typing import List
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain, repeat
+from podcast.domainmodel.descriptions import normalise_description
+from podcast.domainmodel.model import Podcast, Episode, Author, Category, ModelException, \
+    make_trusted_category_association
+from typing import Iterable, Iterator, List, Tuple
 
 from path_utils.utils import get_project_root
 
+# Rows are checked once against these when read, so the model objects are then built with their trusted
+# constructors rather than validating every field again. Each entry is (column, name) for a column that must
+# hold a non-negative integer, or must not be empty.
+PODCAST_COLUMNS = 9
+PODCAST_INTEGER_COLUMNS: Tuple[Tuple[int, str], ...] = ((0, 'podcast id'), (8, 'iTunes id'))
+PODCAST_TEXT_COLUMNS: Tuple[Tuple[int, str], ...] = ((1, 'Podcast title'),)
+EPISODE_COLUMNS = 7
+EPISODE_INTEGER_COLUMNS: Tuple[Tuple[int, str], ...] = ((0, 'episode id'), (1, 'podcast id'), (4, 'Episode length'))
+EPISODE_TEXT_COLUMNS: Tuple[Tuple[int, str], ...] = ((2, 'Episode title'),)
+
+# Bytes of episodes.csv each process is given at a time when episodes are loaded in parallel.
+CHUNK_BYTES = 1 << 20
+
 
 class CSVDataReader:
     # TODO: Complete the implementation of the CSVDataReader class.
@@ -15,21 +34,35 @@ class CSVDataReader:
         self.podcasts = dict()
         self.episodes: List[Episode] = []
         self.authors = dict()   # Name: ID. Provides easy access for CSVDataReader methods.
+        self.author_objects = dict()    # Name: Author. One shared Author per name.
         self.categories = dict()
 
-    def load_episodes(self):
+    def load_episodes(self, processes: int = 1):
         """Loads episodes from csv file into self.episodes.
-        Code borrowed and refactored from both Faiza and Gurrnor."""
-        for data_row in read_csv_file(self.__episodes_filename):
-            podcast = self.podcasts.get(int(data_row[1]))
-            episode = Episode(
-                episode_id=int(data_row[0]),
-                podcast=podcast,
-                episode_title=data_row[2],
-                episode_audio=data_row[3],
-                episode_length=int(data_row[4]),
-                episode_desc=data_row[5],
-                upload_date=to_strptime(data_row[6]),
+        Code borrowed and refactored from both Faiza and Gurrnor.
+        With more than one process, the file is split into chunks that a pool of processes parse, sanitising the
+        descriptions, while this process builds the Episodes in file order."""
+        if processes > 1:
+            records = parse_episodes_in_parallel(self.__episodes_filename, processes)
+        else:
+            records = episode_records(read_csv_file(self.__episodes_filename))
+
+        # Repeated audio URLs and upload times are shared between episodes rather than held once per row.
+        audio_urls = dict()
+        upload_dates = dict()   # Date string: datetime. Each distinct date is only parsed once.
+        for episode_id, podcast_id, title, audio, length, description, snippet, date_string in records:
+            upload_date = upload_dates.get(date_string)
+            if upload_date is None:
+                upload_date = upload_dates[date_string] = to_strptime(date_string)
+            episode = Episode.trusted(
+                episode_id=episode_id,
+                podcast=self.podcasts.get(podcast_id),
+                title=title,
+                audio=audio_urls.setdefault(audio, audio),
+                length=length,
+                description=description,
+                upload_date=upload_date,
+                snippet=snippet,
             )
             self.episodes.append(episode)
 
@@ -46,27 +79,31 @@ class CSVDataReader:
         # TODO: Set this Author as the default Author object when Author missing from Podcast.
         blank_author = missing_author()
         self.authors[blank_author.name] = blank_author.id
+        self.author_objects[blank_author.name] = blank_author
 
         author_id = 2  # ID of 1 is reserved for "missing" authors.
         for data_row in read_csv_file(self.__podcasts_filename):
 
-            author_name = data_row[7].strip()
+            author_name = sys.intern(data_row[7])
             # Checks if author exists. If so, proceed as normal. Else, no author is added.
             if len(author_name) > 0:
                 # Checking if the author is in the dict
                 if author_name not in self.authors:
                     self.authors[author_name] = author_id
+                    self.author_objects[author_name] = Author.trusted(author_id, author_name)
                     author_id += 1
 
     def load_podcasts(self, database_mode: bool = False):
         categories_and_podcasts = dict()
+        urls = dict()   # Image and website URLs repeated between podcasts are shared.
 
         self.load_authors()
 
         for data_row in read_csv_file(self.__podcasts_filename):
+            check_podcast_row(data_row)
 
             podcast_key = int(data_row[0])
-            podcast_categories = [category_name.strip() for category_name in data_row[5].split("|")]
+            podcast_categories = category_names(data_row)
 
             # Add new categories; associate the current Podcast with categories.
             for category in podcast_categories:
@@ -74,22 +111,22 @@ class CSVDataReader:
                     categories_and_podcasts[category] = list()
                 categories_and_podcasts[category].append(podcast_key)
 
-            # Create Author object.
+            # Use the shared Author object.
             if data_row[7] == "" or data_row[7] is None:
-                author = missing_author()
+                author = self.author_objects[missing_author().name]
             else:
-                author = Author(self.authors[data_row[7]], data_row[7])
+                author = self.author_objects[data_row[7]]
 
-            # Create Podcast object.
-            podcast = Podcast(
+            # Create Podcast object. Languages are few, so they are interned like author and category names.
+            podcast = Podcast.trusted(
                 podcast_id=int(data_row[0]),
                 author=author,
                 title=data_row[1],
-                image=data_row[2],
+                image=urls.setdefault(data_row[2], data_row[2]),
                 description=data_row[3],
-                website=data_row[6],
+                website=urls.setdefault(data_row[6], data_row[6]),
                 itunes_id=int(data_row[8]),
-                language=data_row[4],
+                language=sys.intern(data_row[4]),
             )
             self.podcasts[podcast.id] = podcast
 
@@ -97,14 +134,14 @@ class CSVDataReader:
 
         # Create category objects, associate them with Podcasts.
         for category_name in categories_and_podcasts.keys():
-            category = Category(category_id, category_name)
+            category = Category.trusted(category_id, category_name)
             for podcast_id in categories_and_podcasts[category_name]:
                 podcast = self.podcasts[podcast_id]
                 if database_mode is True:
                     # The ORM takes care of the association between podcasts and categories
                     podcast.add_category(category)
                 else:
-                    make_category_association(podcast, category)
+                    make_trusted_category_association(podcast, category)
             self.categories[category_id] = category
             category_id += 1
 
@@ -115,18 +152,140 @@ def read_csv_file(filename: str):
         reader = csv.reader(infile)
         headers = next(reader)
         for row in reader:
-            row = [item.strip() for item in row]
-            yield row
+            yield list(map(str.strip, row))
+
+
+def episode_records(rows: Iterable[List[str]]) -> Iterator[tuple]:
+    """Checks episodes.csv rows and yields (id, podcast id, title, audio, length, sanitised description, snippet,
+    upload date string) for each, as load_episodes builds its Episodes from."""
+    for row in rows:
+        check_episode_row(row)
+        description = normalise_description(row[5])
+        yield (int(row[0]), int(row[1]), row[2], row[3], int(row[4]), description.body, description.snippet,
+               row[6])
+
+
+def split_records(data: bytes, chunk_bytes: int = CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """Splits CSV data into (start, end) ranges of at least chunk_bytes (bar the last) that each end with a whole
+    record. A record ends at a newline outside quotes; quotes inside a field are doubled, so a newline is outside
+    quotes when an even number of quote characters lie between it and the start of the range."""
+    ranges = []
+    start = 0
+    while start < len(data):
+        end = start + chunk_bytes
+        if end >= len(data):
+            ranges.append((start, len(data)))
+            break
+        quotes = data.count(b'"', start, end)
+        while True:
+            newline = data.find(b'\n', end)
+            if newline == -1:
+                newline = len(data) - 1
+                break
+            quotes += data.count(b'"', end, newline)
+            if quotes % 2 == 0:
+                break
+            end = newline + 1
+        ranges.append((start, newline + 1))
+        start = newline + 1
+    return ranges
+
+
+def parse_episode_chunk(filename: str, start: int, end: int) -> List[tuple]:
+    """Returns the episode_records of the rows between byte offsets start and end of an episodes.csv file."""
+    with open(filename, 'rb') as infile:
+        infile.seek(start)
+        data = infile.read(end - start).decode('utf-8')
+    rows = (list(map(str.strip, row)) for row in csv.reader(io.StringIO(data, newline='')))
+    return list(episode_records(rows))
+
+
+def parse_episodes_in_parallel(filename: str, processes: int, chunk_bytes: int = CHUNK_BYTES) -> Iterator[tuple]:
+    """Yields the episode_records of every row of an episodes.csv file, in file order, parsed by a pool of
+    processes a chunk at a time."""
+    with open(filename, 'rb') as infile:
+        data = infile.read()
+    # The header is skipped along with any byte order mark before it, as read_csv_file does.
+    header_end = data.find(b'\n')
+    if header_end == -1:
+        return
+    first_record = header_end + 1
+    ranges = [(first_record + start, first_record + end) for start, end in split_records(data[first_record:],
+                                                                                       chunk_bytes)]
+    del data
+    with ProcessPoolExecutor(processes) as pool:
+        chunks = pool.map(parse_episode_chunk, repeat(filename), [start for start, _ in ranges],
+                          [end for _, end in ranges])
+        yield from chain.from_iterable(chunks)
+
+
+def check_podcast_row(row: List[str]):
+    """Checks a podcasts.csv row before its Podcast is built with Podcast.trusted."""
+    # Spelled out for the rows that are fine; check_row finds what is wrong with the others.
+    if not (len(row) == PODCAST_COLUMNS and is_digits(row[0]) and is_digits(row[8]) and row[1]):
+        check_row(row, PODCAST_COLUMNS, PODCAST_INTEGER_COLUMNS, PODCAST_TEXT_COLUMNS)
+
+
+def check_episode_row(row: List[str]):
+    """Checks an episodes.csv row before its Episode is built with Episode.trusted."""
+    if not (len(row) == EPISODE_COLUMNS and is_digits(row[0]) and is_digits(row[1]) and is_digits(row[4])
+            and row[2]):
+        check_row(row, EPISODE_COLUMNS, EPISODE_INTEGER_COLUMNS, EPISODE_TEXT_COLUMNS)
+
+
+def category_names(row: List[str]) -> List[str]:
+    """Returns the category names of a checked podcasts.csv row, which must be neither empty nor repeated."""
+    names = [sys.intern(category_name.strip()) for category_name in row[5].split("|")]
+    if not all(names):
+        raise ValueError(f"Podcast {row[0]} has an empty category name.")
+    if len(set(names)) != len(names):
+        raise ModelException(f"Podcast {row[0]} lists a category more than once.")
+    return names
+
+
+def is_digits(text: str) -> bool:
+    """True if text is a non-negative integer int() can read. str.isdigit alone also accepts digits such as
+    '²' that int() rejects."""
+    return text.isascii() and text.isdigit()
+
+
+def check_row(row: List[str], columns: int, integer_columns, text_columns):
+    """Checks a row read by read_csv_file against a file's columns, raising ValueError for the first problem."""
+    if len(row) != columns:
+        raise ValueError(f"Row {row[:1]} has {len(row)} columns, expected {columns}.")
+    for column, name in integer_columns:
+        if not is_digits(row[column]):
+            raise ValueError(f"{name} '{row[column]}' must be a non-negative integer.")
+    for column, name in text_columns:
+        if not row[column]:
+            raise ValueError(f"{name} must be a non-empty string.")
 
 
 def to_strptime(date_string: str):
     """Converts the string format of datetime from episodes.csv into strptime datetime object."""
+    # Dates in episodes.csv look like '2017-12-01 00:09:47+00'; those are sliced apart, which is much faster than
+    # strptime. strptime still reads anything else.
+    if (len(date_string) == 22 and date_string[4] == date_string[7] == '-' and date_string[10] == ' '
+            and date_string[13] == date_string[16] == ':' and date_string[19] in '+-'):
+        digits = (date_string[:4] + date_string[5:7] + date_string[8:10] + date_string[11:13] + date_string[14:16]
+                  + date_string[17:19] + date_string[20:])
+        if is_digits(digits):
+            return datetime(int(digits[:4]), int(digits[4:6]), int(digits[6:8]), int(digits[8:10]),
+                            int(digits[10:12]), int(digits[12:14]), tzinfo=utc_offset(date_string[19:]))
     date_format = "%Y-%m-%d %H:%M:%S%z"
     date_strp = date_string
     date_strp += "00"  # Makes +UTC valid format without adding information
     return datetime.strptime(date_strp, date_format)
 
 
+def utc_offset(offset: str) -> timezone:
+    """The timezone of a '+HH' or '-HH' offset, as strptime gives for '%z'."""
+    hours = int(offset[1:])
+    if hours == 0:
+        return timezone.utc
+    return timezone(timedelta(hours=-hours if offset[0] == '-' else hours))
+
+
 def missing_author():
     return Author(1, "MISSING: No Author provided")
 
@@ -0,0 +1,114 @@
+import mmap
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Union
+
+# Descriptions shorter than this stay in memory, as a handle and its offset would take about as much room.
+MIN_STORED_LENGTH = 64
+
+# Number of descriptions DescriptionFile keeps decoded by default.
+DEFAULT_CACHED_DESCRIPTIONS = 256
+
+
+class DescriptionFile:
+    """ Episode descriptions kept in an unnamed temporary file instead of in memory, for MemoryRepository.
+
+    Texts are appended to the file as UTF-8 at ingest, and only their end offsets are kept. Reading one maps
+    the file with mmap (mapping it again once it has grown) and decodes just that text; the most recently read
+    cached_descriptions texts are kept decoded. The file is deleted when it is closed or garbage collected.
+    add and get match StringTable, so ColumnarEpisodeStore can keep its descriptions here too.
+
+    Request threads read descriptions while reviews and episodes are added, so the file, its map and the
+    cache are only used with a lock held.
+    """
+
+    def __init__(self, cached_descriptions: int = DEFAULT_CACHED_DESCRIPTIONS):
+        self.__file = tempfile.TemporaryFile()
+        self.__offsets = array('q', [0])
+        self.__map = None
+        self.__cache: OrderedDict = OrderedDict()
+        self.cached_descriptions = cached_descriptions
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+
+    def add(self, text: str) -> int:
+        """ Writes text to the file and returns the handle to read it back with. """
+        data = text.encode('utf-8')
+        with self.__lock:
+            self.__file.write(data)
+            self.__offsets.append(self.__offsets[-1] + len(data))
+            return len(self.__offsets) - 2
+
+    def put(self, text: str) -> Union[str, int]:
+        """ Returns what to keep in place of text: text itself if it is short, else the handle it was added
+        with. """
+        if text is None or len(text) < MIN_STORED_LENGTH:
+            return text
+        return self.add(text)
+
+    def get(self, handle: int) -> str:
+        with self.__lock:
+            text = self.__cache.get(handle)
+            if text is not None:
+                self.__cache.move_to_end(handle)
+                self.hits += 1
+                return text
+            self.misses += 1
+            start, end = self.__offsets[handle], self.__offsets[handle + 1]
+            if start == end:
+                return ''
+            if self.__map is None or len(self.__map) < end:
+                self.__remap()
+            text = self.__map[start:end].decode('utf-8')
+            self.__cache[handle] = text
+            if len(self.__cache) > self.cached_descriptions:
+                self.__cache.popitem(last=False)
+            return text
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """ Bytes held in memory: the offsets and the decoded cache, not the file. """
+        return self.__offsets.itemsize * len(self.__offsets) + sum(len(text) for text in self.__cache.values())
+
+    @property
+    def file_size(self) -> int:
+        return self.__offsets[-1]
+
+    def close(self):
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+            self.__file.close()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {'size': len(self), 'file_bytes': self.file_size, 'cached': len(self.__cache),
+                    'hits': self.hits, 'misses': self.misses}
+
+    def __getstate__(self):
+        # Pickled (e.g. into a repository snapshot) with the file's contents; the copy gets a file of its own,
+        # and a lock of its own through __init__.
+        with self.__lock:
+            self.__file.flush()
+            self.__file.seek(0)
+            data = self.__file.read()
+            return {'data': data, 'offsets': self.__offsets, 'cached_descriptions': self.cached_descriptions}
+
+    def __setstate__(self, state):
+        self.__init__(state['cached_descriptions'])
+        self.__file.write(state['data'])
+        self.__offsets = state['offsets']
+
+    def __remap(self):
+        # Only called with the lock held.
+        self.__file.flush()
+        if self.__map is not None:
+            self.__map.close()
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
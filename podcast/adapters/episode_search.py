@@ -0,0 +1,131 @@
+import math
+import re
+from array import array
+from heapq import nsmallest
+from typing import Dict, List, Optional, Tuple
+
+from podcast.domainmodel.descriptions import html_to_text
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+# Title words count this many times towards an Episode's term frequencies.
+TITLE_WEIGHT = 3
+
+# BM25 parameters: how quickly repeated terms stop adding to the score, and how much long texts are penalised.
+K1 = 1.2
+B = 0.75
+
+# Term frequencies are stored as unsigned shorts.
+MAX_TERM_FREQUENCY = 65535
+
+
+def terms(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class EpisodeSearchIndex:
+    """ Ranked full-text index over Episode titles and descriptions.
+
+    Descriptions are stripped of their HTML once, when an Episode is added, and only the term counts are
+    kept. Each Episode gets a dense ordinal, and each term keeps two parallel arrays: the ordinals of the
+    Episodes containing it and how often it occurs in each. Queries match Episodes containing every query
+    term and rank them with BM25, so rare terms and short, focused descriptions score higher.
+    Removed Episodes leave a gap in the ordinals and are skipped at query time.
+    """
+
+    def __init__(self):
+        self.__ordinals: Dict[int, int] = dict()
+        self.__episode_ids: List[Optional[int]] = []
+        self.__lengths = array('I')
+        self.__postings: Dict[str, Tuple[array, array]] = dict()
+        self.__total_length = 0
+
+    def add(self, episode):
+        self.add_text(episode.id, episode.title, episode.description)
+
+    def add_text(self, episode_id: int, title: str, description: str):
+        if episode_id in self.__ordinals:
+            self.remove_id(episode_id)
+        frequencies = dict()
+        for term in terms(title):
+            frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+        for term in terms(html_to_text(description or '')):
+            frequencies[term] = frequencies.get(term, 0) + 1
+
+        ordinal = len(self.__episode_ids)
+        self.__ordinals[episode_id] = ordinal
+        self.__episode_ids.append(episode_id)
+        length = sum(frequencies.values())
+        self.__lengths.append(length)
+        self.__total_length += length
+        for term, frequency in frequencies.items():
+            postings = self.__postings.get(term)
+            if postings is None:
+                postings = self.__postings[term] = (array('I'), array('H'))
+            postings[0].append(ordinal)
+            postings[1].append(min(frequency, MAX_TERM_FREQUENCY))
+
+    def remove(self, episode):
+        self.remove_id(episode.id)
+
+    def remove_id(self, episode_id: int):
+        ordinal = self.__ordinals.pop(episode_id, None)
+        if ordinal is not None:
+            self.__episode_ids[ordinal] = None
+            self.__total_length -= self.__lengths[ordinal]
+
+    def __len__(self):
+        return len(self.__ordinals)
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[List[int], int]:
+        """ Returns the ids of one page of matching Episodes, best match first, and the number of matches. """
+        query_terms = set(terms(query))
+        if len(query_terms) == 0 or len(self.__ordinals) == 0:
+            return [], 0
+        posting_lists = []
+        for term in query_terms:
+            postings = self.__postings.get(term)
+            if postings is None:
+                return [], 0
+            posting_lists.append(postings)
+        posting_lists.sort(key=lambda postings: len(postings[0]))
+
+        scores = None
+        for ordinals, frequencies in posting_lists:
+            term_scores = self.__term_scores(ordinals, frequencies, scores)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {ordinal: scores[ordinal] + score for ordinal, score in term_scores.items()}
+            if len(scores) == 0:
+                return [], 0
+
+        episode_ids = self.__episode_ids
+        best = nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], episode_ids[item[0]]))
+        return [episode_ids[ordinal] for ordinal, _ in best[offset:]], len(scores)
+
+    def __term_scores(self, ordinals: array, frequencies: array, candidates: Optional[dict]) -> Dict[int, float]:
+        document_count = len(self.__ordinals)
+        # Postings of removed Episodes are still counted, so cap the document frequency to keep idf positive.
+        document_frequency = min(len(ordinals), document_count)
+        idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = self.__total_length / document_count
+        episode_ids = self.__episode_ids
+        lengths = self.__lengths
+        scores = dict()
+        for ordinal, frequency in zip(ordinals, frequencies):
+            if episode_ids[ordinal] is None or (candidates is not None and ordinal not in candidates):
+                continue
+            length_norm = K1 * (1 - B + B * lengths[ordinal] / average_length)
+            scores[ordinal] = idf * frequency * (K1 + 1) / (frequency + length_norm)
+        return scores
+
+    def stats(self) -> dict:
+        postings_bytes = sum(ordinals.itemsize * len(ordinals) + frequencies.itemsize * len(frequencies)
+                             for ordinals, frequencies in self.__postings.values())
+        return {
+            'episodes': len(self.__ordinals),
+            'terms': len(self.__postings),
+            'postings': sum(len(ordinals) for ordinals, _ in self.__postings.values()),
+            'postings_bytes': postings_bytes,
+        }
@@ -0,0 +1,343 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from podcast.domainmodel.model import Episode
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Number of materialised Episodes ColumnarEpisodeStore keeps by default.
+DEFAULT_CACHED_EPISODES = 1024
+
+# Beyond any upload time a key holds, so (podcast id, -MAX_KEY) sorts before every key of that Podcast.
+MAX_KEY = 1 << 63
+
+
+def to_microseconds(moment: datetime) -> int:
+    """ Microseconds since the epoch. Naive datetimes are taken to be UTC, as in episode_date_key. """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class StringTable:
+    """ Strings packed end to end into one UTF-8 buffer, each found through its start offset.
+
+    A string costs its encoded bytes plus one 8 byte offset, rather than a str object of its own. Strings are
+    only ever appended; a row that stops using one leaves its bytes in place.
+    """
+
+    def __init__(self):
+        self.__data = bytearray()
+        self.__offsets = array('q', [0])
+
+    def add(self, text: str) -> int:
+        """ Stores text and returns the handle to read it back with. """
+        self.__data += text.encode('utf-8')
+        self.__offsets.append(len(self.__data))
+        return len(self.__offsets) - 2
+
+    def get(self, handle: int) -> str:
+        return self.__data[self.__offsets[handle]:self.__offsets[handle + 1]].decode('utf-8')
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.__data) + self.__offsets.itemsize * len(self.__offsets)
+
+
+class ColumnarEpisodeStore:
+    """ Episodes held as rows of parallel arrays rather than as Episode objects, for MemoryRepository.
+
+    Rows are kept in episode id order. Ids, podcast ids, upload times (microseconds since the epoch) and
+    lengths are array('q') columns; titles, audio links and descriptions live in StringTables, with the
+    row holding each string's handle. Each upload time's UTC offset is kept too, so an Episode is rebuilt
+    with the offset it was stored with (as a fixed offset; the name of a named time zone is not kept).
+    A second set of columns holds every (podcast id, upload time, episode id) key in sorted order, so a
+    Podcast's Episodes and an Episode's neighbours are found by bisecting them.
+
+    Episode objects are only built when asked for, through podcast_lookup for their Podcast, and the most
+    recently used cached_episodes of them are kept so repeated reads of the same Episode return the same
+    object. Reviews are kept per episode id, for the few Episodes that have any. descriptions can be given to
+    keep the descriptions somewhere other than a StringTable, such as a DescriptionFile; it needs the same add
+    and get methods. Snippets have a StringTable of their own, so building an Episode neither sanitises its
+    description again nor reads it: the Episode is given the description's handle and reads the text when it
+    is asked for.
+
+    The scans (ids_uploaded_between, ids_with_length_between) compare a whole column at a
+    time without building any Episodes.
+
+    Request threads share the store, so its public methods hold a lock while they use the columns or the
+    cache: a row added between a bisect and the read after it would otherwise be read at the wrong position.
+    """
+
+    def __init__(self, podcast_lookup: Callable[[int], object], cached_episodes: int = DEFAULT_CACHED_EPISODES,
+                 descriptions=None):
+        self.__podcast_lookup = podcast_lookup
+        self.__ids = array('q')
+        self.__podcast_ids = array('q')
+        self.__uploaded = array('q')
+        # 1 where the upload date was naive, so it is given back without a time zone.
+        self.__naive = bytearray()
+        # Seconds the upload date was ahead of UTC, for the dates that weren't naive.
+        self.__utc_offsets = array('i')
+        self.__lengths = array('q')
+        self.__title_handles = array('q')
+        self.__audio_handles = array('q')
+        self.__description_handles = array('q')
+        self.__snippet_handles = array('q')
+        self.__titles = StringTable()
+        self.__audio = StringTable()
+        self.__descriptions = descriptions if descriptions is not None else StringTable()
+        self.__snippets = StringTable()
+        # Sorted (podcast id, upload time, episode id) keys, a column per part.
+        self.__key_podcast_ids = array('q')
+        self.__key_uploaded = array('q')
+        self.__key_ids = array('q')
+        self.__reviews: Dict[int, list] = dict()
+        self.__counts_by_podcast: Dict[int, int] = dict()
+        self.__cache: OrderedDict = OrderedDict()
+        self.cached_episodes = cached_episodes
+        self.hits = 0
+        self.misses = 0
+        # Reentrant, as get_many calls get and several methods call count_for_podcast.
+        self.__lock = threading.RLock()
+
+    def add(self, episode: Episode):
+        """ Stores episode, replacing any stored Episode with the same id. """
+        with self.__lock:
+            self.__add(episode)
+
+    def __add(self, episode: Episode):
+        row = bisect_left(self.__ids, episode.id)
+        if row < len(self.__ids) and self.__ids[row] == episode.id:
+            self.__delete_row(row)
+        naive = episode.upload_date.tzinfo is None
+        uploaded = to_microseconds(episode.upload_date)
+        utc_offset = 0 if naive else episode.upload_date.utcoffset() // timedelta(seconds=1)
+        values = (
+            (self.__ids, episode.id),
+            (self.__podcast_ids, episode.podcast.id),
+            (self.__uploaded, uploaded),
+            (self.__naive, int(naive)),
+            (self.__utc_offsets, utc_offset),
+            (self.__lengths, episode.length),
+            (self.__title_handles, self.__titles.add(episode.title)),
+            (self.__audio_handles, self.__audio.add(episode.audio)),
+            (self.__description_handles, self.__descriptions.add(episode.description)),
+            (self.__snippet_handles, self.__snippets.add(episode.snippet)),
+        )
+        for column, value in values:
+            column.insert(row, value)
+        key = (episode.podcast.id, uploaded, episode.id)
+        position = self.__key_position(key)
+        for column, value in zip(self.__key_columns(), key):
+            column.insert(position, value)
+        self.__counts_by_podcast[episode.podcast.id] = self.count_for_podcast(episode.podcast.id) + 1
+        if episode.reviews:
+            self.__reviews[episode.id] = list(episode.reviews)
+        self.__cache.pop(episode.id, None)
+
+    def remove(self, episode_id: int):
+        with self.__lock:
+            row = self.__row(episode_id)
+            if row is not None:
+                self.__delete_row(row)
+                self.__reviews.pop(episode_id, None)
+                self.__cache.pop(episode_id, None)
+
+    def add_review(self, review):
+        """ Records a Review added to one of the stored Episodes, so it is there when the Episode is rebuilt. """
+        episode_id = review.episode.id
+        with self.__lock:
+            reviews = self.__reviews.setdefault(episode_id, [])
+            if review not in reviews:
+                reviews.append(review)
+            cached = self.__cache.get(episode_id)
+            if cached is not None:
+                cached.add_review(review)
+
+    def get(self, episode_id: int) -> Optional[Episode]:
+        with self.__lock:
+            episode = self.__cache.get(episode_id)
+            if episode is not None:
+                self.__cache.move_to_end(episode_id)
+                self.hits += 1
+                return episode
+            row = self.__row(episode_id)
+            if row is None:
+                return None
+            self.misses += 1
+            episode = self.__materialise(row)
+            self.__cache[episode_id] = episode
+            if len(self.__cache) > self.cached_episodes:
+                self.__cache.popitem(last=False)
+            return episode
+
+    def get_many(self, episode_ids) -> List[Episode]:
+        """ Returns the stored Episodes for the ids that are present, in the order of episode_ids. """
+        episodes = []
+        with self.__lock:
+            for episode_id in episode_ids:
+                episode = self.get(episode_id)
+                if episode is not None:
+                    episodes.append(episode)
+        return episodes
+
+    def __contains__(self, episode_id: int) -> bool:
+        with self.__lock:
+            return self.__row(episode_id) is not None
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def first_id(self) -> Optional[int]:
+        with self.__lock:
+            return self.__ids[0] if self.__ids else None
+
+    def last_id(self) -> Optional[int]:
+        with self.__lock:
+            return self.__ids[-1] if self.__ids else None
+
+    def count_for_podcast(self, podcast_id: int) -> int:
+        return self.__counts_by_podcast.get(podcast_id, 0)
+
+    def ids_for_podcast(self, podcast_id: int) -> array:
+        """ Returns the ids of a Podcast's Episodes, in id order. """
+        with self.__lock:
+            start, end = self.__podcast_positions(podcast_id)
+            return array('q', sorted(self.__key_ids[start:end]))
+
+    def ids_uploaded_between(self, start: datetime, end: datetime) -> array:
+        """ Returns the ids of Episodes uploaded from start up to but not including end, in id order. """
+        start, end = to_microseconds(start), to_microseconds(end)
+        with self.__lock:
+            return array('q', [episode_id for episode_id, uploaded in zip(self.__ids, self.__uploaded)
+                               if start <= uploaded < end])
+
+    def ids_with_length_between(self, shortest: int, longest: int) -> array:
+        """ Returns the ids of Episodes from shortest to longest seconds long, inclusive, in id order. """
+        with self.__lock:
+            return array('q', [episode_id for episode_id, length in zip(self.__ids, self.__lengths)
+                               if shortest <= length <= longest])
+
+    def episode_keys(self, podcast_id: int) -> List[tuple]:
+        """ Returns the (upload timestamp, episode id) keys of a Podcast's Episodes sorted oldest first, like
+        ChronologicalIndex.episode_keys. """
+        with self.__lock:
+            start, end = self.__podcast_positions(podcast_id)
+            return [(uploaded / 1_000_000, episode_id)
+                    for uploaded, episode_id in zip(self.__key_uploaded[start:end], self.__key_ids[start:end])]
+
+    def next_id(self, episode_id: int) -> Optional[int]:
+        """ Returns the id of the Episode of the same Podcast uploaded after the stored Episode episode_id (ties
+        ordered by id), or None if it is the last one or isn't stored. """
+        return self.__adjacent_id(episode_id, 1)
+
+    def previous_id(self, episode_id: int) -> Optional[int]:
+        return self.__adjacent_id(episode_id, -1)
+
+    def __adjacent_id(self, episode_id: int, step: int) -> Optional[int]:
+        with self.__lock:
+            row = self.__row(episode_id)
+            if row is None:
+                return None
+            podcast_id = self.__podcast_ids[row]
+            position = self.__key_position((podcast_id, self.__uploaded[row], episode_id)) + step
+            if 0 <= position < len(self.__key_ids) and self.__key_podcast_ids[position] == podcast_id:
+                return self.__key_ids[position]
+            return None
+
+    def stats(self) -> dict:
+        """ Returns the number of rows, the bytes the columns and string tables take, and cache hits/misses. """
+        columns = (self.__ids, self.__podcast_ids, self.__uploaded, self.__utc_offsets, self.__lengths,
+                   self.__title_handles, self.__audio_handles, self.__description_handles,
+                   self.__snippet_handles) + self.__key_columns()
+        with self.__lock:
+            nbytes = sum(column.itemsize * len(column) for column in columns) + len(self.__naive)
+            nbytes += self.__titles.nbytes + self.__audio.nbytes + self.__snippets.nbytes
+            nbytes += self.__descriptions.nbytes
+            return {'size': len(self.__ids), 'bytes': nbytes, 'cached': len(self.__cache),
+                    'hits': self.hits, 'misses': self.misses}
+
+    def __getstate__(self):
+        # Pickled into repository snapshots; a lock can't be, so the copy is given a new one.
+        state = self.__dict__.copy()
+        del state['_ColumnarEpisodeStore__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.RLock()
+
+    def __row(self, episode_id: int) -> Optional[int]:
+        row = bisect_left(self.__ids, episode_id)
+        if row < len(self.__ids) and self.__ids[row] == episode_id:
+            return row
+        return None
+
+    def __key_columns(self) -> tuple:
+        return self.__key_podcast_ids, self.__key_uploaded, self.__key_ids
+
+    def __key_at(self, position: int) -> tuple:
+        return self.__key_podcast_ids[position], self.__key_uploaded[position], self.__key_ids[position]
+
+    def __key_position(self, key: tuple) -> int:
+        # bisect_left over the key columns, written out since bisect only takes a key function from Python 3.10.
+        low, high = 0, len(self.__key_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.__key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __podcast_positions(self, podcast_id: int) -> Tuple[int, int]:
+        # Where the Podcast's keys start and end; every key of the Podcast sorts between these two.
+        podcast_id = int(podcast_id)
+        if self.count_for_podcast(podcast_id) == 0:
+            return 0, 0
+        return self.__key_position((podcast_id, -MAX_KEY)), self.__key_position((podcast_id, MAX_KEY))
+
+    def __delete_row(self, row: int):
+        podcast_id = self.__podcast_ids[row]
+        position = self.__key_position((podcast_id, self.__uploaded[row], self.__ids[row]))
+        for column in self.__key_columns():
+            del column[position]
+        if self.__counts_by_podcast[podcast_id] > 1:
+            self.__counts_by_podcast[podcast_id] -= 1
+        else:
+            del self.__counts_by_podcast[podcast_id]
+        for column in (self.__ids, self.__podcast_ids, self.__uploaded, self.__naive, self.__utc_offsets,
+                       self.__lengths, self.__title_handles, self.__audio_handles, self.__description_handles,
+                       self.__snippet_handles):
+            del column[row]
+
+    def __materialise(self, row: int) -> Episode:
+        upload_date = EPOCH + timedelta(microseconds=self.__uploaded[row])
+        if self.__naive[row]:
+            upload_date = upload_date.replace(tzinfo=None)
+        elif self.__utc_offsets[row]:
+            upload_date = upload_date.astimezone(timezone(timedelta(seconds=self.__utc_offsets[row])))
+        # The values were checked, and the description sanitised, when their Episode was first built.
+        episode = Episode.trusted(
+            episode_id=self.__ids[row],
+            podcast=self.__podcast_lookup(self.__podcast_ids[row]),
+            title=self.__titles.get(self.__title_handles[row]),
+            audio=self.__audio.get(self.__audio_handles[row]),
+            length=self.__lengths[row],
+            description=self.__description_handles[row],
+            upload_date=upload_date,
+            snippet=self.__snippets.get(self.__snippet_handles[row]),
+        )
+        # The description stays a handle until it is read, as with Episode.keep_description_in.
+        episode._description_store = self.__descriptions
+        for review in self.__reviews.get(episode.id, ()):
+            episode.add_review(review)
+        return episode
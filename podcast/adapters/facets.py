@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, List, Optional
+
+# Facets that Podcasts can be filtered on.
+CATEGORY = 'category'
+LANGUAGE = 'language'
+AUTHOR = 'author'
+FACETS = (CATEGORY, LANGUAGE, AUTHOR)
+
+
+def podcast_facet_values(podcast) -> Dict[str, List[str]]:
+    """ Returns the values a Podcast is filed under for each facet. """
+    values = {
+        CATEGORY: [category.name for category in podcast.categories],
+        LANGUAGE: [podcast.language] if podcast.language else [],
+        AUTHOR: [podcast.author.name] if podcast.author is not None else [],
+    }
+    return values
+
+
+def popcount(bitmap: int) -> int:
+    return bin(bitmap).count('1')
+
+
+class FacetIndex:
+    """ Bitmap index over Podcasts for the category, language and author facets.
+
+    Every Podcast gets a dense ordinal, and each facet value keeps one int whose bit n is set when the
+    Podcast with ordinal n has that value. Filtering on several facets is then a bitwise AND of the
+    matching bitmaps, and facet counts are popcounts of the result ANDed with each value's bitmap.
+    """
+
+    def __init__(self):
+        self.__ordinals: Dict[int, int] = dict()
+        self.__podcast_ids: List[Optional[int]] = []
+        self.__bitmaps: Dict[str, Dict[str, int]] = {facet: dict() for facet in FACETS}
+        self.__all = 0
+
+    def add(self, podcast):
+        ordinal = self.__ordinal_for(podcast.id)
+        for facet, values in podcast_facet_values(podcast).items():
+            for value in values:
+                self.__set_bit(facet, value, ordinal)
+
+    def add_value(self, podcast_id: int, facet: str, value: str):
+        """ Files an already indexed Podcast under one more facet value, e.g. a newly tagged Category. """
+        ordinal = self.__ordinals.get(podcast_id)
+        if ordinal is not None:
+            self.__set_bit(facet, value, ordinal)
+
+    def remove(self, podcast):
+        ordinal = self.__ordinals.pop(podcast.id, None)
+        if ordinal is None:
+            return
+        mask = ~(1 << ordinal)
+        self.__all &= mask
+        for bitmaps in self.__bitmaps.values():
+            for value in [value for value, bitmap in bitmaps.items() if bitmap >> ordinal & 1]:
+                bitmaps[value] &= mask
+                if bitmaps[value] == 0:
+                    del bitmaps[value]
+        # Ordinals are not reused, the slot just stops mapping to a Podcast.
+        self.__podcast_ids[ordinal] = None
+
+    def match(self, filters: Dict[str, str]) -> int:
+        """ Returns the bitmap of Podcasts that have every facet value in filters. """
+        bitmap = self.__all
+        for facet, value in filters.items():
+            bitmap &= self.__bitmaps[facet].get(value, 0)
+            if bitmap == 0:
+                break
+        return bitmap
+
+    def podcast_ids(self, bitmap: int) -> List[int]:
+        """ Returns the Podcast ids for the bits set in bitmap, in ordinal order. """
+        ids = []
+        while bitmap:
+            lowest_bit = bitmap & -bitmap
+            ids.append(self.__podcast_ids[lowest_bit.bit_length() - 1])
+            bitmap ^= lowest_bit
+        return ids
+
+    def counts(self, filters: Dict[str, str], facets: Iterable[str] = FACETS) -> Dict[str, Dict[str, int]]:
+        """ Returns the number of matching Podcasts per value of each facet.
+
+        A facet's own filter is left out when counting its values, so the counts show what selecting a
+        different value would return while the other filters stay in place.
+        """
+        counts = dict()
+        for facet in facets:
+            other_filters = {other: value for other, value in filters.items() if other != facet}
+            bitmap = self.match(other_filters)
+            facet_counts = dict()
+            for value, value_bitmap in self.__bitmaps[facet].items():
+                count = popcount(bitmap & value_bitmap)
+                if count > 0:
+                    facet_counts[value] = count
+            counts[facet] = facet_counts
+        return counts
+
+    def __ordinal_for(self, podcast_id: int) -> int:
+        ordinal = self.__ordinals.get(podcast_id)
+        if ordinal is None:
+            ordinal = len(self.__podcast_ids)
+            self.__podcast_ids.append(podcast_id)
+            self.__ordinals[podcast_id] = ordinal
+            self.__all |= 1 << ordinal
+        return ordinal
+
+    def __set_bit(self, facet: str, value: str, ordinal: int):
+        bitmaps = self.__bitmaps[facet]
+        bitmaps[value] = bitmaps.get(value, 0) | 1 << ordinal
@@ -0,0 +1,147 @@
+import re
+import time
+from typing import Dict, Iterable, List, Set
+
+from podcast.adapters.indexes import approximate_size
+
+# The largest number of edits between a query word and an indexed word that still counts as a match.
+MAX_EDIT_DISTANCE = 2
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def allowed_distance(word: str) -> int:
+    """ Short words get fewer edits, otherwise "the" would match nearly every two or three letter word. """
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 4:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """ Returns word and every string made by deleting up to distance characters from it. """
+    variants = {word}
+    edges = {word}
+    for _ in range(distance):
+        edges = {edge[:i] + edge[i + 1:] for edge in edges for i in range(len(edge))}
+        variants |= edges
+    return variants
+
+
+def edit_distance(first: str, second: str) -> int:
+    """ Optimal string alignment distance: insertions, deletions, substitutions and adjacent swaps. """
+    previous_row = None
+    row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before_previous_row, previous_row = previous_row, row
+        row = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                row[j] = min(row[j], before_previous_row[j - 2] + 1)
+    return row[len(second)]
+
+
+class FuzzyIndex:
+    """ Symmetric deletion dictionary over the words of Podcast titles and author names.
+
+    Every indexed word is stored under each string made by deleting up to two of its characters. Two words
+    within two edits of each other share at least one such deletion, so a misspelled query word is looked
+    up by generating its own deletions, collecting the words filed under them and checking each with a real
+    edit distance. No Podcast is visited unless one of its words is a candidate.
+    """
+
+    def __init__(self):
+        self.__postings: Dict[str, Set[int]] = dict()
+        self.__deletes: Dict[str, Set[str]] = dict()
+        self.__words_by_podcast: Dict[int, Set[str]] = dict()
+        self.__sort_keys: Dict[int, tuple] = dict()
+        self.build_seconds = 0.0
+
+    def add(self, podcast):
+        author_name = podcast.author.name if podcast.author is not None else ''
+        self.add_texts(podcast.id, podcast.title, [podcast.title, author_name])
+
+    def add_texts(self, podcast_id: int, title: str, texts: Iterable[str]):
+        start = time.perf_counter()
+        if podcast_id in self.__sort_keys:
+            self.remove_id(podcast_id)
+        self.__sort_keys[podcast_id] = (title, podcast_id)
+        podcast_words = {word for text in texts for word in words(text)}
+        self.__words_by_podcast[podcast_id] = podcast_words
+        for word in podcast_words:
+            postings = self.__postings.get(word)
+            if postings is None:
+                postings = self.__postings[word] = set()
+                for variant in deletes(word, MAX_EDIT_DISTANCE):
+                    self.__deletes.setdefault(variant, set()).add(word)
+            postings.add(podcast_id)
+        self.build_seconds += time.perf_counter() - start
+
+    def remove(self, podcast):
+        self.remove_id(podcast.id)
+
+    def remove_id(self, podcast_id: int):
+        if self.__sort_keys.pop(podcast_id, None) is None:
+            return
+        for word in self.__words_by_podcast.pop(podcast_id):
+            postings = self.__postings[word]
+            postings.discard(podcast_id)
+            if len(postings) == 0:
+                del self.__postings[word]
+                for variant in deletes(word, MAX_EDIT_DISTANCE):
+                    variant_words = self.__deletes[variant]
+                    variant_words.discard(word)
+                    if len(variant_words) == 0:
+                        del self.__deletes[variant]
+
+    def similar_words(self, query_word: str) -> Dict[str, int]:
+        """ Returns the indexed words within the allowed distance of query_word, with their distances. """
+        distance = allowed_distance(query_word)
+        matches = dict()
+        checked = set()
+        for variant in deletes(query_word, distance):
+            for word in self.__deletes.get(variant, ()):
+                if word not in checked and abs(len(word) - len(query_word)) <= distance:
+                    checked.add(word)
+                    word_distance = edit_distance(query_word, word)
+                    if word_distance <= distance:
+                        matches[word] = word_distance
+        return matches
+
+    def search(self, query: str) -> List[int]:
+        """ Returns the ids of Podcasts having a close match for every word of query, in their title or
+        author name. Closer matches come first, then Podcasts are ordered by title. """
+        distances = None
+        for query_word in words(query):
+            word_distances = dict()
+            for word, distance in self.similar_words(query_word).items():
+                for podcast_id in self.__postings[word]:
+                    if distance < word_distances.get(podcast_id, distance + 1):
+                        word_distances[podcast_id] = distance
+            if distances is None:
+                distances = word_distances
+            else:
+                distances = {podcast_id: distances[podcast_id] + distance
+                             for podcast_id, distance in word_distances.items() if podcast_id in distances}
+            if len(distances) == 0:
+                return []
+        if distances is None:
+            return []
+        return sorted(distances, key=lambda podcast_id: (distances[podcast_id], self.__sort_keys[podcast_id]))
+
+    def stats(self) -> dict:
+        return {
+            'podcasts': len(self.__sort_keys),
+            'words': len(self.__postings),
+            'deletes': len(self.__deletes),
+            'build_seconds': self.build_seconds,
+            'approximate_bytes': approximate_size([self.__postings, self.__deletes, self.__words_by_podcast,
+                                                   self.__sort_keys]),
+        }
@@ -0,0 +1,207 @@
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import timezone
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from podcast.adapters.episode_store import to_microseconds
+
+
+class HashIndex:
+    """ A dict-backed secondary index used by the MemoryRepository.
+
+    Maps a key, derived from each stored object by key_function, to that object. Lookups are counted so
+    the repository can report how often each index is used (see MemoryRepository.get_index_stats).
+    If keep_first is True, adding a second object under an existing key leaves the first one in place,
+    which mirrors the "first match wins" behaviour of the linear scans the indexes replaced.
+    """
+
+    def __init__(self, name: str, key_function: Callable, keep_first: bool = False):
+        self.__name = name
+        self.__key_function = key_function
+        self.__keep_first = keep_first
+        self.__entries: Dict[Hashable, object] = dict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    def key_for(self, item) -> Hashable:
+        return self.__key_function(item)
+
+    def add(self, item):
+        key = self.__key_function(item)
+        if self.__keep_first and key in self.__entries:
+            return
+        self.__entries[key] = item
+
+    def remove(self, item):
+        key = self.__key_function(item)
+        # Only drop the entry if it actually points at this item.
+        if self.__entries.get(key) is item:
+            del self.__entries[key]
+
+    def get(self, key: Hashable) -> Optional[object]:
+        item = self.__entries.get(key)
+        if item is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return item
+
+    def get_many(self, keys: Iterable[Hashable]) -> list:
+        """ Returns the stored objects for the keys that are present, in the order of keys. """
+        items = []
+        for key in keys:
+            item = self.get(key)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__entries
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def clear(self):
+        self.__entries.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self.__entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def casefold_key(value: str) -> str:
+    return value.casefold()
+
+
+class ChronologicalIndex:
+    """ Keeps the Episodes of each Podcast ordered by upload date, for previous/next navigation.
+
+    Each Podcast id maps to a sorted list of (upload timestamp, episode id) keys, so finding an Episode's
+    neighbours is a bisect rather than a walk over every stored Episode. Ties on upload date are broken by
+    episode id.
+    """
+
+    def __init__(self):
+        self.__keys_by_podcast: Dict[int, list] = dict()
+
+    def add(self, episode):
+        keys = self.__keys_by_podcast.setdefault(episode.podcast.id, [])
+        key = episode_date_key(episode)
+        index = bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            keys.insert(index, key)
+
+    def remove(self, episode):
+        keys = self.__keys_by_podcast.get(episode.podcast.id)
+        if keys is None:
+            return
+        key = episode_date_key(episode)
+        index = bisect_left(keys, key)
+        if index != len(keys) and keys[index] == key:
+            del keys[index]
+        if len(keys) == 0:
+            del self.__keys_by_podcast[episode.podcast.id]
+
+    def next_id(self, episode) -> Optional[int]:
+        keys, index = self.__locate(episode)
+        if keys is None or index + 1 >= len(keys):
+            return None
+        return keys[index + 1][1]
+
+    def previous_id(self, episode) -> Optional[int]:
+        keys, index = self.__locate(episode)
+        if keys is None or index == 0:
+            return None
+        return keys[index - 1][1]
+
+    def episode_ids(self, podcast_id: int) -> List[int]:
+        """ Returns the ids of a Podcast's Episodes, oldest first. """
+        return [key[1] for key in self.__keys_by_podcast.get(podcast_id, [])]
+
+    def episode_keys(self, podcast_id: int) -> List[tuple]:
+        """ Returns the sorted (upload timestamp, episode id) keys of a Podcast's Episodes. Don't modify it. """
+        return self.__keys_by_podcast.get(podcast_id, [])
+
+    def __locate(self, episode):
+        keys = self.__keys_by_podcast.get(episode.podcast.id)
+        if keys is None:
+            return None, -1
+        key = episode_date_key(episode)
+        index = bisect_left(keys, key)
+        if index == len(keys) or keys[index] != key:
+            # Episode isn't stored in this index.
+            return None, -1
+        return keys, index
+
+
+class RangeIndex:
+    """ Keeps Episode ids sorted by an integer value of each Episode, such as its length, for range queries.
+
+    The (value, episode id) keys are held in two parallel array('q') columns sorted by value, then id. A range
+    query bisects the values for its two ends and sorts the ids in between, rather than checking every Episode.
+    """
+
+    def __init__(self, key_function: Callable):
+        self.__key_function = key_function
+        self.__values = array('q')
+        self.__ids = array('q')
+
+    def add(self, episode):
+        position, found = self.__locate(self.__key_function(episode), episode.id)
+        if not found:
+            self.__values.insert(position, self.__key_function(episode))
+            self.__ids.insert(position, episode.id)
+
+    def remove(self, episode):
+        position, found = self.__locate(self.__key_function(episode), episode.id)
+        if found:
+            del self.__values[position]
+            del self.__ids[position]
+
+    def ids_between(self, low: int, high: int) -> List[int]:
+        """ Returns the ids of Episodes whose value is from low up to but not including high, in id order. """
+        if low >= high:
+            return []
+        return sorted(self.__ids[bisect_left(self.__values, low):bisect_left(self.__values, high)])
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __locate(self, value: int, episode_id: int) -> tuple:
+        # Keys with the same value are in id order, so the id is bisected for among them.
+        start = bisect_left(self.__values, value)
+        end = bisect_left(self.__values, value + 1, start)
+        position = bisect_left(self.__ids, episode_id, start, end)
+        return position, position < end and self.__ids[position] == episode_id
+
+
+def episode_date_key(episode) -> tuple:
+    upload_date = episode.upload_date
+    if upload_date.tzinfo is None:
+        # Dates parsed from episodes.csv carry a UTC offset; treat naive dates as UTC so they can be compared.
+        upload_date = upload_date.replace(tzinfo=timezone.utc)
+    return upload_date.timestamp(), episode.id
+
+
+def upload_time_key(episode) -> int:
+    """ Microseconds since the epoch of an Episode's upload date, with naive dates taken to be UTC. """
+    return to_microseconds(episode.upload_date)
+
+
+def approximate_size(value, seen=None) -> int:
+    """ Adds up sys.getsizeof over value and the containers and strings it holds. """
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(key, seen) + approximate_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, seen) for item in value)
+    return size
@@ -1,55 +1,150 @@
 from pathlib import Path
 from datetime import date, datetime
+from operator import attrgetter
 from typing import List
 
 from bisect import bisect, bisect_left, insort_left
 
 from werkzeug.security import generate_password_hash
 
-from podcast.adapters.repository import AbstractRepository, RepositoryException
+from podcast.adapters.repository import AbstractRepository, RepositoryException, new_version
+from podcast.adapters.indexes import HashIndex, ChronologicalIndex, RangeIndex, casefold_key, upload_time_key
+from podcast.adapters.facets import FacetIndex, CATEGORY, LANGUAGE, FACETS
+from podcast.adapters.search_index import PodcastSearchIndex
+from podcast.adapters.autocomplete import PrefixIndex
+from podcast.adapters.fuzzy_index import FuzzyIndex
+from podcast.adapters.episode_search import EpisodeSearchIndex
+from podcast.adapters.episode_store import ColumnarEpisodeStore, to_microseconds
+from podcast.adapters.description_file import DescriptionFile
+from podcast.adapters.paging import Page, decode_cursor, page_of, start_of_page
 from podcast.domainmodel.model import *
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
 
 
+def username_key(user: User) -> str:
+    return casefold_key(user.username)
+
+
 class MemoryRepository(AbstractRepository):
     #  ids all assumed unique.
 
-    def __init__(self):
+    def __init__(self, columnar_episodes: bool = False, lazy_descriptions: bool = False):
+        """ With columnar_episodes, Episodes are kept in a ColumnarEpisodeStore and only built when they are read,
+        which takes far less memory for large catalogues. Podcasts are then not given their Episodes
+        (Podcast.episodes stays empty, as it would keep every Episode alive); use get_episode_page instead.
+        With lazy_descriptions, Episode descriptions are written to a DescriptionFile as they are added and only
+        read back from it when an Episode's description is asked for; snippets stay in memory. Each description
+        is still sanitised as it is read in, for its snippet and the search index, so this only saves the memory
+        the sanitised bodies take (about 1 MB for the full dataset), not ingest time.
+        """
         self.__authors = list()
+        self.__authors_index = HashIndex('authors_by_name', attrgetter('name'), keep_first=True)
         self.__podcasts = list()
-        self.__podcasts_index = dict()
+        self.__podcasts_index = HashIndex('podcasts_by_id', attrgetter('id'))
+        # (title, id) of every Podcast, sorted, for paging through the podcast list.
+        self.__podcast_keys = list()
+        self.__podcast_versions = dict()
+        self.__podcast_summaries = dict()
+        self.__podcast_facets = FacetIndex()
+        self.__podcast_search_index = PodcastSearchIndex()
+        self.__podcast_prefixes = PrefixIndex(self._number_of_episodes)
+        # Built on demand, see build_fuzzy_index.
+        self.__fuzzy_index = None
         self.__categories = list()
-        self.__categories_index = dict()
+        self.__categories_index = HashIndex('categories_by_name', attrgetter('name'), keep_first=True)
         self.__users = list()
-        self.__users_index = dict()
+        self.__users_index = HashIndex('users_by_name', username_key)
         self.__subscriptions = list()
         self.__subscriptions_index = dict()
         self.__episodes = list()
-        self.__episodes_index = dict()
+        self.__episodes_index = HashIndex('episodes_by_id', attrgetter('id'))
+        self.__episodes_by_date = ChronologicalIndex()
+        self.__episodes_by_upload_time = RangeIndex(upload_time_key)
+        self.__episodes_by_length = RangeIndex(attrgetter('length'))
+        self.__episode_search_index = EpisodeSearchIndex()
+        self.__description_file = DescriptionFile() if lazy_descriptions else None
+        self.__episode_store = None
+        if columnar_episodes:
+            self.__episode_store = ColumnarEpisodeStore(self.__podcasts_index.get,
+                                                        descriptions=self.__description_file)
         self.__reviews = list()
         self.__playlists = list()
+        self.record_mutation()
 
     def add_author(self, author: Author):
         self.__authors.append(author)
+        self.__authors_index.add(author)
+        self.record_mutation()
 
     def get_author(self, author_name) -> Author:
-        return next((author for author in self.__authors if author.name == author_name), None)
+        return self.__authors_index.get(author_name)
 
     def add_podcast(self, podcast: Podcast):
-        if podcast not in self.__podcasts:
+        if podcast.id not in self.__podcasts_index:
             if podcast.author is not None:
                 podcast.author.add_podcast(podcast)
             insort_left(self.__podcasts, podcast)
-            self.__podcasts_index[podcast.id] = podcast
+            self.__podcasts_index.add(podcast)
+            insort_left(self.__podcast_keys, (podcast.title, podcast.id))
+            self.__podcast_versions[podcast.id] = new_version()
+            self.__podcast_summaries[podcast.id] = PodcastSummary.of(podcast)
+            self.__podcast_facets.add(podcast)
+            self.__podcast_search_index.add(podcast)
+            self.__podcast_prefixes.add(podcast)
+            if self.__fuzzy_index is not None:
+                self.__fuzzy_index.add(podcast)
+            self.record_mutation()
+
+    def remove_podcast(self, podcast: Podcast):
+        """ Removes a Podcast, and the Episodes stored under it, from the repository. """
+        stored_podcast = self.__podcasts_index.get(podcast.id)
+        if stored_podcast is None:
+            return
+        if self.__episode_store is not None:
+            for episode_id in self.__episode_store.ids_for_podcast(stored_podcast.id):
+                self.remove_episode(self.__episode_store.get(episode_id))
+        for episode in list(stored_podcast.episodes):
+            self.remove_episode(episode)
+        self.__podcasts.remove(stored_podcast)
+        self.__podcasts_index.remove(stored_podcast)
+        del self.__podcast_keys[bisect_left(self.__podcast_keys, (stored_podcast.title, stored_podcast.id))]
+        del self.__podcast_versions[stored_podcast.id]
+        del self.__podcast_summaries[stored_podcast.id]
+        self.__podcast_facets.remove(stored_podcast)
+        self.__podcast_search_index.remove(stored_podcast)
+        self.__podcast_prefixes.remove(stored_podcast)
+        if self.__fuzzy_index is not None:
+            self.__fuzzy_index.remove(stored_podcast)
+        if stored_podcast.author is not None:
+            stored_podcast.author.remove_podcast(stored_podcast)
+        self.record_mutation()
 
     def get_podcast(self, podcast_id) -> Podcast:
-        podcast = None
-        for podcast in self.__podcasts:
-            if podcast.id == int(podcast_id):
-                return podcast
-            else:
-                podcast = None
-        return podcast
+        return self.__podcasts_index.get(int(podcast_id))
+
+    def get_podcast_summaries(self, limit: int, offset: int = 0, filters: dict = None, cursor: str = None) -> Page:
+        if filters:
+            podcast_ids = self.__podcast_facets.podcast_ids(self.__podcast_facets.match(filters))
+            keys = sorted((self.__podcast_summaries[podcast_id].title, podcast_id) for podcast_id in podcast_ids)
+        else:
+            keys = self.__podcast_keys
+        start = start_of_page(keys, offset, decode_cursor(cursor, (str, int)))
+        page_keys = keys[start:start + limit + 1]
+        summaries = [self.__podcast_summaries[podcast_id] for _, podcast_id in page_keys]
+        return page_of(summaries, page_keys, limit, len(keys))
+
+    def _number_of_episodes(self, podcast: Podcast) -> int:
+        # Not name-mangled, as pickle could not find the bound method the PrefixIndex holds again.
+        if self.__episode_store is not None:
+            return self.__episode_store.count_for_podcast(podcast.id)
+        return len(podcast.episodes)
+
+    def get_podcast_version(self, podcast_id: int):
+        return self.__podcast_versions.get(podcast_id)
+
+    def __podcast_changed(self, podcast: Podcast):
+        if podcast is not None and podcast.id in self.__podcast_versions:
+            self.__podcast_versions[podcast.id] = new_version()
 
     def get_number_of_podcasts(self) -> int:
         return len(self.__podcasts)
@@ -58,33 +153,55 @@ class MemoryRepository(AbstractRepository):
         return self.__podcasts
 
     def get_podcasts_by_id(self, id_list) -> List[Podcast]:
-        # Remove ids in id_list that don't represent Podcast ids in the repository.
-        existing_ids = [id for id in id_list if id in self.__podcasts_index]
-
-        # Fetch for Podcasts.
-        podcasts = [self.__podcasts_index[id] for id in existing_ids]
-        return podcasts
+        # Ids in id_list that don't represent Podcast ids in the repository are skipped.
+        return self.__podcasts_index.get_many(id_list)
 
     def get_podcast_ids_by_category(self, category_name: str):
-        # Linear search to find the first occurrence of each Category with the name category_name
-        category = next((category for category in self.__categories if category.name == category_name), None)
+        return self.get_podcast_ids_by_facets({CATEGORY: category_name})
 
-        # Retrieve the ids of Podcasts associated with the Category.
-        if category is not None:
-            podcast_ids = [podcast.id for podcast in self.__podcasts if category in podcast.categories]
-        else:
-            # No Category with name category_name, so return empty list.
-            podcast_ids = list()
+    def get_podcast_ids_by_language(self, language: str):
+        return self.get_podcast_ids_by_facets({LANGUAGE: language})
 
-        return podcast_ids
+    def search_podcast_ids(self, query: str, filter_by: str) -> List[int]:
+        if filter_by == 'fuzzy':
+            return self.__built_fuzzy_index().search(query)
+        return self.__podcast_search_index.search(query, filter_by)
 
-    def get_podcast_ids_by_language(self, language: str):
-        # Retrieve the ids of Podcasts with Language 'language'.
-        podcast_ids = [podcast.id for podcast in self.__podcasts if podcast.language == language]
-        return podcast_ids
+    def build_fuzzy_index(self) -> dict:
+        return self.__built_fuzzy_index().stats()
+
+    def __built_fuzzy_index(self) -> FuzzyIndex:
+        if self.__fuzzy_index is None:
+            # Filled before it is stored, so a search in another thread never sees it half built.
+            fuzzy_index = FuzzyIndex()
+            for podcast in self.__podcasts:
+                fuzzy_index.add(podcast)
+            self.__fuzzy_index = fuzzy_index
+        return self.__fuzzy_index
+
+    def search_podcasts(self, query: str, filter_by: str, limit: int, offset: int = 0):
+        podcast_ids = self.search_podcast_ids(query, filter_by)
+        return podcast_ids[offset:offset + limit], len(podcast_ids)
+
+    def get_search_suggestions(self, prefix: str, filter_by: str, limit: int = 10) -> List[str]:
+        return self.__podcast_prefixes.suggest(prefix, filter_by, limit)
+
+    def get_podcast_ids_by_facets(self, filters: dict) -> List[int]:
+        bitmap = self.__podcast_facets.match(filters)
+        return sorted(self.__podcast_facets.podcast_ids(bitmap))
+
+    def get_facet_counts(self, filters: dict, facets=FACETS) -> dict:
+        return self.__podcast_facets.counts(filters, facets)
 
     def add_category(self, category: Category):
         self.__categories.append(category)
+        self.__categories_index.add(category)
+        for podcast in category.tagged_podcasts:
+            self.__podcast_facets.add_value(podcast.id, CATEGORY, category.name)
+            self.__podcast_search_index.add_field_value(podcast.id, CATEGORY, category.name)
+            self.__podcast_prefixes.add_value(podcast, CATEGORY, category.name)
+            self.__podcast_changed(podcast)
+        self.record_mutation()
 
     def get_categories(self):
         return self.__categories
@@ -92,10 +209,10 @@ class MemoryRepository(AbstractRepository):
     def add_user(self, user: User):
         if user not in self.__users:
             insort_left(self.__users, user)
-            self.__users_index[user.id] = user
+            self.__users_index.add(user)
 
     def get_user(self, user_name) -> User:
-        return next((user for user in self.__users if user.username.lower() == user_name.lower()), None)
+        return self.__users_index.get(casefold_key(user_name))
 
     def get_number_of_users(self) -> int:
         return len(self.__users)
@@ -118,85 +235,156 @@ class MemoryRepository(AbstractRepository):
     def add_episode(self, episode: Episode):
         parent = None
         try:
-            parent = self.__podcasts_index[episode.podcast.id]
-        except KeyError:
-            pass
+            parent = self.__podcasts_index.get(episode.podcast.id)
         except AttributeError:
             pass
-        if parent is not None:
+        if parent is None:
+            return
+        if self.__episode_store is not None:
+            self.__episode_store.add(episode)
+        else:
             parent.add_episode(episode)
             insort_left(self.__episodes, episode)
-            self.__episodes_index[episode.id] = episode
+            self.__episodes_index.add(episode)
+            self.__episodes_by_date.add(episode)
+            self.__episodes_by_upload_time.add(episode)
+            self.__episodes_by_length.add(episode)
+        self.__episode_search_index.add(episode)
+        if self.__description_file is not None and self.__episode_store is None:
+            episode.keep_description_in(self.__description_file)
+        self.__podcast_changed(parent)
+        self.__podcast_prefixes.popularity_changed()
+
+    def remove_episode(self, episode: Episode):
+        if self.__episode_store is not None:
+            stored_episode = self.__episode_store.get(episode.id)
+            if stored_episode is not None:
+                self.__episode_store.remove(episode.id)
+                self.__episode_search_index.remove(stored_episode)
+                self.__podcast_prefixes.popularity_changed()
+                self.__podcast_changed(stored_episode.podcast)
+            return
+        stored_episode = self.__episodes_index.get(episode.id)
+        if stored_episode is None:
+            return
+        try:
+            del self.__episodes[self.episode_index(stored_episode)]
+        except ValueError:
+            pass
+        self.__episodes_index.remove(stored_episode)
+        self.__episodes_by_date.remove(stored_episode)
+        self.__episodes_by_upload_time.remove(stored_episode)
+        self.__episodes_by_length.remove(stored_episode)
+        self.__episode_search_index.remove(stored_episode)
+        self.__podcast_prefixes.popularity_changed()
+        if stored_episode.podcast is not None:
+            stored_episode.podcast.remove_episode(stored_episode)
+            self.__podcast_changed(stored_episode.podcast)
 
     def get_episode(self, episode_id) -> Episode:
-        for episode in self.__episodes:
-            if episode.id == int(episode_id):
-                return episode
-        return None
+        if self.__episode_store is not None:
+            return self.__episode_store.get(int(episode_id))
+        return self.__episodes_index.get(int(episode_id))
 
     def get_number_of_episodes(self) -> int:
+        if self.__episode_store is not None:
+            return len(self.__episode_store)
         return len(self.__episodes)
 
     def get_first_episode(self) -> Episode:
         episode = None
 
-        if len(self.__episodes) > 0:
+        if self.__episode_store is not None:
+            if len(self.__episode_store) > 0:
+                episode = self.__episode_store.get(self.__episode_store.first_id())
+        elif len(self.__episodes) > 0:
             episode = self.__episodes[0]
         return episode
 
     def get_last_episode(self) -> Episode:
         episode = None
 
-        if len(self.__episodes) > 0:
+        if self.__episode_store is not None:
+            if len(self.__episode_store) > 0:
+                episode = self.__episode_store.get(self.__episode_store.last_id())
+        elif len(self.__episodes) > 0:
             episode = self.__episodes[-1]
         return episode
 
     def get_episodes_by_id(self, id_list):
-        # Strip out any ids in id_list that don't represent Episode ids in the repository.
-        existing_ids = [id for id in id_list if id in self.__episodes_index]
-
-        # Fetch the Episodes.
-        episodes = [self.__episodes_index[id] for id in existing_ids]
-        return episodes
+        # Any ids in id_list that don't represent Episode ids in the repository are skipped.
+        if self.__episode_store is not None:
+            return self.__episode_store.get_many(id_list)
+        return self.__episodes_index.get_many(id_list)
+
+    def get_episodes_for_podcast(self, podcast_id: int) -> List[Episode]:
+        return self.get_episodes_by_id(self.get_episode_ids_for_podcast(int(podcast_id)))
+
+    def get_episode_page(self, podcast_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        keys = self.__episode_keys(int(podcast_id))
+        start = start_of_page(keys, offset, decode_cursor(cursor, ((int, float), int)))
+        page_keys = keys[start:start + limit + 1]
+        episodes = self.get_episodes_by_id(episode_id for _, episode_id in page_keys)
+        return page_of(episodes, page_keys, limit, len(keys))
+
+    def __episode_keys(self, podcast_id: int) -> List[tuple]:
+        # Sorted (upload timestamp, episode id) keys of a Podcast's Episodes.
+        if self.__episode_store is not None:
+            return self.__episode_store.episode_keys(podcast_id)
+        return self.__episodes_by_date.episode_keys(podcast_id)
+
+    def get_episode_ids_for_podcast(self, podcast_id: int) -> List[int]:
+        """ Returns the ids of a Podcast's Episodes, in id order. """
+        if self.__episode_store is not None:
+            return list(self.__episode_store.ids_for_podcast(podcast_id))
+        return sorted(episode_id for _, episode_id in self.__episodes_by_date.episode_keys(int(podcast_id)))
+
+    def get_episode_ids_uploaded_between(self, start: datetime, end: datetime) -> List[int]:
+        """ Returns the ids of Episodes uploaded from start up to but not including end, in id order. """
+        if self.__episode_store is not None:
+            return list(self.__episode_store.ids_uploaded_between(start, end))
+        return self.__episodes_by_upload_time.ids_between(to_microseconds(start), to_microseconds(end))
+
+    def get_episode_ids_with_length_between(self, shortest: int, longest: int) -> List[int]:
+        """ Returns the ids of Episodes from shortest to longest seconds long, inclusive, in id order. """
+        if self.__episode_store is not None:
+            return list(self.__episode_store.ids_with_length_between(shortest, longest))
+        return self.__episodes_by_length.ids_between(shortest, longest + 1)
+
+    def search_episodes(self, query: str, limit: int, offset: int = 0):
+        return self.__episode_search_index.search(query, limit, offset)
 
     def get_next_episode_id(self, episode: Episode):
-        next_id = None
-
-        try:
-            index = self.episode_index(episode)
-            for stored_episode in self.__episodes[index + 1:len(self.__episodes)]:
-                if stored_episode.id > episode.id:
-                    next_id = stored_episode.id
-                    break
-        except ValueError:
-            # No next Episode
-            pass
-
-        return next_id
+        if self.__episode_store is not None:
+            return self.__episode_store.next_id(episode.id)
+        return self.__episodes_by_date.next_id(episode)
 
     def get_previous_episode_id(self, episode: Episode):
-        previous_id = None
-
-        try:
-            index = self.episode_index(episode)
-            for stored_episode in reversed(self.__episodes[0:index]):
-                if stored_episode.id < episode.id:
-                    previous_id = stored_episode.id
-                    break
-        except ValueError:
-            # No previous Episode
-            pass
-
-        return previous_id
+        if self.__episode_store is not None:
+            return self.__episode_store.previous_id(episode.id)
+        return self.__episodes_by_date.previous_id(episode)
 
     def add_review(self, review: Review):
         review.user.add_review(review)
         review.episode.add_review(review)
+        if self.__episode_store is not None:
+            self.__episode_store.add_review(review)
         self.__reviews.append(review)
+        self.__podcast_changed(review.episode.podcast)
 
     def get_reviews(self) -> List[Review]:
         return self.__reviews
 
+    def get_review_page(self, episode_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        episode = self.get_episode(episode_id)
+        if episode is None:
+            return Page([], 0)
+        # Reviews are nearly always added in id order, so this sort is a single pass.
+        reviews = sorted(episode.reviews)
+        keys = [(review.id,) for review in reviews]
+        start = start_of_page(keys, offset, decode_cursor(cursor, (int,)))
+        return page_of(reviews[start:start + limit + 1], keys[start:start + limit + 1], limit, len(keys))
+
     def get_number_of_reviews(self) -> int:
         return len(self.__reviews)
 
@@ -207,6 +395,19 @@ class MemoryRepository(AbstractRepository):
     def get_playlists(self) -> List[Playlist]:
         return self.__playlists
 
+    def get_index_stats(self) -> dict:
+        """ Returns the size and hit/miss counts of each secondary index, keyed by index name. """
+        indexes = [self.__authors_index, self.__podcasts_index, self.__categories_index,
+                   self.__users_index, self.__episodes_index]
+        stats = {index.name: index.stats() for index in indexes}
+        if self.__episode_store is not None:
+            stats['episode_store'] = self.__episode_store.stats()
+        if self.__description_file is not None:
+            stats['descriptions'] = self.__description_file.stats()
+        if self.__fuzzy_index is not None:
+            stats['fuzzy'] = self.__fuzzy_index.stats()
+        return stats
+
     # Helper method to return episode index.
     def episode_index(self, episode: Episode):
         index = bisect_left(self.__episodes, episode)
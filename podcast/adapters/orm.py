@@ -1,5 +1,9 @@
+import sqlite3
+
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Date, DateTime, ForeignKey)
+    Table, MetaData, Column, Integer, String, Date, DateTime, ForeignKey, Index, event)
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import registry, relationship, synonym
 
 from podcast.domainmodel import model
@@ -22,7 +26,9 @@ podcasts_table = Table(
     Column('description', String(255), nullable=True),
     Column('language', String(255), nullable=True),
     Column('website_url', String(255), nullable=True),
-    Column('itunes_id', Integer, nullable=True)
+    Column('itunes_id', Integer, nullable=True),
+    # Supports seeking to a page of the podcast list by (title, id).
+    Index('ix_podcasts_title_id', 'title', 'id')
 )
 
 episodes_table = Table(
@@ -32,8 +38,10 @@ episodes_table = Table(
     Column('title', String(255), nullable=True),
     Column('audio_url', String(255), nullable=True),
     Column('description', String(255), nullable=True),
-    Column('upload_date', DateTime, nullable=True)
+    Column('upload_date', DateTime, nullable=True),
     # I'm excluding episode length.
+    # Supports previous/next episode navigation within a podcast.
+    Index('ix_episodes_podcast_id_upload_date', 'podcast_id', 'upload_date')
 )
 
 categories_table = Table(
@@ -64,7 +72,9 @@ reviews_table = Table(
     Column('episode_id', ForeignKey('episodes.id')),
     Column('rating', Integer, nullable=False),
     Column('content', String(1024), nullable=False),
-    Column('timestamp', DateTime, nullable=False)
+    Column('timestamp', DateTime, nullable=False),
+    # Supports seeking to a page of an episode's reviews.
+    Index('ix_reviews_episode_id_id', 'episode_id', 'id')
 )
 
 playlists_table = Table(
@@ -82,6 +92,18 @@ playlists_episodes_association_table = Table(
 )
 
 
+def _python_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+@event.listens_for(Engine, 'connect')
+def register_python_lower(dbapi_connection, connection_record):
+    """ Adds py_lower to every SQLite connection: str.lower, as SQLite's own lower() only folds ASCII letters,
+    so matching 'émi' against 'Émission' needs it. """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('py_lower', 1, _python_lower, deterministic=True)
+
+
 def map_model_to_tables():
     mapper_registry.map_imperatively(model.Author, authors_table, properties={
         '_id': authors_table.c.id,
@@ -140,3 +162,91 @@ def map_model_to_tables():
         '_title': playlists_table.c.title,
         '_episodes': relationship(model.Episode, secondary=playlists_episodes_association_table)
     })
+
+
+# Full-text search over podcasts, kept outside mapper_registry.metadata because SQLAlchemy can't describe
+# an FTS5 virtual table. The trigram tokenizer matches any substring of three or more characters, like
+# the search in memory mode. Category names are joined with newlines so one column holds all of them.
+# Triggers keep the table in step with podcasts, authors, categories and podcasts_categories.
+PODCASTS_FTS_TABLE = 'podcasts_fts'
+
+_podcast_categories = """
+    (SELECT group_concat(categories.name, char(10)) FROM podcasts_categories
+     JOIN categories ON categories.id = podcasts_categories.category_id
+     WHERE podcasts_categories.podcast_id = {podcast_id})
+"""
+
+_podcast_search_row = f"""
+    SELECT podcasts.id, podcasts.title, authors.name, {_podcast_categories.format(podcast_id='podcasts.id')}
+    FROM podcasts LEFT JOIN authors ON authors.id = podcasts.author_id
+"""
+
+full_text_search_ddl = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS podcasts_fts USING fts5(title, author, categories, tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS podcasts_fts_insert AFTER INSERT ON podcasts BEGIN
+        INSERT INTO podcasts_fts(rowid, title, author, categories) {_podcast_search_row} WHERE podcasts.id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS podcasts_fts_update AFTER UPDATE ON podcasts BEGIN
+        DELETE FROM podcasts_fts WHERE rowid = old.id;
+        INSERT INTO podcasts_fts(rowid, title, author, categories) {_podcast_search_row} WHERE podcasts.id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS podcasts_fts_delete AFTER DELETE ON podcasts BEGIN
+        DELETE FROM podcasts_fts WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS podcasts_fts_tag AFTER INSERT ON podcasts_categories BEGIN
+        UPDATE podcasts_fts SET categories = {_podcast_categories.format(podcast_id='new.podcast_id')}
+        WHERE rowid = new.podcast_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS podcasts_fts_untag AFTER DELETE ON podcasts_categories BEGIN
+        UPDATE podcasts_fts SET categories = {_podcast_categories.format(podcast_id='old.podcast_id')}
+        WHERE rowid = old.podcast_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS podcasts_fts_author_insert AFTER INSERT ON authors BEGIN
+        UPDATE podcasts_fts SET author = new.name WHERE rowid IN (SELECT id FROM podcasts WHERE author_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS podcasts_fts_author_update AFTER UPDATE OF name ON authors BEGIN
+        UPDATE podcasts_fts SET author = new.name WHERE rowid IN (SELECT id FROM podcasts WHERE author_id = new.id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS podcasts_fts_category_update AFTER UPDATE OF name ON categories BEGIN
+        UPDATE podcasts_fts SET categories = {_podcast_categories.format(podcast_id='podcasts_fts.rowid')}
+        WHERE rowid IN (SELECT podcast_id FROM podcasts_categories WHERE category_id = new.id);
+    END""",
+]
+
+# Removes podcasts_fts and its triggers, e.g. so a bulk load doesn't fire the triggers for every row.
+drop_full_text_search = [
+    f"DROP TRIGGER IF EXISTS podcasts_fts_{trigger}"
+    for trigger in ('insert', 'update', 'delete', 'tag', 'untag', 'author_insert', 'author_update', 'category_update')
+] + ["DROP TABLE IF EXISTS podcasts_fts"]
+
+# Refills podcasts_fts from the base tables, e.g. for a database populated before the table existed.
+rebuild_full_text_search = [
+    "DELETE FROM podcasts_fts",
+    f"INSERT INTO podcasts_fts(rowid, title, author, categories) {_podcast_search_row}",
+]
+
+
+def has_full_text_search(connection) -> bool:
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'podcasts_fts'").first() is not None
+
+
+def create_full_text_search(connection) -> bool:
+    """ Creates and fills podcasts_fts, returning False if this SQLite build has no FTS5 trigram support. """
+    try:
+        for statement in full_text_search_ddl + rebuild_full_text_search:
+            connection.exec_driver_sql(statement)
+    except OperationalError:
+        return False
+    return True
+
+
+def create_missing_indexes(connection):
+    """ Creates any index of the tables that the database doesn't have yet, e.g. one added after it was made.
+
+    create_all skips the indexes of tables that already exist, so a database made before an index was added
+    only gets it from here.
+    """
+    for table in mapper_registry.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
@@ -0,0 +1,54 @@
+import base64
+import json
+from bisect import bisect_right
+from typing import NamedTuple, Optional
+
+
+class Page(NamedTuple):
+    """ One page of a paginated repository read.
+
+    total counts every item in the listing, not just this page. next_cursor can be passed back to fetch the
+    page after this one by seeking past its last item, so it costs the same however deep the page is; it
+    is None when this is the last page.
+    """
+    items: list
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(key) -> str:
+    """ Turns the sort key of the last item on a page into an opaque, URL-safe cursor. """
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str], types: tuple) -> Optional[tuple]:
+    """ Returns the sort key held by cursor, or None if there is no cursor or it can't be read.
+
+    types gives the expected type (or tuple of types) of each part of the key, so a cursor from another
+    listing, or one that was edited by hand, is ignored rather than compared against the wrong values.
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(key, list) or len(key) != len(types):
+        return None
+    if not all(isinstance(value, expected) and not isinstance(value, bool) for value, expected in zip(key, types)):
+        return None
+    return tuple(key)
+
+
+def page_of(items: list, keys: list, limit: int, total: int) -> Page:
+    """ Builds a Page from up to limit + 1 items and their sort keys; the extra item only shows there's more. """
+    if len(items) > limit:
+        return Page(items[:limit], total, encode_cursor(keys[limit - 1]) if limit > 0 else None)
+    return Page(items, total, None)
+
+
+def start_of_page(keys: list, offset: int, after: Optional[tuple]) -> int:
+    """ Returns where a page starts in a sorted list of sort keys: just past after if it is given, else offset. """
+    if after is not None:
+        return bisect_right(keys, after)
+    return max(offset, 0)
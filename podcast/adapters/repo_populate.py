@@ -2,13 +2,18 @@ from pathlib import Path
 
 from podcast.adapters.repository import AbstractRepository
 from podcast.adapters.datareader.csvdatareader import CSVDataReader
-from podcast.domainmodel.model import Author
 
 
-def populate(data_path: Path, repo: AbstractRepository, database_mode: bool = False):
+def populate(data_path: Path, repo: AbstractRepository, database_mode: bool = False, processes: int = 1):
     data_reader = CSVDataReader(data_path / "podcasts.csv", data_path / "episodes.csv")
     data_reader.load_podcasts(database_mode)
-    data_reader.load_episodes()
+    data_reader.load_episodes(processes)
+
+    if database_mode:
+        # One transaction of bulk inserts, rather than a merge and a commit for every object.
+        repo.bulk_load(data_reader.author_objects.values(), data_reader.podcasts.values(),
+                       data_reader.categories.values(), data_reader.episodes)
+        return
 
     for podcast in data_reader.podcasts.values():
         repo.add_podcast(podcast)
@@ -16,8 +21,8 @@ def populate(data_path: Path, repo: AbstractRepository, database_mode: bool = Fa
     for episode in data_reader.episodes:
         repo.add_episode(episode)
 
-    for author_name in data_reader.authors.keys():
-        author = Author(data_reader.authors[author_name], author_name)
+    # The reader's Authors are the ones its Podcasts point at, so each Author lists its Podcasts.
+    for author in data_reader.author_objects.values():
         repo.add_author(author)
 
     for category in data_reader.categories.values():
@@ -1,12 +1,29 @@
 import abc
-from typing import List
+from itertools import count
+from typing import List, Tuple
 from datetime import date
 
-from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist
+from podcast.adapters.paging import Page
+from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist, \
+    PodcastSummary
 
 
 repo_instance = None
 
+# Shared by every repository, so no two repositories (or two states of one) ever report the same version.
+_mutation_versions = count(1)
+
+
+def new_version() -> int:
+    return next(_mutation_versions)
+
+
+def skip_versions_to(version: int):
+    """ Makes new_version return versions after version, e.g. once a repository from another process has been
+    loaded, so none of its versions are reported again. """
+    global _mutation_versions
+    _mutation_versions = count(max(next(_mutation_versions), version + 1))
+
 
 class RepositoryException(Exception):
     def __init__(self, message=None):
@@ -15,6 +32,14 @@ class RepositoryException(Exception):
 
 class AbstractRepository(abc.ABC):
 
+    # Set when the repository is created, and changed whenever Podcasts, Categories or Authors are added or
+    # removed, see record_mutation.
+    mutation_version = 0
+
+    def record_mutation(self):
+        """ Gives the repository a new mutation_version, so results cached under the old one aren't reused. """
+        self.mutation_version = new_version()
+
     @abc.abstractmethod
     def add_author(self, author: Author):
         raise NotImplementedError
@@ -63,6 +88,27 @@ class AbstractRepository(abc.ABC):
         """Returns list of podcasts"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_podcast_summaries(self, limit: int, offset: int = 0, filters: dict = None,
+                              cursor: str = None) -> Page:
+        """ Returns a Page of PodcastSummaries ordered by title (then id), with the total number of Podcasts listed.
+
+        If filters is given, only Podcasts matching every facet value in it are listed, as with
+        get_podcast_ids_by_facets. If cursor is the next_cursor of an earlier Page of the same listing, the
+        page starts right after that Page's last Podcast and offset is ignored; otherwise the page starts
+        offset Podcasts in.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcast_version(self, podcast_id: int):
+        """ Returns a hashable value that changes whenever the Podcast, its categories, its Episodes or their
+        Reviews are changed through the repository. Used to tell when a cached view of a Podcast is stale.
+
+        Returns None if there is no Podcast with id podcast_id.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_podcast_ids_by_category(self, category_name: str):
         """ Returns a list of ids representing Podcasts tagged by category_name
@@ -79,6 +125,65 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def search_podcast_ids(self, query: str, filter_by: str) -> List[int]:
+        """ Returns the ids of Podcasts whose title, author name or category name (chosen by filter_by)
+        contains query, ignoring case. Ids are ordered by Podcast title.
+
+        filter_by 'fuzzy' instead matches every word of query against the words of Podcast titles and author
+        names, allowing up to two typing mistakes per word (see build_fuzzy_index). Ids are then ordered by
+        how closely they match, then by title.
+
+        If filter_by isn't 'title', 'author', 'category' or 'fuzzy', returns an empty list.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def search_podcasts(self, query: str, filter_by: str, limit: int, offset: int = 0) -> Tuple[List[int], int]:
+        """ Returns one page of search_podcast_ids-style results, as (page of ids, total number of matches).
+
+        Repositories with a ranked search index may order the ids by relevance instead of by title.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def build_fuzzy_index(self) -> dict:
+        """ Builds the index behind fuzzy search, if it isn't built yet, and returns its statistics:
+        the number of podcasts, words and deletion variants indexed, the seconds spent building it and its
+        approximate size in bytes.
+
+        Fuzzy searches build the index on first use if this hasn't been called.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_search_suggestions(self, prefix: str, filter_by: str, limit: int = 10) -> List[str]:
+        """ Returns up to limit distinct titles, author names or category names (chosen by filter_by) that
+        start with prefix, ignoring case.
+
+        Suggestions are ordered by popularity: titles by their Podcast's number of Episodes, author and
+        category names by their number of Podcasts. Ties are ordered alphabetically.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_podcast_ids_by_facets(self, filters: dict) -> List[int]:
+        """ Returns the ids, in ascending order, of Podcasts matching every facet value in filters.
+
+        filters maps facet names ('category', 'language' or 'author') to a value, e.g.
+        {'category': 'Comedy', 'language': 'English'}. An empty filters dict matches every Podcast.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_facet_counts(self, filters: dict, facets=('category', 'language', 'author')) -> dict:
+        """ Returns {facet: {value: number of Podcasts}} for each facet in facets.
+
+        Counts are taken over the Podcasts matching filters, ignoring the facet's own entry in filters.
+        Values with no matching Podcasts are left out.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_category(self, category: Category):
         raise NotImplementedError
@@ -165,19 +270,45 @@ class AbstractRepository(abc.ABC):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_episodes_for_podcast(self, podcast_id: int) -> List[Episode]:
+        """ Returns every Episode of the Podcast, in id order.
+
+        Use this rather than Podcast.episodes, which a repository need not fill in.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_episode_page(self, podcast_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        """ Returns a Page of the Podcast's Episodes, oldest first (ties ordered by id), with the total number
+        of Episodes the Podcast has.
+
+        cursor and offset work as in get_podcast_summaries.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def search_episodes(self, query: str, limit: int, offset: int = 0) -> Tuple[List[int], int]:
+        """ Returns one page of the ids of Episodes whose title or description contains every word of query,
+        best match first, and the total number of matching Episodes.
+
+        Descriptions are matched on their text, not their HTML markup.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_next_episode_id(self, episode: Episode):
-        """ Returns the next Episode, decided by date, from the current Podcast.
+        """ Returns the id of the next Episode, decided by upload date, from the current Podcast.
 
-        Returns None if there is no next episode.
+        Episodes uploaded at the same time are ordered by id. Returns None if there is no next episode.
         """
         raise NotImplementedError
 
     @abc.abstractmethod
     def get_previous_episode_id(self, episode: Episode):
-        """ Returns the previous Episode, decided by date, from the current Podcast.
+        """ Returns the id of the previous Episode, decided by upload date, from the current Podcast.
 
-        Returns None if there is no previous episode.
+        Episodes uploaded at the same time are ordered by id. Returns None if there is no previous episode.
         """
         raise NotImplementedError
 
@@ -198,6 +329,15 @@ class AbstractRepository(abc.ABC):
     def get_reviews(self) -> List[Review]:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_review_page(self, episode_id: int, limit: int, offset: int = 0, cursor: str = None) -> Page:
+        """ Returns a Page of the Episode's Reviews in the order they were added (by id), with the total number
+        of Reviews the Episode has.
+
+        cursor and offset work as in get_podcast_summaries.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_number_of_reviews(self) -> int:
         raise NotImplementedError
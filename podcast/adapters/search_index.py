@@ -0,0 +1,136 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Set
+
+# Fields that Podcasts can be searched on, matching the filter options of the search form.
+TITLE = 'title'
+AUTHOR = 'author'
+CATEGORY = 'category'
+SEARCH_FIELDS = (TITLE, AUTHOR, CATEGORY)
+
+# Joins the texts of a multi-valued field (categories), so one substring test checks them all.
+TEXT_SEPARATOR = '\x00'
+
+# Queries shorter than this have no trigrams to look up.
+TRIGRAM_LENGTH = 3
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def podcast_field_texts(podcast) -> Dict[str, List[str]]:
+    """ Returns the lowercased texts a Podcast can be found by, for each search field. """
+    texts = {
+        TITLE: [podcast.title.lower()],
+        AUTHOR: [podcast.author.name.lower()] if podcast.author is not None else [],
+        CATEGORY: [category.name.lower() for category in podcast.categories],
+    }
+    return texts
+
+
+class PodcastSearchIndex:
+    """ Trigram index over Podcast titles, author names and category names.
+
+    Each field maps every three-character substring of its lowercased texts to the ids of the Podcasts
+    containing it. A query of three or more characters can only match Podcasts holding all of its trigrams,
+    so the candidates are the intersection of those posting sets, smallest first. Candidates are then
+    checked with a plain substring test, which keeps the exact semantics of the original scan
+    ("cast" finds "Podcast", "radio net" finds "Radio Network"). Shorter queries match most of the
+    catalogue anyway, and are checked against every stored text in title order.
+    """
+
+    def __init__(self):
+        self.__postings: Dict[str, Dict[str, Set[int]]] = {field: dict() for field in SEARCH_FIELDS}
+        self.__texts: Dict[str, Dict[int, str]] = {field: dict() for field in SEARCH_FIELDS}
+        self.__sort_keys: Dict[int, tuple] = dict()
+        # Every (title, id) sort key, kept in order so large result sets don't need sorting.
+        self.__ordered_keys: List[tuple] = []
+
+    def add(self, podcast):
+        if podcast.id in self.__sort_keys:
+            self.remove(podcast)
+        sort_key = (podcast.title, podcast.id)
+        self.__sort_keys[podcast.id] = sort_key
+        insort(self.__ordered_keys, sort_key)
+        for field, texts in podcast_field_texts(podcast).items():
+            for text in texts:
+                self.__add_text(podcast.id, field, text)
+
+    def add_field_value(self, podcast_id: int, field: str, value: str):
+        """ Makes an indexed Podcast findable by one more value, e.g. a newly tagged Category. A value it can
+        already be found by is not added again. """
+        if podcast_id in self.__sort_keys:
+            text = value.lower()
+            if text not in self.field_texts(podcast_id, field):
+                self.__add_text(podcast_id, field, text)
+
+    def field_texts(self, podcast_id: int, field: str) -> List[str]:
+        """ Returns the lowercased texts a Podcast is indexed by in field. """
+        text = self.__texts[field].get(podcast_id)
+        return text.split(TEXT_SEPARATOR) if text is not None else []
+
+    def remove(self, podcast):
+        sort_key = self.__sort_keys.pop(podcast.id, None)
+        if sort_key is None:
+            return
+        del self.__ordered_keys[bisect_left(self.__ordered_keys, sort_key)]
+        for field in SEARCH_FIELDS:
+            text = self.__texts[field].pop(podcast.id, None)
+            if text is not None:
+                for trigram in trigrams(text):
+                    postings = self.__postings[field].get(trigram)
+                    if postings is not None:
+                        postings.discard(podcast.id)
+                        if len(postings) == 0:
+                            del self.__postings[field][trigram]
+
+    def search(self, query: str, field: str) -> List[int]:
+        """ Returns the ids of Podcasts whose field contains query (ignoring case), ordered by title. """
+        if field not in self.__texts:
+            return []
+
+        query = query.lower()
+        if TEXT_SEPARATOR in query:
+            return []
+        candidates = self._candidates(query, field)
+        texts = self.__texts[field]
+
+        if candidates is None or len(candidates) * 8 > len(self.__ordered_keys):
+            # Most of the catalogue is a candidate: walking the keys in title order is cheaper than sorting.
+            if candidates is None:
+                candidates = texts
+            return [podcast_id for _, podcast_id in self.__ordered_keys
+                    if podcast_id in candidates and query in texts.get(podcast_id, '')]
+
+        matches = [podcast_id for podcast_id in candidates if query in texts.get(podcast_id, '')]
+        return sorted(matches, key=self.__sort_keys.__getitem__)
+
+    def _candidates(self, query: str, field: str):
+        """ Returns the set of Podcast ids that might contain query, or None if any Podcast might. """
+        if len(query) < TRIGRAM_LENGTH:
+            return None
+
+        postings = self.__postings[field]
+        posting_sets = []
+        for trigram in trigrams(query):
+            trigram_postings = postings.get(trigram)
+            if trigram_postings is None:
+                return set()
+            posting_sets.append(trigram_postings)
+
+        posting_sets.sort(key=len)
+        candidates = set(posting_sets[0])
+        for trigram_postings in posting_sets[1:]:
+            candidates &= trigram_postings
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def __add_text(self, podcast_id: int, field: str, text: str):
+        texts = self.__texts[field]
+        if podcast_id in texts:
+            texts[podcast_id] += TEXT_SEPARATOR + text
+        else:
+            texts[podcast_id] = text
+        for trigram in trigrams(text):
+            self.__postings[field].setdefault(trigram, set()).add(podcast_id)
@@ -0,0 +1,139 @@
+import gc
+import hashlib
+import os
+import pickle
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from podcast.adapters.memory_repository import MemoryRepository
+from podcast.adapters.repository import new_version, skip_versions_to
+from podcast.adapters.repo_populate import populate
+
+# Bump whenever the snapshot format itself changes; snapshots of any other version are ignored. Changes to the
+# code of the objects in a snapshot are caught by code_hash.
+SNAPSHOT_VERSION = 2
+
+SNAPSHOT_MAGIC = b'PODSNAP\n'
+SOURCE_FILES = ('podcasts.csv', 'episodes.csv')
+# The packages whose classes end up in a snapshot.
+CODE_PACKAGES = (Path(__file__).resolve().parent, Path(__file__).resolve().parent.parent / 'domainmodel')
+
+
+def source_hash(data_path: Path) -> str:
+    """ SHA-256 of the CSV files a memory repository is populated from. """
+    digest = hashlib.sha256()
+    for filename in SOURCE_FILES:
+        digest.update(filename.encode('utf-8'))
+        with open(Path(data_path) / filename, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_hash() -> str:
+    """ SHA-256 of the Python version and the source of the model and adapter packages, so a snapshot written
+    by other code than is running now is not used. It only changes when the code does, so it is worked out
+    once per process. """
+    digest = hashlib.sha256(sys.version.encode('utf-8'))
+    for package in CODE_PACKAGES:
+        for source_file in sorted(package.rglob('*.py')):
+            digest.update(source_file.relative_to(package.parent).as_posix().encode('utf-8'))
+            digest.update(source_file.read_bytes())
+    return digest.hexdigest()
+
+
+def snapshot_key(data_path: Path, options: dict) -> dict:
+    """ What a snapshot has to have been written for to be used: this SNAPSHOT_VERSION, the same code, the same
+    CSV contents and the same MemoryRepository options. """
+    return {'version': SNAPSHOT_VERSION, 'code_hash': code_hash(), 'source_hash': source_hash(data_path),
+            'options': dict(options)}
+
+
+def write_snapshot(snapshot_file: Path, key: dict, repo: MemoryRepository, populate_seconds: float):
+    """ Pickles repo to snapshot_file, after a header holding key, the time populate took and the last mutation
+    version handed out. The file is written beside snapshot_file first and then moved into place, so readers
+    never see half a snapshot. """
+    snapshot_file = Path(snapshot_file)
+    snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+    header = dict(key, populate_seconds=populate_seconds, last_version=new_version())
+    partial_file = snapshot_file.with_name(snapshot_file.name + f'.{os.getpid()}.partial')
+    try:
+        with open(partial_file, 'wb') as snapshot:
+            snapshot.write(SNAPSHOT_MAGIC)
+            pickle.dump(header, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(repo, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial_file, snapshot_file)
+    finally:
+        if partial_file.exists():
+            partial_file.unlink()
+
+
+def read_snapshot(snapshot_file: Path, key: dict) -> Optional[tuple]:
+    """ Returns (repository, header) from snapshot_file, or None if there is no snapshot or it was written for
+    a different key. Snapshots are pickles, so only ever read ones this application wrote. """
+    try:
+        with open(snapshot_file, 'rb') as snapshot:
+            if snapshot.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header = pickle.load(snapshot)
+            if any(header.get(name) != value for name, value in key.items()):
+                return None
+            # The collector would otherwise walk the growing object graph many times over while it is unpickled.
+            gc.disable()
+            try:
+                repo = pickle.load(snapshot)
+            finally:
+                gc.enable()
+    except FileNotFoundError:
+        return None
+    # The repository's versions were handed out by the process that wrote it.
+    skip_versions_to(header['last_version'])
+    return repo, header
+
+
+def load_memory_repository(data_path: Path, snapshot_dir: Optional[Path], processes: int = 1,
+                           **options) -> MemoryRepository:
+    """ Returns a MemoryRepository(**options) populated from the CSV files in data_path, using processes
+    processes to read episodes.csv.
+
+    With a snapshot_dir it is read from the snapshot there when that was written for the same CSV contents and
+    options, which is much faster than populating it. Otherwise it is populated from the CSV files, and the
+    snapshot is written for next time.
+    """
+    if not snapshot_dir:
+        repo = MemoryRepository(**options)
+        populate(data_path, repo, processes=processes)
+        return repo
+
+    snapshot_file = Path(snapshot_dir) / 'memory_repository.snapshot'
+    start = time.perf_counter()
+    key = snapshot_key(data_path, options)
+    try:
+        snapshot = read_snapshot(snapshot_file, key)
+    except Exception as error:
+        # An unreadable snapshot only costs the time it takes to populate the repository again.
+        print(f"Ignoring memory repository snapshot {snapshot_file}: {error!r}")
+        snapshot = None
+    if snapshot is not None:
+        repo, header = snapshot
+        seconds = time.perf_counter() - start
+        print(f"Loaded memory repository snapshot in {seconds:.2f} s, saving "
+              f"{header['populate_seconds'] - seconds:.2f} s of the {header['populate_seconds']:.2f} s "
+              f"populating it from CSV took.")
+        return repo
+
+    start = time.perf_counter()
+    repo = MemoryRepository(**options)
+    populate(data_path, repo, processes=processes)
+    populate_seconds = time.perf_counter() - start
+    try:
+        write_snapshot(snapshot_file, key, repo, populate_seconds)
+        print(f"Populated memory repository from CSV in {populate_seconds:.2f} s, "
+              f"wrote snapshot {snapshot_file}.")
+    except Exception as error:
+        print(f"Could not write memory repository snapshot {snapshot_file}: {error!r}")
+    return repo
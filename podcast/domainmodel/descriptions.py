@@ -0,0 +1,190 @@
+from html import escape
+from html.parser import HTMLParser
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+# Tags kept in sanitised descriptions. Anything else is dropped, keeping its text.
+ALLOWED_TAGS = {'p', 'br', 'a', 'b', 'strong', 'i', 'em', 'u', 'ul', 'ol', 'li', 'blockquote', 'h1', 'h2', 'h3',
+                'h4'}
+VOID_TAGS = {'br'}
+# Tags dropped together with everything inside them.
+SKIPPED_TAGS = {'script', 'style', 'iframe', 'svg', 'audio', 'video', 'object', 'noscript', 'template', 'head',
+                'title'}
+# Dropped tags that still separate the text before and after them.
+BLOCK_TAGS = {'div', 'section', 'article', 'header', 'footer', 'aside', 'table', 'tr', 'h5', 'h6', 'hr', 'figure',
+              'figcaption'}
+LINK_SCHEMES = {'http', 'https', 'mailto'}
+# Allowed tags that end a line by themselves.
+PARAGRAPH_TAGS = {'p', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4'}
+
+# Typographic punctuation written as its plain equivalent, as one such character makes Python store the whole
+# description with two bytes per character.
+PLAIN_PUNCTUATION = str.maketrans({'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u2013': '-',
+                                   '\u2014': '-', '\u2026': '...', '\u00a0': ' '})
+
+# Length of the plain-text snippet shown in episode listings, in characters.
+SNIPPET_LENGTH = 160
+
+
+class _TextExtractor(HTMLParser):
+    """ Collects the text content of an HTML fragment, leaving out tags, attributes, scripts and styles. """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.__skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.__skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self.__skipping > 0:
+            self.__skipping -= 1
+
+    def handle_data(self, data):
+        if self.__skipping == 0:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """ Returns the visible text of an HTML description, with runs of whitespace collapsed. """
+    if '<' not in html and '&' not in html:
+        return ' '.join(html.split())
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ' '.join(' '.join(extractor.parts).split())
+
+
+class _Sanitiser(HTMLParser):
+    """ Rebuilds an HTML fragment from its allowed tags and its text, escaping everything it writes out. """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.__open_tags = []
+        self.__skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.__skipping += 1
+        elif self.__skipping > 0:
+            return
+        elif tag in BLOCK_TAGS:
+            self.__line_break()
+        elif tag in ALLOWED_TAGS:
+            if tag == 'a':
+                href = dict(attrs).get('href') or ''
+                if urlparse(href.strip()).scheme.lower() in LINK_SCHEMES:
+                    self.parts.append(f'<a href="{escape(href.strip())}" rel="nofollow">')
+                else:
+                    self.parts.append('<a>')
+            else:
+                self.parts.append(f'<{tag}>')
+            if tag not in VOID_TAGS:
+                self.__open_tags.append((tag, len(self.parts) - 1))
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.__skipping = max(self.__skipping - 1, 0)
+        elif self.__skipping > 0:
+            return
+        elif tag in BLOCK_TAGS:
+            self.__line_break()
+        elif any(open_tag == tag for open_tag, _ in self.__open_tags):
+            # Close anything left open inside tag, so the output stays well nested.
+            while self.__close_last() != tag:
+                pass
+
+    def handle_data(self, data):
+        if self.__skipping > 0 or not data:
+            return
+        text = ' '.join(data.translate(PLAIN_PUNCTUATION).split())
+        # Keep a single space where the data started or ended with whitespace.
+        if data[0].isspace() and self.parts and not self.parts[-1].endswith(' '):
+            text = ' ' + text
+        if text and not text.endswith(' ') and data[-1].isspace():
+            text += ' '
+        if text:
+            self.parts.append(escape(text, quote=False))
+
+    def close(self):
+        super().close()
+        while self.__open_tags:
+            self.__close_last()
+        # Line breaks at either end, and the whitespace around them, separate nothing.
+        while self.parts and self.__is_line_break(self.parts[-1]):
+            self.parts.pop()
+        while self.parts and self.__is_line_break(self.parts[0]):
+            self.parts.pop(0)
+
+    def __close_last(self) -> str:
+        tag, position = self.__open_tags.pop()
+        while tag in PARAGRAPH_TAGS and len(self.parts) - 1 > position and self.__is_line_break(self.parts[-1]):
+            # The paragraph ends the line anyway.
+            self.parts.pop()
+        if position == len(self.parts) - 1:
+            # Nothing was written inside it, so leave the element out.
+            self.parts.pop()
+        else:
+            self.parts.append(f'</{tag}>')
+        return tag
+
+    @staticmethod
+    def __is_line_break(part: str) -> bool:
+        return part == '<br>' or part.isspace()
+
+    def __line_break(self):
+        if self.parts and self.parts[-1] != '<br>':
+            self.parts.append('<br>')
+
+
+def sanitise_html(html: str) -> str:
+    """ Returns description HTML reduced to basic formatting and links, safe to render as is.
+
+    Images, embeds, scripts, styles and every attribute other than a link's http(s) or mailto href are removed.
+    Typographic quotes and dashes are made plain, and any other characters outside Latin-1 are written as
+    character references, so the result is stored one byte per character.
+    """
+    if '<' not in html and '&' not in html:
+        body = escape(' '.join(html.translate(PLAIN_PUNCTUATION).split()), quote=False)
+    else:
+        sanitiser = _Sanitiser()
+        sanitiser.feed(html)
+        sanitiser.close()
+        body = ''.join(sanitiser.parts).strip()
+        if body.startswith('<p>') and body.endswith('</p>') and body.count('<p>') == 1:
+            # A single paragraph needs no wrapper.
+            body = body[3:-4].strip()
+    if body.isascii():
+        return body
+    return body.encode('latin-1', 'xmlcharrefreplace').decode('latin-1')
+
+
+def make_snippet(text: str, length: int = SNIPPET_LENGTH) -> str:
+    """ Shortens plain text to at most length characters, cutting at a word boundary. """
+    text = text.translate(PLAIN_PUNCTUATION)
+    if len(text) <= length:
+        return text
+    cut = text.rfind(' ', 0, length - 2)
+    if cut <= 0:
+        cut = length - 3
+    return text[:cut].rstrip(' ,.;:-') + '...'
+
+
+class Description(NamedTuple):
+    body: str       # Sanitised HTML.
+    text: str       # Visible text of body.
+    snippet: str    # Start of text, for listings.
+
+
+def normalise_description(html: str) -> Description:
+    """ Turns a raw description into its sanitised HTML, its plain text and a short snippet of that text. """
+    body = sanitise_html(html)
+    text = html_to_text(body)
+    snippet = make_snippet(text)
+    if snippet == body:
+        # Short plain-text descriptions are their own snippet; share the string rather than storing it twice.
+        snippet = body
+    return Description(body, text, snippet)
@@ -1,9 +1,26 @@
 from __future__ import annotations
 import random
 from datetime import datetime
-from typing import List, Iterable
+from typing import List, Iterable, NamedTuple, Optional
 from flask import current_app
 
+from podcast.domainmodel.descriptions import html_to_text, make_snippet, normalise_description, sanitise_html
+
+
+# The domain classes keep their attributes in the __slots__ of a private base class, so in memory mode no
+# instance carries a __dict__. The classes themselves add the __dict__ and __weakref__ slots SQLAlchemy needs
+# when orm.py maps them in database mode: its instrumented attributes shadow the base's slots and keep their
+# values in __dict__, which Python only creates once something is stored in it. clear_mappers removes the
+# instrumented attributes again, uncovering the slots.
+MAPPABLE_SLOTS = ('__dict__', '__weakref__')
+
+
+def new_instance(cls):
+    """ An instance of cls made without running __init__, for the trusted constructors. When orm.py has mapped
+    cls, SQLAlchemy's class manager makes it, so it gets the same state as the objects SQLAlchemy loads. """
+    manager = cls.__dict__.get('_sa_class_manager')
+    return manager.new_instance() if manager is not None else cls.__new__(cls)
+
 
 def validate_non_negative_int(value):
     if not isinstance(value, int) or value < 0:
@@ -20,7 +37,13 @@ def validate_datetime_object(object, field_name="value"):
         raise ValueError(f"{field_name} must be a datetime object")
 
 
-class Author:
+class _AuthorSlots:
+    __slots__ = ('_id', '_name', 'podcast_list')
+
+
+class Author(_AuthorSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, author_id: int, name: str):
         if author_id is not None:
             validate_non_negative_int(author_id)
@@ -29,6 +52,17 @@ class Author:
         self._name = name.strip()
         self.podcast_list = []
 
+    @classmethod
+    def trusted(cls, author_id: int, name: str) -> Author:
+        """ Builds an Author from values that have already been checked, e.g. by CSVDataReader, without
+        validating them again. name must already be stripped. The other classes' trusted constructors are
+        alike. """
+        author = new_instance(cls)
+        author._id = author_id
+        author._name = name
+        author.podcast_list = []
+        return author
+
     @property
     def id(self) -> int:
         return self._id
@@ -69,7 +103,14 @@ class Author:
         return hash(self.id)
 
 
-class Podcast:
+class _PodcastSlots:
+    __slots__ = ('_id', '_author', '_title', '_image', '_description', '_language', '_website', '_itunes_id',
+                 'episodes', 'categories')
+
+
+class Podcast(_PodcastSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, podcast_id: int, author: Author = None, title: str = "Untitled", image: str = None,
                  description: str = "", website: str = "", itunes_id: int = None, language: str = "Unspecified"):
         validate_non_negative_int(podcast_id)
@@ -85,6 +126,22 @@ class Podcast:
         self.categories = []
         self.episodes = []
 
+    @classmethod
+    def trusted(cls, podcast_id: int, author: Author, title: str, image: str, description: str, website: str,
+                itunes_id: int, language: str) -> Podcast:
+        podcast = new_instance(cls)
+        podcast._id = podcast_id
+        podcast._author = author
+        podcast._title = title
+        podcast._image = image
+        podcast._description = description
+        podcast._language = language
+        podcast._website = website
+        podcast._itunes_id = itunes_id
+        podcast.categories = []
+        podcast.episodes = []
+        return podcast
+
     @property
     def id(self) -> int:
         return self._id
@@ -185,7 +242,26 @@ class Podcast:
         return hash(self.id)
 
 
-class Category:
+class PodcastSummary(NamedTuple):
+    """ The few Podcast fields needed to list a Podcast, without its episodes, reviews or categories. """
+    id: int
+    title: str
+    image: Optional[str]
+    author_name: Optional[str]
+
+    @classmethod
+    def of(cls, podcast: Podcast) -> PodcastSummary:
+        author_name = podcast.author.name if podcast.author is not None else None
+        return cls(podcast.id, podcast.title, podcast.image, author_name)
+
+
+class _CategorySlots:
+    __slots__ = ('_id', '_name', '_tagged_podcasts')
+
+
+class Category(_CategorySlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, category_id: int, name: str):
         validate_non_negative_int(category_id)
         validate_non_empty_string(name, "Category name")
@@ -193,6 +269,14 @@ class Category:
         self._name = name.strip()
         self._tagged_podcasts = []
 
+    @classmethod
+    def trusted(cls, category_id: int, name: str) -> Category:
+        category = new_instance(cls)
+        category._id = category_id
+        category._name = name
+        category._tagged_podcasts = []
+        return category
+
     @property
     def id(self) -> int:
         return self._id
@@ -237,7 +321,13 @@ class Category:
         return hash(self._id)
 
 
-class User:
+class _UserSlots:
+    __slots__ = ('_id', '_username', '_password', '_subscription_list', '_playlists', '_reviews')
+
+
+class User(_UserSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, user_id: int, username: str, password: str):
         validate_non_negative_int(user_id)
         validate_non_empty_string(username, "Username")
@@ -249,6 +339,18 @@ class User:
         self._reviews = []
         self._playlists = []
 
+    @classmethod
+    def trusted(cls, user_id: int, username: str, password: str) -> User:
+        """ username must already be lower case and stripped. """
+        user = new_instance(cls)
+        user._id = user_id
+        user._username = username
+        user._password = password
+        user._subscription_list = []
+        user._reviews = []
+        user._playlists = []
+        return user
+
     @property
     def id(self) -> int:
         return self._id
@@ -339,6 +441,14 @@ class PodcastSubscription:
         self._owner = owner
         self._podcast = podcast
 
+    @classmethod
+    def trusted(cls, sub_id: int, owner: User, podcast: Podcast) -> PodcastSubscription:
+        subscription = new_instance(cls)
+        subscription._id = sub_id
+        subscription._owner = owner
+        subscription._podcast = podcast
+        return subscription
+
     @property
     def id(self) -> int:
         return self._id
@@ -380,7 +490,14 @@ class PodcastSubscription:
         return hash((self.id, self.owner, self.podcast))
 
 
-class Episode:
+class _EpisodeSlots:
+    __slots__ = ('_id', '_podcast', '_title', '_audio', '_length', '_description', '_snippet', '_upload_date',
+                 '_reviews', '_description_store')
+
+
+class Episode(_EpisodeSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, episode_id: int, podcast: Podcast, episode_title: str = "Untitled", episode_audio: str = "No link",
                  episode_length: int = 0, episode_desc: str = "No description", upload_date: datetime = datetime(1970, 1, 1)):
         validate_non_negative_int(episode_id)
@@ -393,11 +510,34 @@ class Episode:
         validate_non_negative_int(episode_length)
         self._length = episode_length
         # No longer validates non-empty string; i.e. row 43 in episodes.csv having no description.
-        self._description = episode_desc.strip()
+        # Raw descriptions are HTML; only the sanitised body and a plain-text snippet of it are kept.
+        description = normalise_description(episode_desc.strip())
+        self._description = description.body
+        self._snippet = description.snippet
         validate_datetime_object(upload_date, "Upload date")
         self._upload_date = upload_date
         self._reviews = []
 
+    @classmethod
+    def trusted(cls, episode_id: int, podcast: Podcast, title: str, audio: str, length: int, description: str,
+                upload_date: datetime, snippet: str = None) -> Episode:
+        """ title and audio must already be stripped. description is sanitised as in __init__, unless its
+        snippet is given too, in which case it must already be the body normalise_description returned. """
+        episode = new_instance(cls)
+        episode._id = episode_id
+        episode._podcast = podcast
+        episode._title = title
+        episode._audio = audio
+        episode._length = length
+        if snippet is None:
+            normalised = normalise_description(description)
+            description, snippet = normalised.body, normalised.snippet
+        episode._description = description
+        episode._snippet = snippet
+        episode._upload_date = upload_date
+        episode._reviews = []
+        return episode
+
     @property
     def id(self) -> int:
         return self._id
@@ -430,12 +570,37 @@ class Episode:
 
     @property
     def description(self) -> str:
-        return self._description
+        """ Sanitised HTML, safe to render without escaping. """
+        description = self._description
+        if isinstance(description, int):
+            # A handle to the text held outside the Episode, see keep_description_in.
+            description = self._description_store.get(description)
+        return description
 
     @description.setter
     def description(self, new_desc):
         validate_non_empty_string(new_desc, "New episode description")
-        self._description = new_desc.strip()
+        self._description = sanitise_html(new_desc.strip())
+        self._snippet = None
+
+    @property
+    def snippet(self) -> str:
+        """ The start of the description as plain text, for listings. """
+        # Episodes loaded by the ORM skip __init__, so their snippet is made on first use.
+        snippet = getattr(self, '_snippet', None)
+        if snippet is None:
+            snippet = self._snippet = make_snippet(html_to_text(self.description or ''))
+        return snippet
+
+    def keep_description_in(self, store):
+        """ Hands the description to store (e.g. a DescriptionFile) and keeps only what store.put returns for it:
+        the text itself, or an int handle that store.get reads it back with. The snippet stays with the Episode. """
+        if isinstance(self._description, str):
+            self._snippet = self.snippet  # Made now, while the description is at hand.
+            stored = store.put(self._description)
+            if isinstance(stored, int):
+                self._description_store = store
+            self._description = stored
 
     @property
     def upload_date(self) -> datetime:
@@ -477,7 +642,13 @@ class Episode:
         return hash((self.id, self.podcast.id, self.upload_date))
 
 
-class Review:
+class _ReviewSlots:
+    __slots__ = ('_id', '_podcast', '_episode', '_user', '_user_rating', '_content', '_post_date')
+
+
+class Review(_ReviewSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, review_id: int, user: User, rating: int, content: str,
                  podcast: Podcast = None, episode: Episode = None,
                  post_date: datetime = datetime(1970, 1, 1)):
@@ -501,6 +672,19 @@ class Review:
         self._content = content
         self._post_date = post_date
 
+    @classmethod
+    def trusted(cls, review_id: int, user: User, rating: int, content: str, podcast: Podcast, episode: Episode,
+                post_date: datetime) -> Review:
+        review = new_instance(cls)
+        review._id = review_id
+        review._podcast = podcast
+        review._episode = episode
+        review._user = user
+        review._user_rating = rating
+        review._content = content
+        review._post_date = post_date
+        return review
+
     @property
     def id(self) -> int:
         return self._id
@@ -574,7 +758,13 @@ class Review:
         return hash((self.id, self.user_rating, self.content))
 
 
-class Playlist:
+class _PlaylistSlots:
+    __slots__ = ('_id', '_owner', '_title', '_episodes')
+
+
+class Playlist(_PlaylistSlots):
+    __slots__ = MAPPABLE_SLOTS
+
     def __init__(self, playlist_id: int, playlist_owner: User, playlist_name: str = "Untitled"):
         validate_non_negative_int(playlist_id)
         self._id = playlist_id
@@ -585,6 +775,15 @@ class Playlist:
         self._title = playlist_name.strip()
         self._episodes = []
 
+    @classmethod
+    def trusted(cls, playlist_id: int, owner: User, title: str) -> Playlist:
+        playlist = new_instance(cls)
+        playlist._id = playlist_id
+        playlist._owner = owner
+        playlist._title = title
+        playlist._episodes = []
+        return playlist
+
     @property
     def id(self) -> int:
         return self._id
@@ -671,3 +870,9 @@ def make_category_association(podcast: Podcast, category: Category):
 
     podcast.add_category(category)
     category.add_podcast(podcast)
+
+
+def make_trusted_category_association(podcast: Podcast, category: Category):
+    """ make_category_association for a pair already known not to be associated, e.g. by CSVDataReader. """
+    podcast.categories.append(category)
+    category.add_podcast(podcast)
@@ -0,0 +1,86 @@
+from collections.abc import Mapping
+
+# Views block attribute assignment, so fields are set through object's own __setattr__.
+_set_field = object.__setattr__
+
+
+class View(Mapping):
+    """ Read-only snapshot of a domain object, as handed from the service layer to templates.
+
+    Fields are stored in slots, so a view takes a fraction of the memory of the dict it replaces, and can't be
+    changed once built, so one view can be cached and shared by every request. Views still behave as read-only
+    dicts: view['title'] and view.title both work, and a view compares equal to a dict with the same items.
+    Subclasses list their fields in both __slots__ and _fields.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values, **fields):
+        if values:
+            fields.update(zip(self._fields, values))
+        if len(fields) != len(self._fields):
+            raise TypeError(f"{type(self).__name__} takes the fields {', '.join(self._fields)}")
+        try:
+            for name in self._fields:
+                _set_field(self, name, fields[name])
+        except KeyError:
+            raise TypeError(f"{type(self).__name__} takes the fields {', '.join(self._fields)}") from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, name) for name in self._fields)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self._fields)
+        return f'{type(self).__name__}({fields})'
+
+    def replace(self, **changes):
+        """ Returns a copy of the view with some fields changed. """
+        return type(self)(**{**{name: getattr(self, name) for name in self._fields}, **changes})
+
+
+class ReviewView(View):
+    __slots__ = _fields = ('review_id', 'user_name', 'rating', 'content', 'podcast_id', 'episode_id', 'timestamp')
+
+
+class EpisodeView(View):
+    # reviews is a tuple of ReviewViews.
+    __slots__ = _fields = ('id', 'podcast_id', 'title', 'audio', 'description', 'upload_date', 'reviews')
+
+
+class EpisodeSummaryView(View):
+    # For listing Episodes: a short plain-text snippet in place of the description.
+    __slots__ = _fields = ('id', 'podcast_id', 'title', 'audio', 'snippet', 'upload_date', 'reviews')
+
+
+class EpisodeSearchResultView(EpisodeSummaryView):
+    __slots__ = ('podcast_title',)
+    _fields = EpisodeSummaryView._fields + __slots__
+
+
+class PodcastHeaderView(View):
+    # What detail pages show about a Podcast. categories is the Podcast's category names joined by " | ".
+    __slots__ = _fields = ('id', 'author', 'title', 'image', 'description', 'website', 'itunes_id', 'language',
+                           'categories')
+
+
+class PodcastView(PodcastHeaderView):
+    # episodes is a tuple of EpisodeSummaryViews.
+    __slots__ = ('episodes',)
+    _fields = PodcastHeaderView._fields + __slots__
@@ -4,6 +4,7 @@ from flask import Blueprint
 from flask import request, render_template, redirect, url_for, session
 
 from flask_wtf import FlaskForm
+from markupsafe import Markup
 from wtforms import TextAreaField, HiddenField, SubmitField, IntegerField
 from wtforms.validators import DataRequired, Length, ValidationError, NumberRange
 
@@ -13,18 +14,27 @@ import podcast.episodes.services as services
 import podcast.podcasts.services as podcast_services
 
 from podcast.authentication.authentication import login_required
+from podcast.domainmodel.descriptions import sanitise_html
 
 # Configure Blueprint.
 episodes_blueprint = Blueprint(
     'episodes_bp', __name__)
 
 
+@episodes_blueprint.app_template_filter('sanitised')
+def sanitised(html):
+    """ Sanitises description HTML and marks it safe to render. Episodes sanitise their descriptions when they
+    are built, but a database written before they did still holds raw feed HTML, so it is done again here. """
+    return Markup(sanitise_html(html or ''))
+
+
 @episodes_blueprint.route('/podcasts/<int:podcast_id>/episode/<int:episode_id>', methods=['GET'])
 @login_required
 def episode_detail(podcast_id, episode_id):
-    podcast = podcast_services.podcast_id(podcast_id, repo.repo_instance)
-    episode = services.get_episode(episode_id, repo.repo_instance)
-    reviews = services.get_reviews_for_episode(episode_id, repo.repo_instance)
+    podcast = podcast_services.podcast_header(podcast_id, repo.repo_instance)
+    # The reviews are shown a page at a time, below.
+    episode = services.get_episode(episode_id, repo.repo_instance, include_reviews=False)
+    previous_episode_id, next_episode_id = services.get_adjacent_episode_ids(episode_id, repo.repo_instance)
     username = session['user_name']
 
     user_playlist = None
@@ -38,19 +48,21 @@ def episode_detail(podcast_id, episode_id):
 
     page = request.args.get('page', 1, type=int)
     reviews_per_page = 6
-    start_index = (page - 1) * reviews_per_page
-    end_index = start_index + reviews_per_page
-    paginated_reviews = episode['reviews'][start_index:end_index]
-    total_pages = (len(episode['reviews']) + reviews_per_page - 1) // reviews_per_page
+    reviews = services.get_review_page(episode_id, page, reviews_per_page, repo.repo_instance,
+                                       request.args.get('after'))
+    total_pages = (reviews.total + reviews_per_page - 1) // reviews_per_page
 
     return render_template(
         'episode/episodeDescription.html',
         podcast=podcast,
         episode=episode,
-        reviews=paginated_reviews,
+        reviews=reviews.items,
+        next_cursor=reviews.next_cursor,
         page=page,
         total_pages=total_pages,
         user_playlist=user_playlist,
+        previous_episode_id=previous_episode_id,
+        next_episode_id=next_episode_id,
         max=max,
         min=min
     )
@@ -81,9 +93,6 @@ def review_on_episode():
         # Use the service layer to store the new review
         services.add_review(podcast_id, episode_id, form.review.data, user_name, form.rating.data, repo.repo_instance)
 
-        # Retrieve the episode in dict form
-        episode = services.get_episode(episode_id, repo.repo_instance)
-
         # Cause the web browser to display reviewed episode and display reviews, including new review
         return redirect(url_for('episodes_bp.episode_detail', podcast_id=podcast_id, episode_id=episode_id))
 
@@ -103,8 +112,8 @@ def review_on_episode():
 
     # For a GET or unsuccessful POST, retrieve the episode to review in dict form, and return
     # a web page that allows the user to enter a review. The generated web page includes a form object.
-    episode = services.get_episode(episode_id, repo.repo_instance)
-    podcast = podcast_services.podcast_id(podcast_id, repo.repo_instance)
+    episode = services.get_episode(episode_id, repo.repo_instance, include_reviews=False)
+    podcast = podcast_services.podcast_header(podcast_id, repo.repo_instance)
     return render_template(
         'episode/review_on_episode.html',
         title='Edit episode',
@@ -1,7 +1,9 @@
 from typing import Iterable
 
 from podcast.adapters.memory_repository import AbstractRepository
+from podcast.adapters.paging import Page
 from podcast.domainmodel.model import Podcast, Review, Episode, make_review
+from podcast.domainmodel.views import ReviewView, EpisodeView, EpisodeSummaryView
 
 
 class NonExistentPodcastException(Exception):
@@ -48,47 +50,85 @@ def get_reviews_for_episode(episode_id: int, repo: AbstractRepository):
     return reviews_to_dict(episode.reviews)
 
 
-def get_episode(episode_id: int, repo: AbstractRepository):
+def get_review_page(episode_id: int, page: int, per_page: int, repo: AbstractRepository, after: str = None) -> Page:
+    """Returns a Page of review dicts for an Episode, oldest first. If after is the next_cursor of the previous
+    page it is used to seek to this page, otherwise page is turned into an offset."""
+    if page < 1:
+        return Page([], repo.get_review_page(episode_id, 0).total)
+    reviews = repo.get_review_page(episode_id, per_page, (page - 1) * per_page, after)
+    return reviews._replace(items=reviews_to_dict(reviews.items))
+
+
+def get_episode(episode_id: int, repo: AbstractRepository, include_reviews: bool = True):
+    """Returns the view of an Episode. Without include_reviews its reviews are left out, for pages that show
+    them a page at a time through get_review_page."""
+    episode = repo.get_episode(episode_id)
+
+    if episode is None:
+        raise NonExistentEpisodeException
+
+    return episode_to_dict(episode, include_reviews)
+
+
+def get_adjacent_episode_ids(episode_id: int, repo: AbstractRepository):
+    """Returns the ids of the previous and next Episodes, by upload date, from the same Podcast."""
     episode = repo.get_episode(episode_id)
 
     if episode is None:
         raise NonExistentEpisodeException
 
-    return episode_to_dict(episode)
+    return repo.get_previous_episode_id(episode), repo.get_next_episode_id(episode)
 
 
-def review_to_dict(review: Review):
-    review_dict = {
-        'review_id': review.id,
-        'user_name': review.user.username,
-        'rating': review.user_rating,
-        'content': review.content,
-        'podcast_id': review.podcast.id,
-        'episode_id': review.episode.id,
-        'timestamp': review.post_date
-    }
-    return review_dict
+# The *_to_dict functions return read-only views, which templates and callers use like dicts.
+
+def review_to_dict(review: Review) -> ReviewView:
+    return ReviewView(
+        review_id=review.id,
+        user_name=review.user.username,
+        rating=review.user_rating,
+        content=review.content,
+        podcast_id=review.podcast.id,
+        episode_id=review.episode.id,
+        timestamp=review.post_date
+    )
 
 
 def reviews_to_dict(reviews: Iterable[Review]):
-    return [review_to_dict(review) for review in reviews]
+    return tuple(review_to_dict(review) for review in reviews)
 
 
-def episode_to_dict(episode: Episode):
-    episode_dict = {
-        'id': episode.id,
-        'podcast_id': episode.podcast.id,
-        'title': episode.title,
-        'audio': episode.audio,
-        'description': episode.description,
-        'upload_date': episode.upload_date,
-        'reviews': reviews_to_dict(episode.reviews)
-    }
-    return episode_dict
+def episode_to_dict(episode: Episode, include_reviews: bool = True) -> EpisodeView:
+    return EpisodeView(
+        id=episode.id,
+        podcast_id=episode.podcast.id,
+        title=episode.title,
+        audio=episode.audio,
+        description=episode.description,
+        upload_date=episode.upload_date,
+        reviews=reviews_to_dict(episode.reviews) if include_reviews else ()
+    )
 
 
 def episodes_to_dict(episodes: Iterable[Episode]):
-    return [episode_to_dict(episode) for episode in episodes]
+    return tuple(episode_to_dict(episode) for episode in episodes)
+
+
+def episode_summary_to_dict(episode: Episode) -> EpisodeSummaryView:
+    """Like episode_to_dict, but with the description's snippet instead of the whole description."""
+    return EpisodeSummaryView(
+        id=episode.id,
+        podcast_id=episode.podcast.id,
+        title=episode.title,
+        audio=episode.audio,
+        snippet=episode.snippet,
+        upload_date=episode.upload_date,
+        reviews=reviews_to_dict(episode.reviews)
+    )
+
+
+def episode_summaries_to_dict(episodes: Iterable[Episode]):
+    return tuple(episode_summary_to_dict(episode) for episode in episodes)
 
 
 def get_user(repo: AbstractRepository, username: str):
@@ -125,11 +125,11 @@ def add_podcast_to_playlist():
     podcast = services.get_podcast(repo.repo_instance, new_podcast_id)
 
     if user and podcast:
-        for episodes in podcast.episodes:
+        for episode in services.get_episodes_for_podcast(repo.repo_instance, podcast):
             if current_app.config['REPOSITORY'] == 'database':
-                repo.repo_instance.add_episode_to_playlist(user, episodes)
+                repo.repo_instance.add_episode_to_playlist(user, episode)
             else:
-                user.add_episode_to_playlist(episodes)
+                user.add_episode_to_playlist(episode)
         flash('Podcast successfully added to the playlist.', 'success')
     else:
         flash('Podcast or user not found.', 'error')
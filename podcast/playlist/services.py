@@ -13,3 +13,7 @@ def get_episode(repo: AbstractRepository, episode_id) -> Episode:
 
 def get_podcast(repo: AbstractRepository, podcast_id: str) -> Podcast:
     return repo.get_podcast(podcast_id)
+
+
+def get_episodes_for_podcast(repo: AbstractRepository, podcast: Podcast):
+    return repo.get_episodes_for_podcast(podcast.id)
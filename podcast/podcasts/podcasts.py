@@ -1,7 +1,7 @@
 from datetime import date
 import math
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
+from flask import request, render_template, redirect, url_for, session, jsonify
 
 import podcast.podcasts.services as services
 import podcast.adapters.repository as repo
@@ -13,19 +13,21 @@ podcasts_blueprint = Blueprint('podcasts_bp', __name__)
 
 @podcasts_blueprint.route('/podcasts/<int:id>', methods=['GET'])
 def podcast_detail(id):
-    podcast = services.podcast_id(id, repo.repo_instance)
+    # The episodes are shown a page at a time, below.
+    podcast = services.podcast_header(id, repo.repo_instance)
     page = request.args.get('page', 1, type=int)
     episodes_per_page = 6
-    start_index = (page - 1) * episodes_per_page
-    end_index = start_index + episodes_per_page
-    paginated_episodes = podcast['episodes'][start_index:end_index]
-    total_pages = (len(podcast['episodes']) + episodes_per_page - 1) // episodes_per_page
+    # "after" is the cursor from the previous page's next link; jumping to a page number uses an offset instead.
+    episodes = services.get_episode_page(id, page, episodes_per_page, repo.repo_instance,
+                                         request.args.get('after'))
+    total_pages = (episodes.total + episodes_per_page - 1) // episodes_per_page
     return render_template(
         'podcastDescription.html',
         title=f'{podcast["title"]} | CS235 Pod Library',
         podcast=podcast,
         podcast_categories=podcast["categories"],
-        episodes=paginated_episodes,
+        episodes=episodes.items,
+        next_cursor=episodes.next_cursor,
         page=page,
         total_pages=total_pages,
         max=max,
@@ -39,14 +41,28 @@ def search_podcast():
     filter_by = request.args.get('filter', 'title')
     page = request.args.get('page', 1, type=int)
     per_page = 15
-    search_results = services.search_podcast(query, filter_by, repo.repo_instance)
-    total_results = len(search_results)
-    total_pages = (total_results + per_page - 1) // per_page
-    paginated_results = search_results[(page - 1) * per_page:page * per_page]
+    if filter_by == 'episodes':
+        episode_results, num_results = services.search_episode_page(query, page, per_page, repo.repo_instance)
+        return render_template(
+            'podcasts.html',
+            episode_results=episode_results,
+            num_results=num_results,
+            total_pages=(num_results + per_page - 1) // per_page,
+            page=page,
+            query=query,
+            filter_by=filter_by,
+            max=max,
+            min=min
+        )
+
+    results = services.search_podcast(query, filter_by, repo.repo_instance)
+    paginated_results = results.page(page, per_page)
+    total_pages = results.page_count(per_page)
 
     return render_template(
         'podcasts.html',
         search_results=paginated_results,
+        num_results=results.total,
         total_pages=total_pages,
         page=page,
         query=query,
@@ -56,22 +72,33 @@ def search_podcast():
     )
 
 
+@podcasts_blueprint.route('/search/suggest', methods=['GET'])
+def search_suggestions():
+    prefix = request.args.get('query', '')
+    filter_by = request.args.get('filter', 'title')
+    suggestions = services.get_search_suggestions(prefix, filter_by, repo.repo_instance)
+    return jsonify(suggestions)
+
+
 @podcasts_blueprint.route('/podcasts', methods=['GET'])
 def browse_podcast():
     page = request.args.get('page', 1, type=int)
     per_page = 15
-    num_podcast = services.get_number_of_podcasts(repo.repo_instance)
-    all_podcast = list(services.get_podcast_dicts(repo.repo_instance).values())
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_podcasts = all_podcast[start_index:end_index]
+    filters = {facet: request.args.get(facet) for facet in ('category', 'language', 'author')
+               if request.args.get(facet)}
+
+    podcasts = services.get_podcast_summaries(filters, page, per_page, repo.repo_instance, request.args.get('after'))
+    num_podcast = podcasts.total
 
     return render_template(
         'podcasts.html',
         title=f'Browse page | CS235 Pod Library',
         heading='Browse Podcast',
         num_podcast=num_podcast,
-        podcasts=paginated_podcasts,
+        podcasts=podcasts.items,
+        next_cursor=podcasts.next_cursor,
+        filters=filters,
+        facet_counts=services.get_facet_counts(filters, repo.repo_instance),
         page=page,
         total_pages=math.ceil(num_podcast / per_page),
         max=max,
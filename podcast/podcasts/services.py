@@ -1,67 +1,214 @@
 from typing import List, Iterable
+from weakref import WeakKeyDictionary
 
 from sqlalchemy.orm.collections import InstrumentedList
 
 from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Podcast, Category, Episode
-from podcast.episodes.services import episode_to_dict, episodes_to_dict
+from podcast.adapters.cache import ResultCache
+from podcast.adapters.paging import Page
+from podcast.domainmodel.model import Podcast, Category, Episode, Author
+from podcast.domainmodel.views import PodcastView, PodcastHeaderView, EpisodeSearchResultView
+from podcast.episodes.services import episode_to_dict, episodes_to_dict, episode_summary_to_dict, \
+    episode_summaries_to_dict
+
+
+# Pages of search results, shared by every request. create_app sets its budget from SEARCH_CACHE_BYTES.
+search_cache = ResultCache()
 
 
 def get_number_of_podcasts(repo: AbstractRepository):
     return repo.get_number_of_podcasts()
 
 
-def podcast_id(id: int, repo: AbstractRepository):
-    podcasts = get_podcast_dicts(repo)
-    return podcasts[id]
+def podcast_id(id: int, repo: AbstractRepository) -> PodcastView:
+    """Returns the view of Podcast id, built on first use and rebuilt once the Podcast, its episodes or their
+    reviews change. The same view is shared by every request until then. Raises KeyError if there is no such
+    Podcast."""
+    return _cached_view(_podcast_views, id, repo,
+                        lambda podcast: podcast_to_dict(podcast, repo.get_episodes_for_podcast(podcast.id)))
+
+
+def podcast_header(id: int, repo: AbstractRepository) -> PodcastHeaderView:
+    """Returns podcast_id's view of Podcast id without its episodes, for pages that only show the Podcast above
+    a page of its episodes or an episode's reviews. No Episodes are read to build it. Cached the same way as
+    podcast_id. Raises KeyError if there is no such Podcast."""
+    return _cached_view(_podcast_headers, id, repo, podcast_header_to_dict)
 
 
-class PodcastDicts:
-    podcast_dicts = {}
+def _cached_view(views_by_repo: WeakKeyDictionary, id: int, repo: AbstractRepository, build):
+    # Read the version before building, so a change made while building leaves an entry that is rebuilt next time.
+    version = repo.get_podcast_version(id)
+    if version is None:
+        raise KeyError(id)
+    views = views_by_repo.setdefault(repo, dict())
+    cached = views.get(id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    podcast = repo.get_podcast(id)
+    if podcast is None:
+        raise KeyError(id)
+    view = build(podcast)
+    if podcast.author is not None:
+        # A plain copy, as a database-backed Author can't be read once its session is closed.
+        view = view.replace(author=Author(podcast.author.id, podcast.author.name))
+    views[id] = (version, view)
+    return view
+
+
+# Views built by podcast_id and podcast_header, for each repository: {repo: {podcast id: (podcast version, view)}}.
+_podcast_views = WeakKeyDictionary()
+_podcast_headers = WeakKeyDictionary()
 
 
 def get_podcast_dicts(repo: AbstractRepository):
-    podcasts = repo.get_list_of_podcasts()
-    if PodcastDicts.podcast_dicts == {} or repo.get_number_of_podcasts() < 50:
-        for podcast in podcasts:
-            podcast_dict = podcast_to_dict(podcast)
-            PodcastDicts.podcast_dicts[podcast_dict["id"]] = podcast_dict
-    return PodcastDicts.podcast_dicts
-
-
-def search_podcast(query: str, filter_by: str, repo: AbstractRepository) -> List[dict]:
-    podcasts = repo.get_list_of_podcasts()
-    query_lower = query.lower()  #lowercase
-    matching_podcasts = []
-
-    for podcast in podcasts:
-        if filter_by == 'title' and query_lower in podcast.title.lower():
-            matching_podcasts.append(podcast_to_dict(podcast))
-        elif filter_by == 'category':
-            for category in podcast.categories:
-                if query_lower in category.name.lower():
-                    matching_podcasts.append(podcast_to_dict(podcast))
-                    break
-        elif filter_by == 'author' and query_lower in podcast.author.name.lower():
-            matching_podcasts.append(podcast_to_dict(podcast))
-
-    return matching_podcasts
-
-
-def podcast_to_dict(podcast: Podcast):
-    podcast_dict = {
-        'id': podcast.id,
-        'author': podcast.author,
-        'title': podcast.title,
-        'image': podcast.image,
-        'description': podcast.description,
-        'website': podcast.website,
-        'itunes_id': podcast.itunes_id,
-        'language': podcast.language,
-        'categories': categories_to_string(podcast.categories),     # Categories current unimplemented.
-        'episodes': episodes_to_dict(podcast.episodes)
-    }
-    return podcast_dict
+    return {podcast.id: podcast_id(podcast.id, repo) for podcast in repo.get_list_of_podcasts()}
+
+
+def get_podcast_summaries(filters: dict, page: int, per_page: int, repo: AbstractRepository, after: str = None) -> Page:
+    """Returns a Page of PodcastSummaries in title order, limited to Podcasts matching every facet filter,
+    with the total number of matching Podcasts. If after is the next_cursor of the previous page it is used
+    to seek to this page, otherwise page is turned into an offset."""
+    if page < 1:
+        # Pages before the first are empty, but still report the total.
+        return Page([], repo.get_podcast_summaries(0, 0, filters).total)
+    return repo.get_podcast_summaries(per_page, (page - 1) * per_page, filters, after)
+
+
+def get_episode_page(podcast_id: int, page: int, per_page: int, repo: AbstractRepository, after: str = None) -> Page:
+    """Returns a Page of episode summaries for a Podcast, oldest first, found the same way as
+    get_podcast_summaries."""
+    if page < 1:
+        return Page([], repo.get_episode_page(podcast_id, 0).total)
+    episodes = repo.get_episode_page(podcast_id, per_page, (page - 1) * per_page, after)
+    return episodes._replace(items=episode_summaries_to_dict(episodes.items))
+
+
+def get_facet_counts(filters: dict, repo: AbstractRepository, facets=('category', 'language')):
+    """Returns {facet: [(value, count), ...]} with values in alphabetical order, for building filter menus."""
+    counts = repo.get_facet_counts(filters, facets)
+    return {facet: sorted(value_counts.items()) for facet, value_counts in counts.items()}
+
+
+def search_podcasts_cached(query: str, filter_by: str, limit: int, offset: int, repo: AbstractRepository):
+    """Returns repo.search_podcasts(query, filter_by, limit, offset), reusing the result of an earlier call
+    with the same arguments if the repository hasn't been changed since."""
+    # Search ignores case, so "Radio" and "radio" share an entry.
+    key = (query.lower(), filter_by, limit, offset, repo.mutation_version)
+    result = search_cache.get(key)
+    if result is None:
+        page_ids, total = repo.search_podcasts(query, filter_by, limit, offset)
+        result = (tuple(page_ids), total)
+        search_cache.put(key, result)
+    return list(result[0]), result[1]
+
+
+class SearchResults:
+    """Lazy results of a Podcast search.
+
+    Nothing is looked up until it is asked for: total runs a count, and page() only loads and converts the
+    Podcasts on the requested page. Iterating the results converts every match, so only do that for small
+    result sets.
+    """
+
+    def __init__(self, query: str, filter_by: str, repo: AbstractRepository):
+        self.query = query
+        self.filter_by = filter_by
+        self.__repo = repo
+        self.__total = None
+
+    @property
+    def total(self) -> int:
+        if self.__total is None:
+            _, self.__total = search_podcasts_cached(self.query, self.filter_by, 0, 0, self.__repo)
+        return self.__total
+
+    def page(self, page: int, per_page: int) -> List[dict]:
+        """Returns the Podcast dicts for one page of results, counting pages from 1."""
+        start_index = (page - 1) * per_page
+        if start_index < 0:
+            # Pages before the first are empty.
+            return []
+        page_ids, self.__total = search_podcasts_cached(self.query, self.filter_by, per_page, start_index,
+                                                        self.__repo)
+        return podcasts_to_dict(get_podcasts_in_order(page_ids, self.__repo), self.__repo)
+
+    def page_count(self, per_page: int) -> int:
+        return (self.total + per_page - 1) // per_page
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        podcast_ids = self.__repo.search_podcast_ids(self.query, self.filter_by)
+        for podcast in get_podcasts_in_order(podcast_ids, self.__repo):
+            yield podcast_to_dict(podcast, self.__repo.get_episodes_for_podcast(podcast.id))
+
+
+def search_podcast(query: str, filter_by: str, repo: AbstractRepository) -> SearchResults:
+    return SearchResults(query, filter_by, repo)
+
+
+def search_podcast_page(query: str, filter_by: str, page: int, per_page: int, repo: AbstractRepository):
+    """Returns the Podcast dicts for one page of search results, and the total number of results."""
+    results = search_podcast(query, filter_by, repo)
+    return results.page(page, per_page), results.total
+
+
+def search_episode_page(query: str, page: int, per_page: int, repo: AbstractRepository):
+    """Returns the Episode views for one page of episode search results, best match first, and the total
+    number of results. Each view also carries its Podcast's title."""
+    start_index = (page - 1) * per_page
+    if start_index < 0:
+        page_ids, total = repo.search_episodes(query, 0)
+    else:
+        page_ids, total = repo.search_episodes(query, per_page, start_index)
+    episodes = {episode.id: episode for episode in repo.get_episodes_by_id(page_ids)}
+    episode_views = []
+    for episode_id in page_ids:
+        if episode_id in episodes:
+            episode_view = episode_summary_to_dict(episodes[episode_id])
+            episode_views.append(EpisodeSearchResultView(**episode_view,
+                                                         podcast_title=episodes[episode_id].podcast.title))
+    return episode_views, total
+
+
+def get_search_suggestions(prefix: str, filter_by: str, repo: AbstractRepository, limit: int = 8) -> List[str]:
+    return repo.get_search_suggestions(prefix.strip(), filter_by, limit)
+
+
+def get_podcasts_in_order(podcast_ids: List[int], repo: AbstractRepository) -> List[Podcast]:
+    # get_podcasts_by_id doesn't promise to keep the order of the ids it was given.
+    podcasts = {podcast.id: podcast for podcast in repo.get_podcasts_by_id(podcast_ids)}
+    return [podcasts[podcast_id] for podcast_id in podcast_ids if podcast_id in podcasts]
+
+
+def podcast_to_dict(podcast: Podcast, episodes: Iterable[Episode] = None) -> PodcastView:
+    """Converts a Podcast, with the given Episodes, which should come from the repository's
+    get_episodes_for_podcast. Without them, Podcast.episodes is used, which a repository need not fill in."""
+    if episodes is None:
+        episodes = podcast.episodes
+    return PodcastView(**podcast_header_to_dict(podcast), episodes=episode_summaries_to_dict(episodes))
+
+
+def podcast_header_to_dict(podcast: Podcast) -> PodcastHeaderView:
+    return PodcastHeaderView(
+        id=podcast.id,
+        author=podcast.author,
+        title=podcast.title,
+        image=podcast.image,
+        description=podcast.description,
+        website=podcast.website,
+        itunes_id=podcast.itunes_id,
+        language=podcast.language,
+        categories=categories_to_string(podcast.categories),     # Categories current unimplemented.
+    )
+
+
+def podcasts_to_dict(podcasts: Iterable[Podcast], repo: AbstractRepository = None):
+    if repo is None:
+        return [podcast_to_dict(podcast) for podcast in podcasts]
+    return [podcast_to_dict(podcast, repo.get_episodes_for_podcast(podcast.id)) for podcast in podcasts]
 
 
 def category_to_dict(category: Category):
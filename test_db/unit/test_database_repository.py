@@ -1,7 +1,9 @@
 import pytest
+from datetime import datetime
 
 from podcast import SqlAlchemyRepository
-from podcast.domainmodel.model import Author, Podcast, User, Episode, Review, Playlist, Category
+from podcast.domainmodel.model import Author, Podcast, User, Episode, Review, Playlist, Category, PodcastSummary
+from podcast.adapters.paging import Page
 
 
 def test_repository_can_add_and_get_author(session_factory):
@@ -63,6 +65,17 @@ def test_repository_can_add_and_get_episode(session_factory):
     assert retrieved_episode == episode
 
 
+
+def test_repository_episode_snippet_is_made_after_loading(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(1, Author(1, 'Author Name'), 'Sample Podcast')
+    repo.add_episode(Episode(1, podcast, 'Sample Episode', episode_desc='<div>Sample <i>description</i></div>'))
+    repo.reset_session()
+
+    episode = repo.get_episode(1)
+    assert episode.description == 'Sample <i>description</i>'
+    assert episode.snippet == 'Sample description'
+
 def test_repository_can_add_and_get_review(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -149,9 +162,9 @@ def test_repository_can_add_and_get_podcast_by_language(session_factory):
 
     repo.add_podcast(podcast)
 
-    podcasts = repo.get_podcast_ids_by_language('English')
-    assert len(podcasts) == 1
-    assert podcasts[0] == podcast
+    podcast_ids = repo.get_podcast_ids_by_language('English')
+    assert podcast_ids == [1]
+    assert repo.get_podcast_ids_by_language('Spanish') == []
 
 
 def test_repository_can_get_number_of_reviews(session_factory):
@@ -166,4 +179,297 @@ def test_repository_can_get_number_of_reviews(session_factory):
     repo.add_review(review)
 
     number_of_reviews = repo.get_number_of_reviews()
-    assert number_of_reviews == 1
\ No newline at end of file
+    assert number_of_reviews == 1
+
+
+def test_repository_can_get_next_and_previous_episode_id(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    author = Author(1, 'Author Name')
+    podcast = Podcast(1, author, 'Sample Podcast')
+    other_podcast = Podcast(2, author, 'Other Podcast')
+    newest = Episode(1, podcast, 'Newest', upload_date=datetime(2024, 3, 1))
+    oldest = Episode(2, podcast, 'Oldest', upload_date=datetime(2024, 1, 1))
+    middle = Episode(3, podcast, 'Middle', upload_date=datetime(2024, 2, 1))
+    other = Episode(4, other_podcast, 'Other', upload_date=datetime(2024, 1, 15))
+    for episode in (newest, oldest, middle, other):
+        repo.add_episode(episode)
+
+    oldest = repo.get_episode(2)
+    middle = repo.get_episode(3)
+    newest = repo.get_episode(1)
+    assert repo.get_next_episode_id(oldest) == 3
+    assert repo.get_next_episode_id(middle) == 1
+    assert repo.get_next_episode_id(newest) is None
+    assert repo.get_previous_episode_id(newest) == 3
+    assert repo.get_previous_episode_id(oldest) is None
+    assert repo.get_previous_episode_id(repo.get_episode(4)) is None
+
+
+def test_repository_can_filter_podcasts_by_facets(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    comedy = Category(1, 'Comedy')
+    news = Category(2, 'News')
+    author = Author(1, 'Author Name')
+    english_comedy = Podcast(1, author, 'English Comedy', language='English')
+    english_comedy.add_category(comedy)
+    english_news = Podcast(2, author, 'English News', language='English')
+    english_news.add_category(news)
+    italian_comedy = Podcast(3, Author(2, 'Other Author'), 'Italian Comedy', language='Italian')
+    italian_comedy.add_category(comedy)
+    for podcast in (english_comedy, english_news, italian_comedy):
+        repo.add_podcast(podcast)
+
+    assert repo.get_podcast_ids_by_facets({'category': 'Comedy', 'language': 'English'}) == [1]
+    assert repo.get_podcast_ids_by_facets({'author': 'Author Name'}) == [1, 2]
+    assert repo.get_podcast_ids_by_facets({}) == [1, 2, 3]
+
+    counts = repo.get_facet_counts({'category': 'Comedy', 'language': 'English'})
+    assert counts['category'] == {'Comedy': 1, 'News': 1}
+    assert counts['language'] == {'English': 1, 'Italian': 1}
+    assert counts['author'] == {'Author Name': 1}
+
+
+def test_repository_can_search_podcast_ids(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    comedy = Category(1, 'Comedy')
+    first = Podcast(1, Author(1, 'Janelle Vecchio'), 'The Mandarian Orange Show')
+    first.add_category(comedy)
+    second = Podcast(2, Author(2, 'Brian Denny'), 'Brian Denny Radio')
+    second.add_category(comedy)
+    repo.add_podcast(first)
+    repo.add_podcast(second)
+
+    assert repo.search_podcast_ids('ORANGE', 'title') == [1]
+    assert repo.search_podcast_ids('an', 'title') == [2, 1]
+    assert repo.search_podcast_ids('vec', 'author') == [1]
+    assert repo.search_podcast_ids('edy', 'category') == [2, 1]
+    assert repo.search_podcast_ids('radio', 'language') == []
+
+
+def test_repository_substring_search_folds_non_ascii_case(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    podcast = Podcast(1, Author(1, 'ZOË Durand'), 'Émission Économique')
+    podcast.add_category(Category(1, 'Économie'))
+    repo.add_podcast(podcast)
+    repo.add_podcast(Podcast(2, Author(2, 'Brian Denny'), 'Brian Denny Radio'))
+
+    assert repo.search_podcast_ids('émi', 'title') == [1]
+    assert repo.search_podcast_ids('zoë', 'author') == [1]
+    assert repo.search_podcast_ids('ÉCONOMIE', 'category') == [1]
+    # Too short for the full-text search table, so it is matched the same way.
+    assert repo.search_podcasts('éM', 'title', 10) == ([1], 1)
+    assert repo.get_search_suggestions('é', 'title') == ['Émission Économique']
+
+
+@pytest.mark.parametrize('full_text_search', (True, False))
+def test_repository_can_search_podcasts_with_paging(session_factory, full_text_search):
+    repo = SqlAlchemyRepository(session_factory)
+    if full_text_search:
+        assert repo.enable_full_text_search()
+
+    comedy = Category(1, 'Comedy')
+    author = Author(1, 'Brian Denny')
+    for podcast_id, title in enumerate(['Radio One', 'Radio Two', 'Talk Radio', 'Podcast Hour'], start=1):
+        podcast = Podcast(podcast_id, author, title)
+        podcast.add_category(comedy)
+        repo.add_podcast(podcast)
+    # Added after the podcasts, so the search table has to pick up the new author name.
+    repo.add_podcast(Podcast(5, Author(2, 'Janelle Vecchio'), 'Orange Show'))
+
+    page_ids, total = repo.search_podcasts('RADIO', 'title', 2, 0)
+    assert total == 3
+    assert len(page_ids) == 2
+    rest, total = repo.search_podcasts('RADIO', 'title', 2, 2)
+    assert total == 3
+    assert set(page_ids + rest) == {1, 2, 3}
+
+    assert repo.search_podcasts('dcast h', 'title', 10) == ([4], 1)
+    assert repo.search_podcasts('vecchio', 'author', 10) == ([5], 1)
+    assert repo.search_podcasts('comed', 'category', 10)[1] == 4
+    assert repo.search_podcasts('tw', 'title', 10) == ([2], 1)
+    assert repo.search_podcasts('radio', 'language', 10) == ([], 0)
+
+
+def test_repository_can_get_search_suggestions(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    comedy = Category(1, 'Comedy')
+    culture = Category(2, 'Culture')
+    author = Author(1, 'Brian Denny')
+    talk = Podcast(1, author, 'Talk Radio')
+    talk.add_category(comedy)
+    show = Podcast(2, author, 'The Orange Show')
+    show.add_category(comedy)
+    show.add_category(culture)
+    repo.add_podcast(talk)
+    repo.add_podcast(show)
+    repo.add_podcast(Podcast(3, Author(2, 'Bob'), 'Brian Denny Radio'))
+    repo.add_episode(Episode(1, show, 'Episode 1', 'audio', 60, 'description', datetime(2020, 1, 1)))
+
+    # The Orange Show has an episode, so it comes before the alphabetically first title.
+    assert repo.get_search_suggestions('T', 'title') == ['The Orange Show', 'Talk Radio']
+    assert repo.get_search_suggestions('t', 'title', 1) == ['The Orange Show']
+    assert repo.get_search_suggestions('b', 'author') == ['Brian Denny', 'Bob']
+    assert repo.get_search_suggestions('c', 'category') == ['Comedy', 'Culture']
+    assert repo.get_search_suggestions('', 'title') == []
+    assert repo.get_search_suggestions('b', 'language') == []
+
+
+def test_repository_can_search_podcasts_fuzzily(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    repo.add_podcast(Podcast(1, Author(1, 'Janelle Vecchio'), 'The Mandarian Orange Show'))
+    assert repo.build_fuzzy_index()['podcasts'] == 1
+
+    # Added after the index was built.
+    repo.add_podcast(Podcast(2, Author(2, 'Brian Denny'), 'Brian Denny Radio'))
+
+    assert repo.search_podcast_ids('Mandarain Orange', 'fuzzy') == [1]
+    assert repo.search_podcasts('brain deny', 'fuzzy', 10) == ([2], 1)
+    assert repo.search_podcasts('vechio', 'fuzzy', 10) == ([1], 1)
+
+
+def test_repository_can_search_episodes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(1, Author(1, 'Brian Denny'), 'Brian Denny Radio')
+    repo.add_podcast(podcast)
+    repo.add_episode(Episode(1, podcast, 'Sunday Sermon', 'audio', 60,
+                             '<p><img srcset="https://example.com/a.jpg 600w">A sermon on grace.</p>'))
+    assert repo.search_episodes('grace', 10) == ([1], 1)
+
+    # Added after the index was built.
+    repo.add_episode(Episode(2, podcast, 'Grace', 'audio', 60, '<p>Grace and more grace.</p>'))
+    assert repo.search_episodes('grace', 10) == ([2, 1], 2)
+    assert repo.search_episodes('srcset', 10) == ([], 0)
+
+
+def test_repository_podcast_version_changes_with_episodes_and_reviews(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(1, Author(1, 'Brian Denny'), 'Brian Denny Radio')
+    repo.add_podcast(podcast)
+    assert repo.get_podcast_version(2) is None
+
+    versions = [repo.get_podcast_version(1)]
+    episode = Episode(1, podcast, 'Episode 1', 'audio', 60, 'description', datetime(2020, 1, 1))
+    repo.add_episode(episode)
+    versions.append(repo.get_podcast_version(1))
+    user = User(1, 'reviewer', 'Password123')
+    repo.add_user(user)
+    repo.add_review(Review(1, user, 5, 'Loved it', podcast, episode))
+    versions.append(repo.get_podcast_version(1))
+    assert repo.get_podcast_version(1) == versions[-1]
+    assert len(set(versions)) == 3
+
+
+def test_repository_can_get_podcast_summaries(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    comedy = Category(1, 'Comedy')
+    orange = Podcast(1, Author(1, 'Janelle Vecchio'), 'The Mandarian Orange Show', image='orange.png')
+    orange.add_category(comedy)
+    repo.add_podcast(orange)
+    repo.add_podcast(Podcast(2, Author(2, 'Brian Denny'), 'Brian Denny Radio', image='brian.png'))
+    repo.add_podcast(Podcast(3, None, 'D-Hour Radio Network'))
+
+    summaries, total, _ = repo.get_podcast_summaries(2)
+    assert total == 3
+    assert summaries == [PodcastSummary(2, 'Brian Denny Radio', 'brian.png', 'Brian Denny'),
+                         PodcastSummary(3, 'D-Hour Radio Network', None, None)]
+    assert repo.get_podcast_summaries(2, 2) == Page([PodcastSummary(1, 'The Mandarian Orange Show', 'orange.png',
+                                                                    'Janelle Vecchio')], 3)
+    assert repo.get_podcast_summaries(10, 0, {'category': 'Comedy'})[1] == 1
+
+
+def test_repository_podcast_summary_cursors(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    for podcast_id, title in [(1, 'Bravo'), (2, 'Alpha'), (3, 'Bravo'), (4, 'Charlie'), (5, 'Alpha')]:
+        repo.add_podcast(Podcast(podcast_id, None, title))
+
+    first = repo.get_podcast_summaries(2)
+    assert [summary.id for summary in first.items] == [2, 5]
+    second = repo.get_podcast_summaries(2, cursor=first.next_cursor)
+    assert [summary.id for summary in second.items] == [1, 3]
+    last = repo.get_podcast_summaries(2, cursor=second.next_cursor)
+    assert ([summary.id for summary in last.items], last.total, last.next_cursor) == ([4], 5, None)
+    assert repo.get_podcast_summaries(2, 2, cursor='not a cursor').items == second.items
+
+
+def test_repository_can_get_episode_page(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(1, Author(1, 'Author Name'), 'Sample Podcast')
+    other_podcast = Podcast(2, Author(1, 'Author Name'), 'Other Podcast')
+    for episode_id, month in [(1, 3), (2, 1), (3, 2), (4, 2), (5, 4)]:
+        repo.add_episode(Episode(episode_id, podcast, f'Episode {episode_id}', upload_date=datetime(2024, month, 1)))
+    repo.add_episode(Episode(6, other_podcast, 'Other', upload_date=datetime(2024, 1, 15)))
+
+    first = repo.get_episode_page(1, 2)
+    assert [episode.id for episode in first.items] == [2, 3]
+    assert first.total == 5
+    second = repo.get_episode_page(1, 2, cursor=first.next_cursor)
+    assert [episode.id for episode in second.items] == [4, 1]
+    last = repo.get_episode_page(1, 2, cursor=second.next_cursor)
+    assert ([episode.id for episode in last.items], last.next_cursor) == ([5], None)
+    assert [episode.id for episode in repo.get_episode_page(1, 2, 2).items] == [4, 1]
+    assert repo.get_episode_page(99, 2) == Page([], 0)
+
+
+def test_repository_can_get_review_page(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    user = User(1, 'user1', 'password123')
+    podcast = Podcast(1, Author(1, 'Author Name'), 'Sample Podcast')
+    episode = Episode(1, podcast, 'Sample Episode')
+    for review_id in range(1, 6):
+        repo.add_review(Review(review_id, user, 4, f'Review {review_id}', podcast, episode))
+
+    first = repo.get_review_page(1, 3)
+    assert [review.id for review in first.items] == [1, 2, 3]
+    assert first.total == 5
+    second = repo.get_review_page(1, 3, cursor=first.next_cursor)
+    assert ([review.id for review in second.items], second.next_cursor) == ([4, 5], None)
+    assert repo.get_review_page(1, 3, 3).items == second.items
+    assert repo.get_review_page(2, 3) == Page([], 0)
+
+
+@pytest.mark.parametrize('full_text_search', (True, False))
+def test_repository_can_bulk_load_a_catalogue(session_factory, full_text_search):
+    repo = SqlAlchemyRepository(session_factory)
+    if full_text_search:
+        assert repo.enable_full_text_search()
+    version = repo.mutation_version
+
+    comedy, news = Category(1, 'Comedy'), Category(2, 'News')
+    author = Author(1, 'Brian Denny')
+    radio = Podcast(1, author, 'Radio One', description='Talk')
+    radio.add_category(comedy)
+    radio.add_category(news)
+    orange = Podcast(2, Author(2, 'Janelle Vecchio'), 'Orange Show')
+    episodes = [Episode(1, radio, 'Episode 1', upload_date=datetime(2024, 1, 1)),
+                Episode(2, orange, 'Episode 2', episode_desc='Oranges')]
+    repo.bulk_load([author, orange.author], [radio, orange], [comedy, news], episodes)
+
+    assert repo.mutation_version > version
+    assert repo.get_number_of_podcasts() == 2
+    assert repo.get_number_of_episodes() == 2
+    podcast = repo.get_podcast(1)
+    assert (podcast.title, podcast.description, podcast.author.name) == ('Radio One', 'Talk', 'Brian Denny')
+    assert {category.name for category in podcast.categories} == {'Comedy', 'News'}
+    assert repo.get_episode(2).description == 'Oranges'
+    assert repo.get_episode(1).podcast == radio
+    # The search table is rebuilt with the loaded rows, and keeps up with later changes.
+    assert repo.search_podcasts('orange', 'title', 10) == ([2], 1)
+    repo.add_podcast(Podcast(3, author, 'Orange Radio'))
+    page_ids, total = repo.search_podcasts('orange', 'title', 10)
+    assert (set(page_ids), total) == ({2, 3}, 2)
+
+
+def test_repository_can_get_episodes_for_podcast(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    podcast = Podcast(1, Author(1, 'Author Name'), 'Sample Podcast')
+    other_podcast = Podcast(2, Author(2, 'Other Author'), 'Other Podcast')
+    for episode_id, parent in [(3, podcast), (1, podcast), (2, other_podcast)]:
+        repo.add_episode(Episode(episode_id, parent, f'Episode {episode_id}'))
+
+    assert [episode.id for episode in repo.get_episodes_for_podcast(1)] == [1, 3]
+    assert repo.get_episodes_for_podcast(99) == []
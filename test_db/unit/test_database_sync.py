@@ -0,0 +1,145 @@
+import csv
+import shutil
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, insert
+
+from podcast import SqlAlchemyRepository
+from podcast.adapters.database_sync import csv_row_hashes_table
+from podcast.adapters.orm import mapper_registry, users_table, reviews_table, playlists_table, \
+    playlists_episodes_association_table
+from podcast.adapters.repo_populate import populate
+from podcast.podcasts import services as podcast_services
+from path_utils.utils import get_project_root
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    return data_path
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8-sig', newline='') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def write_rows(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv.writer(csv_file).writerows(rows)
+
+
+def table_rows(session_factory, table):
+    with session_factory() as session:
+        return session.execute(select(table)).all()
+
+
+def test_sync_into_an_empty_database_matches_populate(session_factory, data_path, database_engine):
+    repo = SqlAlchemyRepository(session_factory)
+    report = repo.sync_from_csv(data_path)
+    assert report['podcasts'] == {'rows': 7, 'inserted': 7, 'changed': 0, 'deleted': 0, 'unchanged': 0}
+    assert report['episodes']['inserted'] == 4
+    assert set(report['seconds']) == {'diff', 'podcasts', 'episodes'}
+
+    # database_engine was populated from the same files. Authors are numbered in a different order there.
+    tables = mapper_registry.metadata.tables
+    with database_engine.connect() as connection:
+        populated_podcasts = connection.execute(select(tables['podcasts'])).all()
+        populated_episodes = connection.execute(select(tables['episodes'])).all()
+    assert sorted(row[:1] + row[2:] for row in table_rows(session_factory, tables['podcasts'])) == \
+        sorted(row[:1] + row[2:] for row in populated_podcasts)
+    assert sorted(table_rows(session_factory, tables['episodes'])) == sorted(populated_episodes)
+    podcast = repo.get_podcast(1)
+    assert podcast.author.name == 'D Hour Radio Network'
+    assert [category.name for category in podcast.categories] == ['Society & Culture', 'Personal Journals']
+
+    version = repo.mutation_version
+    report = repo.sync_from_csv(data_path)
+    assert report['podcasts']['unchanged'] == 7 and report['episodes']['unchanged'] == 4
+    assert (report['authors'], report['categories']) == (0, 0)
+    assert repo.mutation_version == version
+
+
+def test_sync_applies_only_the_changes(session_factory, data_path):
+    repo = SqlAlchemyRepository(session_factory)
+    populate(data_path, repo, True)
+    report = repo.sync_from_csv(data_path, existing_rows_current=True)
+    assert report['podcasts']['unchanged'] == 7 and report['episodes']['unchanged'] == 4
+    with session_factory() as session:
+        assert len(session.execute(select(csv_row_hashes_table)).all()) == 11
+
+    # Reviews and playlists go straight into their tables, since they only need to point at the rows.
+    with session_factory() as session:
+        session.execute(insert(users_table), [{'id': 1, 'user_name': 'listener', 'password': 'Password1'}])
+        session.execute(insert(reviews_table), [
+            {'id': 1, 'user_id': 1, 'podcast_id': 14, 'episode_id': 3, 'rating': 4, 'content': 'Kept',
+             'timestamp': datetime(2024, 1, 1)},
+            {'id': 2, 'user_id': 1, 'podcast_id': 14, 'episode_id': 1, 'rating': 2,
+             'content': 'Deleted with its episode', 'timestamp': datetime(2024, 1, 1)}])
+        session.execute(insert(playlists_table), [{'id': 1, 'owner_id': 1, 'title': 'Mine'}])
+        session.execute(insert(playlists_episodes_association_table),
+                        [{'playlist_id': 1, 'episode_id': 1}, {'playlist_id': 1, 'episode_id': 3}])
+        session.commit()
+
+    podcasts = read_rows(data_path / "podcasts.csv")
+    podcasts[2][1] = 'Brian Denny Radio Hour'
+    podcasts[2][5] = 'Talk | Comedy'
+    new_podcast = podcasts[3][:]
+    new_podcast[0], new_podcast[1], new_podcast[7] = '74', 'Another Podcast', 'A New Author'
+    podcasts.append(new_podcast)
+    del podcasts[4]
+    write_rows(data_path / "podcasts.csv", podcasts)
+    episodes = read_rows(data_path / "episodes.csv")
+    new_episode = episodes[2][:]
+    new_episode[0], new_episode[2] = '5', 'A new episode'
+    episodes.append(new_episode)
+    del episodes[1]
+    write_rows(data_path / "episodes.csv", episodes)
+
+    version = repo.mutation_version
+    report = repo.sync_from_csv(data_path, batch_rows=1)
+    assert report['podcasts'] == {'rows': 7, 'inserted': 1, 'changed': 1, 'deleted': 1, 'unchanged': 5}
+    # Episode 4 belongs to the new podcast 74, so it is written again to point at it.
+    assert report['episodes'] == {'rows': 4, 'inserted': 1, 'changed': 1, 'deleted': 1, 'unchanged': 2}
+    assert (report['authors'], report['categories']) == (1, 1)
+    assert repo.mutation_version > version
+
+    podcast = repo.get_podcast(2)
+    assert podcast.title == 'Brian Denny Radio Hour'
+    assert {category.name for category in podcast.categories} == {'Talk', 'Comedy'}
+    assert repo.get_podcast(74).author.name == 'A New Author'
+    assert repo.get_podcast(int(read_rows(get_project_root() / "tests" / "data" / "podcasts.csv")[4][0])) is None
+    assert repo.get_episode(1) is None
+    assert repo.get_episode(5).title == 'A new episode'
+    assert repo.get_episode(4).podcast.id == 74
+    assert repo.get_user('listener') is not None
+    assert [row.content for row in table_rows(session_factory, reviews_table)] == ['Kept']
+    assert [row.episode_id for row in table_rows(session_factory, playlists_episodes_association_table)] == [3]
+
+    report = repo.sync_from_csv(data_path)
+    assert report['podcasts']['unchanged'] == 7 and report['episodes']['unchanged'] == 4
+    with session_factory() as session:
+        assert len(session.execute(select(csv_row_hashes_table)).all()) == 11
+
+
+def test_sync_invalidates_cached_podcast_views(session_factory, data_path):
+    repo = SqlAlchemyRepository(session_factory)
+    populate(data_path, repo, True)
+    repo.sync_from_csv(data_path, existing_rows_current=True)
+    view = podcast_services.podcast_id(14, repo)
+    assert podcast_services.podcast_id(14, repo) is view
+    header = podcast_services.podcast_header(14, repo)
+
+    # Editing one episode in place leaves the podcast's episode and review counts and highest ids as they were.
+    episodes = read_rows(data_path / "episodes.csv")
+    edited = next(row for row in episodes[1:] if row[1] == '14')
+    edited[2] = 'An edited title'
+    write_rows(data_path / "episodes.csv", episodes)
+    assert repo.sync_from_csv(data_path)['episodes']['changed'] == 1
+
+    view = podcast_services.podcast_id(14, repo)
+    assert [episode['title'] for episode in view['episodes'] if episode['id'] == int(edited[0])] == \
+        ['An edited title']
+    assert podcast_services.podcast_header(14, repo) is not header
@@ -1,5 +1,8 @@
 import pytest
 from datetime import datetime
+from sqlalchemy import inspect
+
+from podcast.adapters.orm import mapper_registry, create_missing_indexes
 from podcast.domainmodel.model import Author, Podcast, Episode, Category, User, Review, Playlist, make_review
 
 @pytest.fixture
@@ -144,3 +147,17 @@ def test_saving_playlist(empty_session, user, episode):
     assert fetched_playlist._title == "Sample Playlist"
     assert len(fetched_playlist._episodes) == 1
     assert fetched_playlist._episodes[0]._title == episode._title
+
+
+def test_create_missing_indexes_adds_dropped_indexes(empty_session):
+    """Test that indexes missing from existing tables are created, and existing ones are left alone."""
+    connection = empty_session.connection()
+    indexes = [index for table in mapper_registry.metadata.sorted_tables for index in table.indexes]
+    for index in indexes:
+        index.drop(connection)
+    assert all(inspect(connection).get_indexes(index.table.name) == [] for index in indexes)
+
+    create_missing_indexes(connection)
+    create_missing_indexes(connection)
+    for index in indexes:
+        assert index.name in [found['name'] for found in inspect(connection).get_indexes(index.table.name)]
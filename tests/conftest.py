@@ -1,4 +1,5 @@
 import pytest
+from sqlalchemy.orm import clear_mappers
 
 from podcast import create_app
 from podcast.adapters.memory_repository import MemoryRepository
@@ -19,13 +20,23 @@ def in_memory_repo():
     return repo
 
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope='session')
+def snapshot_dir(tmp_path_factory):
+    # Shared by every test app, so all but the first start from the snapshot.
+    return tmp_path_factory.mktemp('snapshots')
+
+
+@pytest.fixture(params=[False, True], ids=['episode-objects', 'columnar-episodes'])
+def client(snapshot_dir, request):
+    # The database tests leave the model classes mapped; the memory repository works with plain objects.
+    clear_mappers()
     my_app = create_app({
         'TESTING': True,
         'TEST_DATA_PATH': TEST_DATA_PATH,
         'WTF_CSRF_ENABLED': False,
-        'REPOSITORY': "memory"
+        'REPOSITORY': "memory",
+        'SNAPSHOT_DIR': snapshot_dir,
+        'COLUMNAR_EPISODES': request.param
     })
     return my_app.test_client()
 
@@ -1,7 +1,13 @@
 import pytest
 
 from flask import session
+from sqlalchemy.orm import clear_mappers
+
+from podcast import create_app
 from podcast.authentication import services as auth_services
+import podcast.adapters.repository as repo
+from podcast.adapters.paging import encode_cursor
+from path_utils.utils import get_project_root
 
 
 def test_register(client):
@@ -97,3 +103,121 @@ def test_podcast_browsing(client):
 
     assert b'D-Hour Radio Network' in response.data
     assert b'Brian Denny Radio' in response.data
+
+
+
+def test_episode_page_links_to_adjacent_episodes(client, auth):
+    test_login(client, auth)
+
+    # Podcast 14 has a single episode in the test data, so there is nothing to navigate to.
+    response = client.get('/podcasts/14/episode/1')
+    assert response.status_code == 200
+    assert b'Previous episode' not in response.data
+    assert b'Next episode' not in response.data
+
+
+
+def test_episode_page_shows_sanitised_description(client, auth):
+    test_login(client, auth)
+
+    response = client.get('/podcasts/14/episode/1')
+    assert b'In this episode, Phil and Janelle talk about the next movies' in response.data
+    assert b'data-attachment-id' not in response.data
+    assert b'&lt;img' not in response.data
+
+    response = client.get('/podcasts/14')
+    assert b'In this episode, Phil and Janelle talk about' in response.data
+
+
+def test_episode_page_sanitises_stored_raw_html(client, auth):
+    # As a database written before descriptions were sanitised at ingest would hand it back.
+    test_login(client, auth)
+    episode = repo.repo_instance.get_episode(1)
+    episode._description = '<p onclick="steal()">Raw <script>alert(1)</script><img src="x" onerror="steal()"></p>'
+
+    response = client.get('/podcasts/14/episode/1')
+    assert b'<div class="episode-description">Raw</div>' in response.data
+    assert b'<script>' not in response.data
+    assert b'onerror' not in response.data
+
+def test_podcast_browsing_with_filters(client):
+    response = client.get('/podcasts?category=Comedy&language=English')
+    assert response.status_code == 200
+    assert b'Brian Denny Radio' in response.data
+    assert b'The Mandarian Orange Show' in response.data
+    assert b'D-Hour Radio Network' not in response.data
+    assert b'Comedy (2)' in response.data
+
+
+
+def test_podcast_browsing_continues_from_cursor(client):
+    response = client.get('/podcasts', query_string={'after': encode_cursor(('Mike Safo', 6))})
+    assert response.status_code == 200
+    assert b'Onde Road - Radio Popolare' in response.data
+    assert b'The Mandarian Orange Show' in response.data
+    assert b'Brian Denny Radio' not in response.data
+
+def test_podcast_search(client):
+    response = client.get('/search?query=radio&filter=title')
+    assert response.status_code == 200
+    assert b'3 results for' in response.data
+    assert b'Brian Denny Radio' in response.data
+    assert b'The Mandarian Orange Show' not in response.data
+
+
+def test_search_suggestions(client):
+    response = client.get('/search/suggest?query=bri&filter=title')
+    assert response.status_code == 200
+    assert response.get_json() == ['Brian Denny Radio']
+
+    response = client.get('/search/suggest?query=&filter=title')
+    assert response.get_json() == []
+
+
+def test_fuzzy_index_is_built_by_the_first_fuzzy_search(client):
+    assert 'fuzzy' not in repo.repo_instance.get_index_stats()
+    client.get('/search?query=Mandarain+Orange&filter=title')
+    assert 'fuzzy' not in repo.repo_instance.get_index_stats()
+    client.get('/search?query=Mandarain+Orange&filter=fuzzy')
+    assert repo.repo_instance.get_index_stats()['fuzzy']['podcasts'] == 7
+
+
+def test_fuzzy_index_can_be_built_at_startup(snapshot_dir):
+    clear_mappers()
+    create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': get_project_root() / "tests" / "data",
+        'REPOSITORY': "memory",
+        'SNAPSHOT_DIR': snapshot_dir,
+        'FUZZY_INDEX_AT_STARTUP': True
+    })
+    assert repo.repo_instance.get_index_stats()['fuzzy']['podcasts'] == 7
+
+
+def test_fuzzy_podcast_search(client):
+    response = client.get('/search?query=Mandarain+Orange&filter=fuzzy')
+    assert response.status_code == 200
+    assert b'The Mandarian Orange Show' in response.data
+
+
+def test_episode_search(client):
+    response = client.get('/search?query=moviepass&filter=episodes')
+    assert response.status_code == 200
+    assert b'1 episode matching' in response.data
+    assert b'/podcasts/14/episode/1' in response.data
+
+
+def test_podcast_page_lists_its_episodes(client):
+    response = client.get('/podcasts/14')
+    assert response.status_code == 200
+    assert b'/podcasts/14/episode/1' in response.data
+
+
+def test_add_podcast_to_playlist(client, auth):
+    test_login(client, auth)
+
+    response = client.get('/add_podcast?podcast_id=14')
+    assert response.headers['Location'] == '/view'
+    response = client.get('/view')
+    assert b'Podcast successfully added to the playlist.' in response.data
+    assert b'The Mandarian Orange Show' in response.data
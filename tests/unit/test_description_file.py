@@ -0,0 +1,110 @@
+import pickle
+import sys
+import threading
+
+from podcast.adapters.description_file import DescriptionFile
+from podcast.domainmodel.model import Author, Episode, Podcast
+
+
+LONG_DESCRIPTION = "<p>Janelle and Phil talk about " + "café culture, " * 10 + "and more.</p>"
+
+
+def test_description_file_round_trips_text():
+    descriptions = DescriptionFile(cached_descriptions=2)
+    texts = ['', 'café', 'ポッドキャスト', LONG_DESCRIPTION]
+    handles = [descriptions.add(text) for text in texts]
+    assert [descriptions.get(handle) for handle in handles] == texts
+    assert len(descriptions) == 4
+    # Texts added after the file was mapped are still found.
+    handle = descriptions.add('end')
+    assert descriptions.get(handle) == 'end'
+    assert descriptions.file_size == sum(len(text.encode('utf-8')) for text in texts + ['end'])
+    descriptions.close()
+
+
+def test_recently_read_descriptions_are_cached():
+    descriptions = DescriptionFile(cached_descriptions=2)
+    first, second, third = (descriptions.add(f'{number} {LONG_DESCRIPTION}') for number in range(3))
+    descriptions.get(first)
+    descriptions.get(first)
+    descriptions.get(second)
+    descriptions.get(third)
+    descriptions.get(first)
+    assert descriptions.stats() == {'size': 3, 'file_bytes': descriptions.file_size, 'cached': 2,
+                                    'hits': 1, 'misses': 4}
+
+
+def test_only_long_descriptions_are_stored():
+    descriptions = DescriptionFile()
+    assert descriptions.put('Short') == 'Short'
+    assert descriptions.put(None) is None
+    handle = descriptions.put(LONG_DESCRIPTION)
+    assert isinstance(handle, int)
+    assert descriptions.get(handle) == LONG_DESCRIPTION
+
+
+def test_episode_reads_its_description_back():
+    podcast = Podcast(1, Author(1, "Janelle and Phil"), "The Mandarian Orange Show")
+    episode = Episode(1, podcast, "Part 1", episode_desc=LONG_DESCRIPTION)
+    description, snippet = episode.description, episode.snippet
+    descriptions = DescriptionFile()
+    episode.keep_description_in(descriptions)
+    episode.keep_description_in(descriptions)
+    assert len(descriptions) == 1
+    # Only the handle is kept on the Episode.
+    assert episode._description == 0
+    assert episode.description == description
+    assert episode.snippet == snippet
+    episode.description = "<p>New</p>"
+    assert episode.description == "New"
+
+
+def test_episodes_share_the_file_when_pickled():
+    podcast = Podcast(1, Author(1, "Janelle and Phil"), "The Mandarian Orange Show")
+    episodes = [Episode(number, podcast, "Part", episode_desc=f'{number} {LONG_DESCRIPTION}') for number in range(3)]
+    descriptions = DescriptionFile()
+    for episode in episodes:
+        episode.keep_description_in(descriptions)
+    copies = pickle.loads(pickle.dumps(episodes))
+    assert [copy.description for copy in copies] == [episode.description for episode in episodes]
+    assert copies[0]._description_store is copies[2]._description_store is not descriptions
+
+
+def test_description_file_is_shared_safely_between_threads():
+    # Switch threads as often as possible, so reads run in the middle of appends and remaps.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    descriptions = DescriptionFile(cached_descriptions=4)
+    texts = [f'{number} {LONG_DESCRIPTION}' for number in range(3000)]
+    handles = [descriptions.add(text) for text in texts[:10]]
+    errors = []
+
+    def write():
+        try:
+            for text in texts[10:]:
+                descriptions.add(text)
+        except Exception as error:
+            errors.append(error)
+
+    def read(offset):
+        try:
+            for number in range(3000):
+                # The newest text, so reads keep remapping the file, or one of the first few, so some are cached.
+                handle = len(descriptions) - 1 if number % 2 else handles[(number + offset) % 10]
+                assert descriptions.get(handle) == texts[handle]
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(offset,)) for offset in range(3)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert [descriptions.get(handle) for handle in range(3000)] == texts
+    stats = descriptions.stats()
+    assert stats['hits'] + stats['misses'] == 12000
+    descriptions.close()
@@ -1,8 +1,13 @@
 import pytest
 
 from podcast.adapters.repository import AbstractRepository
-from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist
-from podcast.adapters.datareader.csvdatareader import CSVDataReader
+from podcast.domainmodel.model import Author, Podcast, Category, User, PodcastSubscription, Episode, Review, Playlist, \
+    ModelException
+from podcast.adapters.datareader.csvdatareader import CSVDataReader, episode_records, parse_episodes_in_parallel, \
+    read_csv_file, split_records, to_strptime
+from path_utils.utils import get_project_root
+from podcast.adapters.orm import map_model_to_tables
+from sqlalchemy.orm import clear_mappers
 from datetime import datetime
 import os
 import random
@@ -442,6 +447,108 @@ def test_episode_description_setter(my_episode):
         my_episode.description = None
 
 
+
+def test_episode_description_is_sanitised(my_podcast):
+    episode = Episode(1, my_podcast, "Rings", episode_desc='<p data-id="7"><img srcset="a.jpg 600w">Saturn &amp; '
+                                                           '<a href="javascript:alert(1)">its</a> <b>rings</b>'
+                                                           '<script>track()</script></p>')
+    assert episode.description == 'Saturn &amp; <a>its</a> <b>rings</b>'
+    assert episode.snippet == 'Saturn & its rings'
+
+    episode.description = '<p>One \u2019line\u2019</p><p>Two</p>'
+    assert episode.description == "<p>One 'line'</p><p>Two</p>"
+    assert episode.snippet == "One 'line' Two"
+
+    episode.description = 'A ' + 'long ' * 60 + 'description'
+    assert len(episode.snippet) <= 160
+    assert episode.snippet.endswith('long...')
+
+    # Line breaks closing a paragraph or the description are dropped, so sanitising twice changes nothing.
+    episode.description = '<p>First<br /><br /> </p><p>Second<br /></p> <br />'
+    assert episode.description == '<p>First</p><p>Second</p>'
+    episode.description = episode.description
+    assert episode.description == '<p>First</p><p>Second</p>'
+
+
+def test_objects_keep_their_attributes_in_slots():
+    # Database mode maps the classes and stores attributes in __dict__; unmapping them goes back to the slots.
+    clear_mappers()
+    map_model_to_tables()
+    clear_mappers()
+    author = Author(1, "Brian Denny")
+    podcast = Podcast(1, author, "Brian Denny Radio")
+    user = User(1, "shyamli", "pw12345678")
+    episode = Episode(1, podcast, "Episode 1")
+    objects = [author, podcast, Category(1, "Comedy"), user, episode,
+               Review(1, user, 4, "Good", podcast, episode), Playlist(1, user, "Favourites")]
+    for item in objects:
+        assert item.__dict__ == {}
+    assert episode.title == "Episode 1"
+    assert podcast.author is author
+
+
+def test_trusted_constructors_match_the_validating_ones():
+    author, trusted_author = Author(1, "Brian Denny"), Author.trusted(1, "Brian Denny")
+    assert (trusted_author.id, trusted_author.name, trusted_author.podcast_list) == (1, "Brian Denny", [])
+    assert trusted_author == author
+    podcast = Podcast(1, author, "Brian Denny Radio", "image.jpg", "About", "https://a.com", 12, "English")
+    trusted_podcast = Podcast.trusted(1, author, "Brian Denny Radio", "image.jpg", "About", "https://a.com", 12,
+                                      "English")
+    fields = ['id', 'author', 'title', 'image', 'description', 'website', 'itunes_id', 'language', 'categories']
+    assert [getattr(trusted_podcast, field) for field in fields] == [getattr(podcast, field) for field in fields]
+    category = Category.trusted(2, "Comedy")
+    assert (category.id, category.name, category.number_of_tagged_podcasts) == (2, "Comedy", 0)
+    user = User.trusted(1, "shyamli", "pw12345678")
+    assert (user.username, user.password, user.reviews, user.playlists) == ("shyamli", "pw12345678", [], [])
+    upload_date = datetime(2017, 12, 1)
+    episode = Episode(3, podcast, "Part 3", "http://a/3.mp3", 2739, "<p>Bad <b>Hammer</b></p>", upload_date)
+    trusted_episode = Episode.trusted(3, podcast, "Part 3", "http://a/3.mp3", 2739, "<p>Bad <b>Hammer</b></p>",
+                                      upload_date)
+    fields = ['id', 'podcast', 'title', 'audio', 'length', 'description', 'snippet', 'upload_date', 'reviews']
+    assert [getattr(trusted_episode, field) for field in fields] == [getattr(episode, field) for field in fields]
+    review = Review.trusted(1, user, 4, "Good", podcast, episode, upload_date)
+    assert (review.user, review.user_rating, review.content, review.episode) == (user, 4, "Good", episode)
+    assert PodcastSubscription.trusted(1, user, podcast) == PodcastSubscription(1, user, podcast)
+    playlist = Playlist.trusted(1, user, "Favourites")
+    assert (playlist.owner, playlist.title, playlist.episodes) == (user, "Favourites", [])
+
+
+def test_csv_rows_are_checked_before_objects_are_built(tmp_path):
+    podcasts_file = tmp_path / "podcasts.csv"
+    episodes_file = tmp_path / "episodes.csv"
+    podcasts_file.write_text("id,title,image,description,language,categories,website,author,itunes_id\n"
+                             "1,Brian Denny Radio,,About,English,Comedy,https://a.com,Brian Denny,12\n")
+    episodes_file.write_text("id,podcast_id,title,audio,audio_length,description,pub_date\n"
+                             "1,1,,http://a/1.mp3,60,About,2017-12-11 15:00:00+00\n")
+    reader = CSVDataReader(podcasts_file, episodes_file)
+    reader.load_podcasts()
+    assert reader.podcasts[1].author is reader.author_objects["Brian Denny"]
+    with pytest.raises(ValueError, match="Episode title"):
+        reader.load_episodes()
+    episodes_file.write_text("id,podcast_id,title,audio,audio_length,description,pub_date\n"
+                             "1,1,Episode 1,http://a/1.mp3,-60,About,2017-12-11 15:00:00+00\n")
+    with pytest.raises(ValueError, match="Episode length"):
+        reader.load_episodes()
+    # A superscript two is a digit to str.isdigit, but not to int().
+    episodes_file.write_text("id,podcast_id,title,audio,audio_length,description,pub_date\n"
+                             "1,1,Episode 1,http://a/1.mp3,6\u00b2,About,2017-12-11 15:00:00+00\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Episode length '6\u00b2' must be a non-negative integer"):
+        reader.load_episodes()
+    podcasts_file.write_text("id,title,image,description,language,categories,website,author,itunes_id\n"
+                             "\u00b2,Brian Denny Radio,,About,English,Comedy,https://a.com,Brian Denny,12\n",
+                             encoding="utf-8")
+    with pytest.raises(ValueError, match="must be a non-negative integer"):
+        CSVDataReader(podcasts_file, episodes_file).load_podcasts()
+    podcasts_file.write_text("id,title,image,description,language,categories,website,author,itunes_id\n"
+                             "1,Brian Denny Radio,,About,English,Comedy,https://a.com,Brian Denny\n")
+    with pytest.raises(ValueError, match="expected 9"):
+        CSVDataReader(podcasts_file, episodes_file).load_podcasts()
+    podcasts_file.write_text("id,title,image,description,language,categories,website,author,itunes_id\n"
+                             "1,Brian Denny Radio,,About,English,Comedy | Comedy,https://a.com,Brian Denny,12\n")
+    with pytest.raises(ModelException):
+        CSVDataReader(podcasts_file, episodes_file).load_podcasts()
+
+
 def test_episode_equality(my_episode, my_podcast, my_podcast_2):
     episode1 = Episode(2, my_podcast)
     assert episode1 != my_episode
@@ -646,6 +753,50 @@ def test_load_episodes(csv_reader):
     assert csv_reader.episodes[0] == episode_1
     assert csv_reader.episodes[1] == episode_2
 
+
+def test_load_shares_repeated_values(csv_reader):
+    csv_reader.load_podcasts()
+    csv_reader.load_episodes()
+    # Podcasts 46, 187 and 995 are all by Leo Laporte.
+    author = csv_reader.podcasts[46].author
+    assert author is csv_reader.podcasts[187].author is csv_reader.podcasts[995].author
+    assert author is csv_reader.author_objects['Leo Laporte']
+    assert csv_reader.podcasts[1].language is csv_reader.podcasts[2].language
+    # Episodes 22 and 1091 were uploaded in the same second.
+    assert csv_reader.episodes[21].upload_date is csv_reader.episodes[1090].upload_date
+
+def test_split_records_keeps_quoted_newlines_together():
+    data = b'1,"a\nb",x\n2,"say ""hi""\n",y\n3,c,z\n'
+    ranges = split_records(data, 3)
+    assert [data[start:end] for start, end in ranges] == [b'1,"a\nb",x\n', b'2,"say ""hi""\n",y\n', b'3,c,z\n']
+    assert split_records(data, 1000) == [(0, len(data))]
+
+
+def test_parallel_parsing_matches_reading_in_order():
+    episodes_file = str(get_project_root() / "tests" / "data" / "episodes.csv")
+    records = list(episode_records(read_csv_file(episodes_file)))
+    # Small chunks split the file between several processes, cutting through its multi-line descriptions.
+    assert list(parse_episodes_in_parallel(episodes_file, 2, chunk_bytes=256)) == records
+    data_path = get_project_root() / "tests" / "data"
+    reader = CSVDataReader(data_path / "podcasts.csv", data_path / "episodes.csv")
+    reader.load_podcasts()
+    reader.load_episodes(processes=2)
+    fields = ['id', 'podcast', 'title', 'audio', 'length', 'description', 'snippet', 'upload_date']
+    assert [[getattr(episode, field) for field in fields] for episode in reader.episodes] == \
+           [[episode_id, reader.podcasts.get(podcast_id), title, audio, length, description, snippet,
+             to_strptime(upload_date)]
+            for episode_id, podcast_id, title, audio, length, description, snippet, upload_date in records]
+
+
+def test_to_strptime_reads_episode_dates():
+    for date_string in ['2017-12-01 00:09:47+00', '2018-02-28 23:59:59+05', '2018-02-28 23:59:59-11']:
+        assert to_strptime(date_string) == datetime.strptime(date_string + "00", "%Y-%m-%d %H:%M:%S%z")
+        assert to_strptime(date_string).utcoffset() == \
+               datetime.strptime(date_string + "00", "%Y-%m-%d %H:%M:%S%z").utcoffset()
+    assert to_strptime('2017-12-01 00:09:47+0530').utcoffset().seconds == 19800
+    with pytest.raises(ValueError):
+        to_strptime('2017-13-01 00:09:47+00')
+
 #test add_to_playlist
 
 def test_add_episode_to_playlist(my_playlist, my_episode):
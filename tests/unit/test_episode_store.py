@@ -0,0 +1,182 @@
+import pickle
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from podcast.adapters.description_file import DescriptionFile
+from podcast.adapters.episode_store import ColumnarEpisodeStore, StringTable
+from podcast.domainmodel.model import Author, Episode, Podcast, Review, User
+
+
+@pytest.fixture
+def podcasts():
+    author = Author(1, "Janelle and Phil")
+    return {1: Podcast(1, author, "The Mandarian Orange Show"), 2: Podcast(2, author, "Tallin Messages")}
+
+
+@pytest.fixture
+def store(podcasts):
+    store = ColumnarEpisodeStore(podcasts.get, cached_episodes=2)
+    store.add(Episode(3, podcasts[1], "Part 3", "http://a/3.mp3", 2739, "<p>Bad <b>Hammer</b> time</p>",
+                      datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone.utc)))
+    store.add(Episode(1, podcasts[2], "Messages", "http://b/1.mp3", 600, "Plain",
+                      datetime(2017, 12, 3, 12, 0, 0, tzinfo=timezone.utc)))
+    store.add(Episode(2, podcasts[1], "Part 2 – café", "http://a/2.mp3", 1800, "Café",
+                      datetime(2017, 11, 24, 8, 30, 0)))
+    return store
+
+
+def test_string_table_round_trips_text():
+    table = StringTable()
+    handles = [table.add(text) for text in ['', 'café', 'ポッドキャスト', 'end']]
+    assert [table.get(handle) for handle in handles] == ['', 'café', 'ポッドキャスト', 'end']
+    assert len(table) == 4
+
+
+def test_get_materialises_equal_episodes(store, podcasts):
+    episode = store.get(3)
+    assert episode.id == 3
+    assert episode.podcast is podcasts[1]
+    assert episode.title == "Part 3"
+    assert episode.audio == "http://a/3.mp3"
+    assert episode.length == 2739
+    assert episode.description == "Bad <b>Hammer</b> time"
+    assert episode.upload_date == datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone.utc)
+    # Naive upload dates come back naive.
+    assert store.get(2).upload_date == datetime(2017, 11, 24, 8, 30, 0)
+    assert store.get(2).title == "Part 2 – café"
+    assert store.get(4) is None
+    assert 3 in store and 4 not in store
+    assert len(store) == 3
+    assert (store.first_id(), store.last_id()) == (1, 3)
+
+
+def test_recently_used_episodes_are_shared(store):
+    assert store.get(3) is store.get(3)
+    store.get(1)
+    store.get(2)
+    # Only two Episodes are cached, so 3 was rebuilt.
+    assert store.stats()['cached'] == 2
+    assert store.get(3) == store.get(3)
+    assert store.stats()['misses'] == 4
+
+
+def test_reviews_outlive_eviction(store):
+    user = User(1, "shyamli", "pw12345678")
+    episode = store.get(3)
+    review = Review(1, user, 5, "Great", episode.podcast, episode)
+    episode.add_review(review)
+    store.add_review(review)
+    store.get(1)
+    store.get(2)
+    assert store.get(3) is not episode
+    assert store.get(3).reviews == [review]
+
+
+def test_scans_read_the_columns(store):
+    assert list(store.ids_for_podcast(1)) == [2, 3]
+    assert list(store.ids_for_podcast(5)) == []
+    assert list(store.ids_uploaded_between(datetime(2017, 12, 1, tzinfo=timezone.utc),
+                                           datetime(2017, 12, 3, 12, 0, 0, tzinfo=timezone.utc))) == [3]
+    assert list(store.ids_uploaded_between(datetime(2017, 1, 1), datetime(2018, 1, 1))) == [1, 2, 3]
+    assert list(store.ids_with_length_between(600, 1800)) == [1, 2]
+    assert [episode_id for _, episode_id in store.episode_keys(1)] == [2, 3]
+    assert store.count_for_podcast(1) == 2
+
+
+def test_remove_and_replace(store, podcasts):
+    store.remove(2)
+    store.remove(7)
+    assert store.get(2) is None
+    assert list(store.ids_for_podcast(1)) == [3]
+    store.add(Episode(3, podcasts[2], "Moved"))
+    assert store.get(3).title == "Moved"
+    assert list(store.ids_for_podcast(2)) == [1, 3]
+    assert store.count_for_podcast(1) == 0
+    assert len(store) == 2
+
+
+def test_upload_dates_keep_their_utc_offset(podcasts):
+    store = ColumnarEpisodeStore(podcasts.get, cached_episodes=0)
+    upload_date = datetime(2017, 12, 1, 9, 30, 0, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    store.add(Episode(1, podcasts[1], "Offset", upload_date=upload_date))
+    stored_date = store.get(1).upload_date
+    assert stored_date == upload_date
+    assert stored_date.utcoffset() == timedelta(hours=5, minutes=30)
+    assert stored_date.isoformat() == upload_date.isoformat()
+    assert store.get(1).upload_date is not stored_date
+
+
+def test_neighbours_are_found_by_upload_date(store, podcasts):
+    assert (store.previous_id(2), store.next_id(2)) == (None, 3)
+    assert (store.previous_id(3), store.next_id(3)) == (2, None)
+    assert (store.previous_id(1), store.next_id(1)) == (None, None)
+    assert store.next_id(9) is None
+    # Ties on upload date are ordered by id.
+    store.add(Episode(5, podcasts[1], "Same time", upload_date=datetime(2017, 11, 24, 8, 30, 0)))
+    store.add(Episode(4, podcasts[1], "Same time", upload_date=datetime(2017, 11, 24, 8, 30, 0)))
+    assert [episode_id for _, episode_id in store.episode_keys(1)] == [2, 4, 5, 3]
+    assert (store.next_id(2), store.next_id(4), store.next_id(5)) == (4, 5, 3)
+    store.remove(4)
+    assert (store.next_id(2), store.previous_id(5)) == (5, 2)
+
+
+def test_store_is_shared_safely_between_threads(store, podcasts):
+    # Switch threads as often as possible, so readers run in the middle of adds and removes.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errors = []
+
+    def write():
+        try:
+            for episode_id in range(10, 1000):
+                store.add(Episode(episode_id, podcasts[1], "Added", upload_date=datetime(2017, 11, 25)))
+                store.remove(episode_id - 1 if episode_id > 10 else 0)
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        try:
+            for _ in range(1000):
+                keys = store.episode_keys(1)
+                assert keys == sorted(keys)
+                assert store.next_id(2) is not None and store.previous_id(3) is not None
+                assert store.get(3).title == "Part 3"
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert list(store.ids_for_podcast(1)) == [2, 3, 999]
+
+
+def test_store_can_be_pickled(store):
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.get(3) == store.get(3)
+    copy.remove(3)
+    assert 3 not in copy and 3 in store
+
+
+def test_episodes_are_built_without_reading_their_description(podcasts, monkeypatch):
+    descriptions = DescriptionFile(cached_descriptions=0)
+    store = ColumnarEpisodeStore(podcasts.get, descriptions=descriptions)
+    store.add(Episode(3, podcasts[1], "Part 3", "http://a/3.mp3", 2739, "<p>Bad <b>Hammer</b> time</p>",
+                      datetime(2017, 12, 1, 0, 9, 47, tzinfo=timezone.utc)))
+
+    def normalise_description(description):
+        raise AssertionError("description sanitised again")
+    monkeypatch.setattr('podcast.domainmodel.model.normalise_description', normalise_description)
+    episode = store.get(3)
+    assert episode.snippet == "Bad Hammer time"
+    assert descriptions.stats()['misses'] == 0
+    assert episode.description == "Bad <b>Hammer</b> time"
+    assert descriptions.stats()['misses'] == 1
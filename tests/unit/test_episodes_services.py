@@ -197,3 +197,12 @@ def test_get_user(in_memory_repo, user):
     assert retrieved_user.username == user.username
     assert retrieved_user.id == user.id
     assert retrieved_user == user
+
+
+def test_get_episode_without_reviews(in_memory_repo, episode, review):
+    in_memory_repo.add_episode(episode)
+    episode.add_review(review)
+    assert services.get_episode(episode.id, in_memory_repo)['reviews'] == services.reviews_to_dict([review])
+    episode_data = services.get_episode(episode.id, in_memory_repo, include_reviews=False)
+    assert episode_data['reviews'] == ()
+    assert episode_data['description'] == episode.description
@@ -8,9 +8,29 @@ from podcast.adapters.repo_populate import populate
 from path_utils.utils import get_project_root
 
 
+# Every test runs against each way the repository can store Episodes.
+@pytest.fixture(params=[{}, {'columnar_episodes': True}, {'lazy_descriptions': True},
+                        {'columnar_episodes': True, 'lazy_descriptions': True}],
+                ids=['episode-objects', 'columnar-episodes', 'lazy-descriptions', 'columnar-lazy-descriptions'])
+def repo_options(request):
+    return request.param
+
+
+@pytest.fixture
+def columnar_episodes(repo_options):
+    return repo_options.get('columnar_episodes', False)
+
+
+@pytest.fixture
+def empty_memory_repo(repo_options):
+    return MemoryRepository(**repo_options)
+
+
 @pytest.fixture
-def empty_memory_repo():
-    return MemoryRepository()
+def in_memory_repo(repo_options):
+    repo = MemoryRepository(**repo_options)
+    populate(get_project_root() / "tests" / "data", repo)
+    return repo
 
 
 @pytest.fixture
@@ -71,6 +91,13 @@ def test_add_and_get_author(in_memory_repo, author):
     assert retrieved_author2 == author2
 
 
+def test_populated_author_is_the_one_its_podcast_points_at(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(1)
+    author = in_memory_repo.get_author(podcast.author.name)
+    assert author is podcast.author
+    assert author.podcast_list == [podcast]
+
+
 def test_add_and_get_podcast(in_memory_repo, podcast):
     assert in_memory_repo.get_podcast(7) is None
     retrieved_podcast = in_memory_repo.get_podcast(1)
@@ -122,6 +149,28 @@ def test_get_podcasts_by_language(in_memory_repo, podcast):
     assert podcast_3.title not in english_ids
 
 
+def test_get_podcast_ids_by_facets(in_memory_repo):
+    # Test data: podcasts 2 and 14 are English Comedy, podcast 3 is the only Italian one.
+    assert in_memory_repo.get_podcast_ids_by_facets({'category': 'Comedy'}) == [2, 14]
+    assert in_memory_repo.get_podcast_ids_by_facets({'category': 'Society & Culture', 'language': 'English'}) == [1]
+    assert in_memory_repo.get_podcast_ids_by_facets({'category': 'Comedy', 'language': 'Italian'}) == []
+    assert in_memory_repo.get_podcast_ids_by_facets({'author': 'Brian Denny'}) == [2]
+    assert in_memory_repo.get_podcast_ids_by_facets({}) == [1, 2, 3, 4, 5, 6, 14]
+
+
+def test_get_facet_counts(in_memory_repo):
+    counts = in_memory_repo.get_facet_counts({'language': 'English'}, facets=('category', 'language'))
+    assert counts['category']['Comedy'] == 2
+    assert counts['category']['Society & Culture'] == 1
+    # The language facet ignores its own filter, so other languages are still counted.
+    assert counts['language'] == {'English': 6, 'Italian': 1}
+
+
+def test_removed_podcast_leaves_facets(in_memory_repo):
+    in_memory_repo.remove_podcast(in_memory_repo.get_podcast(14))
+    assert in_memory_repo.get_podcast_ids_by_category('Comedy') == [2]
+
+
 def test_add_and_get_user(in_memory_repo, user, user_2):
     in_memory_repo.add_user(user)
     user_got = in_memory_repo.get_user("jon")
@@ -130,6 +179,47 @@ def test_add_and_get_user(in_memory_repo, user, user_2):
     assert user_got != user_2 #checks if get_user is working properly
 
 
+def test_get_user_ignores_case(empty_memory_repo, user):
+    empty_memory_repo.add_user(user)
+    assert empty_memory_repo.get_user("JON") == user
+    assert empty_memory_repo.get_user("Jon") == user
+
+
+def test_remove_podcast_and_episode(empty_memory_repo, columnar_episodes, podcast, podcast_2, episode, episode_2):
+    empty_memory_repo.add_podcast(podcast)
+    empty_memory_repo.add_podcast(podcast_2)
+    empty_memory_repo.add_episode(episode)
+    empty_memory_repo.add_episode(episode_2)
+
+    empty_memory_repo.remove_episode(episode_2)
+    assert empty_memory_repo.get_episode(2) is None
+    if not columnar_episodes:
+        # Columnar storage doesn't give Podcasts their Episodes.
+        assert episode_2 not in podcast.episodes
+    assert [episode.id for episode in empty_memory_repo.get_episode_page(1, 10).items] == [1]
+    assert empty_memory_repo.get_number_of_episodes() == 1
+
+    # Removing a podcast also removes the episodes stored under it.
+    empty_memory_repo.remove_podcast(podcast)
+    assert empty_memory_repo.get_podcast(1) is None
+    assert empty_memory_repo.get_episode(1) is None
+    assert empty_memory_repo.get_list_of_podcasts() == [podcast_2]
+    assert podcast not in podcast.author.podcast_list
+
+
+def test_index_stats_count_hits_and_misses(empty_memory_repo, podcast, user):
+    empty_memory_repo.add_podcast(podcast)
+    empty_memory_repo.add_user(user)
+    empty_memory_repo.get_podcast(1)
+    empty_memory_repo.get_podcast(99)
+    empty_memory_repo.get_user("jon")
+
+    stats = empty_memory_repo.get_index_stats()
+    assert stats['podcasts_by_id'] == {'size': 1, 'hits': 1, 'misses': 1}
+    assert stats['users_by_name'] == {'size': 1, 'hits': 1, 'misses': 0}
+    assert stats['episodes_by_id']['size'] == 0
+
+
 def test_add_and_get_podcast_subscription(in_memory_repo, user_2, podcast, user, podcast_2):
     assert in_memory_repo.get_podcast_subscription(1) is None # checks to see if there are no subscriptions
     subs = PodcastSubscription(1, user, podcast)
@@ -196,6 +286,27 @@ def test_get_next_and_previous_episode_id(in_memory_repo, podcast, episode, epis
     assert in_memory_repo.get_previous_episode_id(episode) is None
 
 
+def test_next_and_previous_episode_follow_upload_date(empty_memory_repo, podcast, podcast_2):
+    empty_memory_repo.add_podcast(podcast)
+    empty_memory_repo.add_podcast(podcast_2)
+    newest = Episode(1, podcast, "Newest", upload_date=datetime(2024, 3, 1))
+    oldest = Episode(2, podcast, "Oldest", upload_date=datetime(2024, 1, 1))
+    middle = Episode(3, podcast, "Middle", upload_date=datetime(2024, 2, 1))
+    other_podcast = Episode(4, podcast_2, "Other podcast", upload_date=datetime(2024, 1, 15))
+    for episode in (newest, oldest, middle, other_podcast):
+        empty_memory_repo.add_episode(episode)
+
+    assert empty_memory_repo.get_next_episode_id(oldest) == 3
+    assert empty_memory_repo.get_next_episode_id(middle) == 1
+    assert empty_memory_repo.get_next_episode_id(newest) is None
+    assert empty_memory_repo.get_previous_episode_id(newest) == 3
+    assert empty_memory_repo.get_previous_episode_id(oldest) is None
+    assert empty_memory_repo.get_previous_episode_id(other_podcast) is None
+
+    empty_memory_repo.remove_episode(middle)
+    assert empty_memory_repo.get_next_episode_id(oldest) == 1
+
+
 def test_add_and_get_review(in_memory_repo, user, podcast, episode, episode_2, podcast_2, user_2):
     user_review_1 = Review(1, user, 10, "very good podcast", podcast, episode)
     in_memory_repo.add_review(user_review_1)
@@ -223,3 +334,196 @@ def test_populate(in_memory_repo):
     num_episodes = in_memory_repo.get_number_of_episodes()
     assert num_podcasts > 0, "No podcasts were loaded into the repository."
     assert num_episodes > 0, "No episodes were loaded into the repository."
+
+
+def test_populate_indexes_each_category_once(in_memory_repo):
+    # populate adds each Podcast with its Categories, then adds the Categories, which tag the same Podcasts.
+    search_index = in_memory_repo._MemoryRepository__podcast_search_index
+    assert search_index.field_texts(1, 'category') == ['society & culture', 'personal journals']
+    assert in_memory_repo.search_podcast_ids('personal journals', 'category') == [1]
+
+
+def test_get_search_suggestions(in_memory_repo):
+    # The Mandarian Orange Show is the only test podcast with an episode, so it is the most popular title.
+    assert in_memory_repo.get_search_suggestions('t', 'title') == ['The Mandarian Orange Show', 'Tallin Messages']
+    assert in_memory_repo.get_search_suggestions('T', 'title', 1) == ['The Mandarian Orange Show']
+    assert in_memory_repo.get_search_suggestions('s', 'category') == ['Society & Culture', 'Sports & Recreation']
+    assert in_memory_repo.get_search_suggestions('radio', 'author') == ['Radio Popolare']
+    assert in_memory_repo.get_search_suggestions('', 'title') == []
+    assert in_memory_repo.get_search_suggestions('b', 'language') == []
+
+
+def test_search_suggestions_follow_changes(in_memory_repo):
+    podcast = in_memory_repo.get_podcast(5)
+    in_memory_repo.remove_podcast(podcast)
+    assert in_memory_repo.get_search_suggestions('b', 'title') == ['Brian Denny Radio']
+    in_memory_repo.add_podcast(podcast)
+    assert in_memory_repo.get_search_suggestions('bethel', 'title') == ['Bethel Presbyterian Church (EPC) Sermons']
+
+
+def test_fuzzy_search_tolerates_typos(in_memory_repo):
+    assert in_memory_repo.search_podcast_ids('Mandarain Orange', 'fuzzy') == [14]
+    assert in_memory_repo.search_podcast_ids('brain deny', 'fuzzy') == [2]
+    # "popolare" is an exact match for podcast 3's title and author, closer than any typo.
+    assert in_memory_repo.search_podcast_ids('Radoi Popolare', 'fuzzy') == [3]
+    assert in_memory_repo.search_podcast_ids('zzzzzz', 'fuzzy') == []
+    assert in_memory_repo.search_podcast_ids('', 'fuzzy') == []
+
+
+def test_fuzzy_index_follows_changes(in_memory_repo):
+    stats = in_memory_repo.build_fuzzy_index()
+    assert stats['podcasts'] == 7
+    assert stats['words'] > 0 and stats['approximate_bytes'] > 0
+
+    in_memory_repo.remove_podcast(in_memory_repo.get_podcast(14))
+    assert in_memory_repo.search_podcast_ids('Mandarain Orange', 'fuzzy') == []
+    assert in_memory_repo.build_fuzzy_index()['podcasts'] == 6
+
+
+def test_search_episodes(empty_memory_repo, podcast):
+    empty_memory_repo.add_podcast(podcast)
+    sermon = Episode(1, podcast, "Sunday Sermon",
+                     episode_desc='<p><img srcset="https://example.com/sermon-600.jpg 600w">A sermon on grace &amp; hope.</p>')
+    news = Episode(2, podcast, "Morning News", episode_desc='<p>Today: a short note on grace, then the news.</p>')
+    mention = Episode(3, podcast, "Grace", episode_desc='<script>var sermon = 1;</script>Grace, grace and more grace.')
+    for episode in (sermon, news, mention):
+        empty_memory_repo.add_episode(episode)
+
+    # Markup is stripped before indexing, so attribute values and scripts don't match.
+    assert empty_memory_repo.search_episodes('srcset', 10) == ([], 0)
+    assert empty_memory_repo.search_episodes('SERMON', 10) == ([1], 1)
+    # Title words and repeated words rank higher.
+    assert empty_memory_repo.search_episodes('grace', 10) == ([3, 1, 2], 3)
+    assert empty_memory_repo.search_episodes('grace', 1, 1) == ([1], 3)
+    assert empty_memory_repo.search_episodes('grace hope', 10) == ([1], 1)
+
+    empty_memory_repo.remove_episode(mention)
+    assert empty_memory_repo.search_episodes('grace', 10) == ([1, 2], 2)
+
+
+def test_mutation_version_changes_with_podcasts_categories_and_authors(empty_memory_repo, podcast, author,
+                                                                      category):
+    versions = [empty_memory_repo.mutation_version]
+    empty_memory_repo.add_podcast(podcast)
+    versions.append(empty_memory_repo.mutation_version)
+    empty_memory_repo.add_category(category)
+    versions.append(empty_memory_repo.mutation_version)
+    empty_memory_repo.add_author(author)
+    versions.append(empty_memory_repo.mutation_version)
+    empty_memory_repo.remove_podcast(podcast)
+    versions.append(empty_memory_repo.mutation_version)
+    assert len(set(versions)) == len(versions)
+    # Versions are never shared between repositories.
+    assert MemoryRepository().mutation_version != empty_memory_repo.mutation_version
+
+
+def test_get_podcast_summaries(in_memory_repo):
+    summaries, total, _ = in_memory_repo.get_podcast_summaries(2, 1)
+    assert total == 7
+    assert summaries[0] == PodcastSummary(2, 'Brian Denny Radio', summaries[0].image, 'Brian Denny')
+    assert [summary.id for summary in summaries] == [2, 1]
+
+    summaries, total, _ = in_memory_repo.get_podcast_summaries(10, 0, {'category': 'Comedy'})
+    assert [summary.title for summary in summaries] == ['Brian Denny Radio', 'The Mandarian Orange Show']
+    assert total == 2
+
+
+def test_podcast_summary_cursors_continue_where_the_last_page_ended(in_memory_repo):
+    everything = in_memory_repo.get_podcast_summaries(10).items
+    first = in_memory_repo.get_podcast_summaries(3)
+    second = in_memory_repo.get_podcast_summaries(3, cursor=first.next_cursor)
+    last = in_memory_repo.get_podcast_summaries(3, cursor=second.next_cursor)
+    assert first.items + second.items + last.items == everything
+    assert (first.total, second.total, last.total) == (7, 7, 7)
+    assert last.next_cursor is None
+    # The cursor wins over the offset, and an unreadable cursor falls back to it.
+    assert in_memory_repo.get_podcast_summaries(3, 5, cursor=first.next_cursor) == second
+    assert in_memory_repo.get_podcast_summaries(3, 3, cursor='not a cursor').items == second.items
+
+    comedy = in_memory_repo.get_podcast_summaries(1, filters={'category': 'Comedy'})
+    rest = in_memory_repo.get_podcast_summaries(1, filters={'category': 'Comedy'}, cursor=comedy.next_cursor)
+    assert [summary.title for summary in comedy.items + rest.items] == ['Brian Denny Radio',
+                                                                        'The Mandarian Orange Show']
+
+
+def test_podcast_summary_pages_follow_added_and_removed_podcasts(in_memory_repo):
+    first = in_memory_repo.get_podcast_summaries(2)
+    in_memory_repo.add_podcast(Podcast(20, None, 'Aardvark Hour'))
+    in_memory_repo.remove_podcast(in_memory_repo.get_podcast(first.items[1].id))
+    # A Podcast sorting before the cursor doesn't shift the next page, and a removed one is skipped.
+    second = in_memory_repo.get_podcast_summaries(2, cursor=first.next_cursor)
+    assert second.items[0].title == 'D-Hour Radio Network'
+    assert second.total == 7
+
+
+def test_get_episode_page(empty_memory_repo, podcast, podcast_2):
+    empty_memory_repo.add_podcast(podcast)
+    empty_memory_repo.add_podcast(podcast_2)
+    for episode_id, month in [(1, 3), (2, 1), (3, 2), (4, 2), (5, 4)]:
+        empty_memory_repo.add_episode(Episode(episode_id, podcast, f"Episode {episode_id}",
+                                              upload_date=datetime(2024, month, 1)))
+    empty_memory_repo.add_episode(Episode(6, podcast_2, "Other podcast", upload_date=datetime(2024, 1, 15)))
+
+    first = empty_memory_repo.get_episode_page(podcast.id, 2)
+    assert [episode.id for episode in first.items] == [2, 3]
+    assert first.total == 5
+    second = empty_memory_repo.get_episode_page(podcast.id, 2, cursor=first.next_cursor)
+    assert [episode.id for episode in second.items] == [4, 1]
+    last = empty_memory_repo.get_episode_page(podcast.id, 2, cursor=second.next_cursor)
+    assert ([episode.id for episode in last.items], last.next_cursor) == ([5], None)
+    assert [episode.id for episode in empty_memory_repo.get_episode_page(podcast.id, 2, 2).items] == [4, 1]
+    assert empty_memory_repo.get_episode_page(99, 2) == ([], 0, None)
+
+
+def test_episode_range_scans(empty_memory_repo, podcast, podcast_2):
+    empty_memory_repo.add_podcast(podcast)
+    empty_memory_repo.add_podcast(podcast_2)
+    for episode_id, parent, month, length in [(1, podcast, 3, 600), (2, podcast_2, 1, 1800), (3, podcast, 2, 3600),
+                                              (4, podcast_2, 5, 60)]:
+        empty_memory_repo.add_episode(Episode(episode_id, parent, f"Episode {episode_id}", episode_length=length,
+                                              upload_date=datetime(2024, month, 1)))
+
+    assert empty_memory_repo.get_episode_ids_for_podcast(podcast.id) == [1, 3]
+    assert [episode.id for episode in empty_memory_repo.get_episodes_for_podcast(podcast.id)] == [1, 3]
+    assert empty_memory_repo.get_episode_ids_uploaded_between(datetime(2024, 2, 1), datetime(2024, 5, 1)) == [1, 3]
+    assert empty_memory_repo.get_episode_ids_with_length_between(60, 1800) == [1, 2, 4]
+    assert empty_memory_repo.get_episode_ids_with_length_between(4000, 5000) == []
+    assert empty_memory_repo.get_episode_ids_with_length_between(1800, 60) == []
+
+    # Ties on the value are kept in id order, and removed Episodes leave the ranges.
+    empty_memory_repo.add_episode(Episode(5, podcast, "Episode 5", episode_length=600,
+                                          upload_date=datetime(2024, 3, 1)))
+    assert empty_memory_repo.get_episode_ids_with_length_between(600, 600) == [1, 5]
+    assert empty_memory_repo.get_episode_ids_uploaded_between(datetime(2024, 3, 1), datetime(2024, 3, 2)) == [1, 5]
+    assert empty_memory_repo.get_episode_ids_uploaded_between(datetime(2024, 2, 1), datetime(2024, 3, 1)) == [3]
+    empty_memory_repo.remove_episode(empty_memory_repo.get_episode(1))
+    assert empty_memory_repo.get_episode_ids_with_length_between(600, 600) == [5]
+    assert empty_memory_repo.get_episode_ids_uploaded_between(datetime(2024, 1, 1), datetime(2025, 1, 1)) == [2, 3, 4, 5]
+
+
+def test_get_review_page(in_memory_repo, user):
+    episode = in_memory_repo.get_episode(1)
+    for review_id in range(1, 6):
+        in_memory_repo.add_review(Review(review_id, user, 4, f"Review {review_id}", episode.podcast, episode))
+
+    first = in_memory_repo.get_review_page(episode.id, 3)
+    assert [review.id for review in first.items] == [1, 2, 3]
+    assert first.total == 5
+    second = in_memory_repo.get_review_page(episode.id, 3, cursor=first.next_cursor)
+    assert ([review.id for review in second.items], second.next_cursor) == ([4, 5], None)
+    assert in_memory_repo.get_review_page(episode.id, 3, 3).items == second.items
+    assert in_memory_repo.get_review_page(999, 3) == ([], 0, None)
+
+
+def test_episode_descriptions_read_back(in_memory_repo, repo_options):
+    episode = in_memory_repo.get_episode(1)
+    assert episode.description.startswith("In this episode, Phil and Janelle talk about the next movies")
+    assert episode.snippet.startswith("In this episode, Phil and Janelle")
+    long_descriptions = [episode.description for episode in in_memory_repo.get_episodes_by_id(range(1, 200))]
+    assert all(isinstance(description, str) for description in long_descriptions)
+    stats = in_memory_repo.get_index_stats()
+    if repo_options.get('lazy_descriptions'):
+        assert stats['descriptions']['size'] > 0
+        assert stats['descriptions']['misses'] > 0
+    else:
+        assert 'descriptions' not in stats
@@ -1,10 +1,18 @@
 
 
+import sys
+import threading
+
 import pytest
 
 from podcast import MemoryRepository
 from podcast.domainmodel.model import *
 from podcast.podcasts import services
+from podcast.adapters.cache import ResultCache
+from podcast.adapters.indexes import approximate_size
+from podcast.adapters.paging import Page
+from podcast.adapters.repo_populate import populate
+from path_utils.utils import get_project_root
 
 
 @pytest.fixture
@@ -99,7 +107,17 @@ def test_podcast_to_dict(empty_memory_repo, podcast, author, episode, episode_2)
     assert dict_pod["language"] == "english"
     assert dict_pod["author"] == author
     assert dict_pod["categories"] == "Society & Culture"
-    assert dict_pod["episodes"] == services.episodes_to_dict(episode_list)
+    assert dict_pod["episodes"] == services.episode_summaries_to_dict(episode_list)
+
+
+@pytest.mark.parametrize('columnar_episodes', [False, True])
+def test_podcast_view_episodes_come_from_the_repository(columnar_episodes):
+    repo = MemoryRepository(columnar_episodes=columnar_episodes)
+    populate(get_project_root() / "tests" / "data", repo)
+    podcast_view = services.podcast_id(14, repo)
+    assert [episode["id"] for episode in podcast_view["episodes"]] == [1]
+    page, _ = services.search_podcast_page("mandarian", "title", 1, 10, repo)
+    assert page[0]["episodes"] == podcast_view["episodes"]
 
 
 def test_get_podcast_dicts(empty_memory_repo, podcast, author, podcast_2):
@@ -146,13 +164,13 @@ def test_episode_to_dict(empty_memory_repo, episode, user, podcast):
     assert dict_episode["description"] == "test description"
     assert dict_episode["audio"] == "test audio"
     assert dict_episode["upload_date"] == datetime(2024, 1, 1)
-    assert dict_episode["reviews"] == [{'content': 'very good',
+    assert dict_episode["reviews"] == ({'content': 'very good',
                                           'episode_id': 1,
                                           'podcast_id': podcast.id,
                                           'rating': 10,
                                           'review_id': 1,
                                           'timestamp': datetime(1970, 1, 1, 0, 0),
-                                          'user_name': 'jon'}]
+                                          'user_name': 'jon'},)
 
 
 def test_episodes_to_dict(empty_memory_repo, episode, user, podcast, episode_2):
@@ -162,3 +180,213 @@ def test_episodes_to_dict(empty_memory_repo, episode, user, podcast, episode_2):
     assert episode_dict[1] == services.episode_to_dict(episode_2)
 
 
+def test_get_podcast_summaries(in_memory_repo):
+    podcasts, total, _ = services.get_podcast_summaries({'language': 'English'}, 1, 4, in_memory_repo)
+    assert total == 6
+    assert [podcast.title for podcast in podcasts] == sorted(podcast.title for podcast in podcasts)
+    assert len(podcasts) == 4
+
+    page = services.get_podcast_summaries({'category': 'Comedy', 'language': 'Italian'}, 1, 4, in_memory_repo)
+    assert page == Page([], 0, None)
+
+
+def test_get_facet_counts(in_memory_repo):
+    counts = services.get_facet_counts({'category': 'Comedy'}, in_memory_repo)
+    assert counts['language'] == [('English', 2)]
+    assert ('Comedy', 2) in counts['category']
+
+
+def scan_search(query, filter_by, repo):
+    # The original full-scan implementation of search_podcast, used as a reference.
+    query_lower = query.lower()
+    matching_ids = []
+    for podcast in repo.get_list_of_podcasts():
+        if filter_by == 'title' and query_lower in podcast.title.lower():
+            matching_ids.append(podcast.id)
+        elif filter_by == 'category' and any(query_lower in category.name.lower() for category in podcast.categories):
+            matching_ids.append(podcast.id)
+        elif filter_by == 'author' and query_lower in podcast.author.name.lower():
+            matching_ids.append(podcast.id)
+    return matching_ids
+
+
+@pytest.mark.parametrize(('query', 'filter_by'), (
+        ('radio', 'title'),
+        ('RADIO net', 'title'),
+        ('o', 'title'),
+        ('', 'title'),
+        ('cast', 'title'),
+        ('denny', 'author'),
+        ('e v', 'author'),
+        ('culture', 'category'),
+        ('& c', 'category'),
+        ('radio', 'episodes'),
+))
+def test_search_podcast_matches_substrings(in_memory_repo, query, filter_by):
+    results = services.search_podcast(query, filter_by, in_memory_repo)
+    assert [podcast['id'] for podcast in results] == scan_search(query, filter_by, in_memory_repo)
+
+
+def test_search_podcast_page(in_memory_repo):
+    podcasts, total = services.search_podcast_page('radio', 'title', 1, 2, in_memory_repo)
+    assert total == 3
+    assert [podcast['title'] for podcast in podcasts] == ['Brian Denny Radio', 'D-Hour Radio Network']
+
+    podcasts, total = services.search_podcast_page('radio', 'title', 2, 2, in_memory_repo)
+    assert [podcast['title'] for podcast in podcasts] == ['Onde Road - Radio Popolare']
+
+
+def test_search_finds_added_podcast(empty_memory_repo, podcast, podcast_2):
+    empty_memory_repo.add_podcast(podcast)
+    assert len(services.search_podcast('brian', 'title', empty_memory_repo)) == 0
+    empty_memory_repo.add_podcast(podcast_2)
+    assert [podcast['id'] for podcast in services.search_podcast('brian', 'title', empty_memory_repo)] == [2]
+
+
+def test_search_results_are_lazy(in_memory_repo):
+    results = services.search_podcast('radio', 'title', in_memory_repo)
+    assert results.total == 3
+    assert results.page_count(2) == 2
+    assert [podcast['title'] for podcast in results.page(2, 2)] == ['Onde Road - Radio Popolare']
+    assert results.page(0, 2) == []
+    assert results.page(3, 2) == []
+
+
+def test_search_episode_page(in_memory_repo):
+    episodes, total = services.search_episode_page('moviepass', 1, 10, in_memory_repo)
+    assert total == 1
+    assert episodes[0]['id'] == 1
+    assert episodes[0]['podcast_title'] == 'The Mandarian Orange Show'
+
+    assert services.search_episode_page('moviepass', 2, 10, in_memory_repo) == ([], 1)
+
+
+def test_search_results_are_cached_until_the_repository_changes(empty_memory_repo, podcast, podcast_2, monkeypatch):
+    cache = ResultCache()
+    monkeypatch.setattr(services, 'search_cache', cache)
+    empty_memory_repo.add_podcast(podcast)
+
+    assert services.search_podcast_page('radio', 'title', 1, 10, empty_memory_repo)[1] == 1
+    assert services.search_podcast_page('RADIO', 'title', 1, 10, empty_memory_repo)[1] == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    empty_memory_repo.add_podcast(podcast_2)
+    assert services.search_podcast_page('radio', 'title', 1, 10, empty_memory_repo)[1] == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_result_cache_evicts_least_recently_used_entries():
+    cache = ResultCache(max_bytes=1000)
+    for key in range(100):
+        cache.put(key, (tuple(range(5)), key))
+        cache.get(0)
+    stats = cache.stats()
+    assert stats['bytes'] <= 1000
+    assert stats['evictions'] == 100 - len(cache)
+    # Entry 0 was used after every insert, so it survived.
+    assert cache.get(0) is not None
+    assert cache.get(1) is None
+
+    cache.put('too big', tuple(range(1000)))
+    assert cache.get('too big') is None
+
+
+def test_result_cache_is_shared_safely_between_threads():
+    # Switch threads as often as possible, so they interleave inside get and put.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    cache = ResultCache(max_bytes=2000)
+    values = {key: (tuple(range(key % 7)), key) for key in range(200)}
+    errors = []
+
+    def use_cache(offset):
+        try:
+            for round_number in range(50):
+                for key in range(offset, 200, 4):
+                    cache.put(key, values[key])
+                    cache.get((key + round_number) % 200)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=use_cache, args=(offset,)) for offset in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    cached = [key for key in values if cache.get(key) is not None]
+    assert cache.stats()['bytes'] == sum(approximate_size(key) + approximate_size(values[key]) for key in cached)
+    assert cache.stats()['bytes'] <= 2000
+
+
+def test_podcast_view_is_cached_until_its_reviews_change(in_memory_repo):
+    from podcast.episodes import services as episode_services
+
+    in_memory_repo.add_user(User(99, 'reviewer', 'Password123'))
+    first_view = services.podcast_id(14, in_memory_repo)
+    assert services.podcast_id(14, in_memory_repo) is first_view
+    assert first_view['episodes'][0]['reviews'] == ()
+
+    episode_services.add_review(14, 1, 'Loved it', 'reviewer', 5, in_memory_repo)
+    view = services.podcast_id(14, in_memory_repo)
+    assert view is not first_view
+    assert [review['content'] for review in view['episodes'][0]['reviews']] == ['Loved it']
+    # Other podcasts keep their cached views.
+    assert services.podcast_id(2, in_memory_repo) is services.podcast_id(2, in_memory_repo)
+
+
+def test_podcast_header_reads_no_episodes(in_memory_repo, monkeypatch):
+    view = services.podcast_id(14, in_memory_repo)
+
+    def fail(podcast_id):
+        raise AssertionError('episodes were read')
+
+    monkeypatch.setattr(in_memory_repo, 'get_episodes_for_podcast', fail)
+    header = services.podcast_header(14, in_memory_repo)
+    assert dict(header) == {name: view[name] for name in header}
+    assert 'episodes' not in header
+    assert services.podcast_header(14, in_memory_repo) is header
+
+    # Rebuilt once the Podcast's version changes, like podcast_id's views.
+    from podcast.episodes import services as episode_services
+    in_memory_repo.add_user(User(99, 'reviewer', 'Password123'))
+    episode_services.add_review(14, 1, 'Loved it', 'reviewer', 5, in_memory_repo)
+    assert services.podcast_header(14, in_memory_repo) is not header
+    with pytest.raises(KeyError):
+        services.podcast_header(99, in_memory_repo)
+
+
+def test_podcast_id_raises_for_missing_podcast(empty_memory_repo):
+    with pytest.raises(KeyError):
+        services.podcast_id(1, empty_memory_repo)
+
+
+def test_get_podcast_summaries_without_filters(in_memory_repo):
+    titles = [podcast.title for podcast in in_memory_repo.get_list_of_podcasts()]
+    podcasts, total, _ = services.get_podcast_summaries({}, 2, 3, in_memory_repo)
+    assert [podcast.title for podcast in podcasts] == titles[3:6]
+    assert total == 7
+    assert services.get_podcast_summaries({}, 0, 3, in_memory_repo) == Page([], 7)
+
+
+def test_get_episode_page(in_memory_repo):
+    episodes = services.get_episode_page(14, 1, 6, in_memory_repo)
+    assert episodes.items == (services.episode_summary_to_dict(in_memory_repo.get_episode(1)),)
+    assert (episodes.total, episodes.next_cursor) == (1, None)
+    assert services.get_episode_page(14, 0, 6, in_memory_repo) == Page([], 1)
+
+
+def test_podcast_views_are_read_only(in_memory_repo):
+    view = services.podcast_id(14, in_memory_repo)
+    assert view.title == view['title'] == 'The Mandarian Orange Show'
+    assert dict(view)['episodes'] == view.episodes
+    with pytest.raises(AttributeError):
+        view.title = 'Changed'
+    with pytest.raises(TypeError):
+        view['title'] = 'Changed'
+    assert not hasattr(view, '__dict__')
+    assert view.replace(title='Changed').title == 'Changed'
+    assert view.title == 'The Mandarian Orange Show'
@@ -0,0 +1,87 @@
+import csv
+import shutil
+
+import pytest
+
+from podcast.adapters.repository import new_version
+from podcast.adapters import snapshot
+from podcast.adapters.snapshot import load_memory_repository, read_snapshot, snapshot_key
+from path_utils.utils import get_project_root
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    data_path = tmp_path / "data"
+    shutil.copytree(get_project_root() / "tests" / "data", data_path)
+    return data_path
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    return tmp_path / "snapshots"
+
+
+def test_second_load_comes_from_the_snapshot(data_path, snapshot_dir, capsys):
+    repo = load_memory_repository(data_path, snapshot_dir)
+    assert "wrote snapshot" in capsys.readouterr().out
+    loaded_repo = load_memory_repository(data_path, snapshot_dir)
+    assert "Loaded memory repository snapshot" in capsys.readouterr().out
+    assert loaded_repo is not repo
+    assert loaded_repo.get_number_of_episodes() == repo.get_number_of_episodes()
+    podcast = loaded_repo.get_podcast(1)
+    assert podcast.title == repo.get_podcast(1).title
+    assert podcast.author.podcast_list[0] is podcast
+    assert [episode.podcast for episode in podcast.episodes] == [podcast] * len(podcast.episodes)
+    assert loaded_repo.get_episode(1).description == repo.get_episode(1).description
+    # Versions handed out after loading are newer than any the snapshot holds.
+    assert new_version() > loaded_repo.mutation_version
+
+
+def test_changed_csv_files_are_loaded_again(data_path, snapshot_dir, capsys):
+    number_of_podcasts = load_memory_repository(data_path, snapshot_dir).get_number_of_podcasts()
+    with open(data_path / "podcasts.csv", encoding='utf-8-sig', newline='') as podcasts_file:
+        rows = list(csv.reader(podcasts_file))
+    with open(data_path / "podcasts.csv", 'w', encoding='utf-8', newline='') as podcasts_file:
+        csv.writer(podcasts_file).writerows(rows[:-1])
+    capsys.readouterr()
+    repo = load_memory_repository(data_path, snapshot_dir)
+    assert "wrote snapshot" in capsys.readouterr().out
+    assert repo.get_number_of_podcasts() == number_of_podcasts - 1
+
+
+def test_snapshots_are_kept_per_options(data_path, snapshot_dir, capsys):
+    load_memory_repository(data_path, snapshot_dir)
+    capsys.readouterr()
+    repo = load_memory_repository(data_path, snapshot_dir, columnar_episodes=True, lazy_descriptions=True)
+    assert "wrote snapshot" in capsys.readouterr().out
+    assert read_snapshot(snapshot_dir / "memory_repository.snapshot",
+                         snapshot_key(data_path, {'columnar_episodes': True, 'lazy_descriptions': True}))
+    loaded_repo = load_memory_repository(data_path, snapshot_dir, columnar_episodes=True, lazy_descriptions=True)
+    assert "Loaded memory repository snapshot" in capsys.readouterr().out
+    assert loaded_repo.get_episode(1).description == repo.get_episode(1).description
+
+
+def test_unreadable_snapshots_are_ignored(data_path, snapshot_dir, capsys):
+    snapshot_dir.mkdir()
+    (snapshot_dir / "memory_repository.snapshot").write_bytes(b"PODSNAP\nnot a pickle")
+    repo = load_memory_repository(data_path, snapshot_dir)
+    output = capsys.readouterr().out
+    assert "Ignoring memory repository snapshot" in output and "wrote snapshot" in output
+    assert repo.get_number_of_episodes() > 0
+    assert list(snapshot_dir.iterdir()) == [snapshot_dir / "memory_repository.snapshot"]
+
+
+def test_snapshots_of_other_code_are_not_used(data_path, snapshot_dir, capsys, monkeypatch):
+    load_memory_repository(data_path, snapshot_dir)
+    capsys.readouterr()
+    monkeypatch.setattr(snapshot, "code_hash", lambda: "changed code")
+    load_memory_repository(data_path, snapshot_dir)
+    assert "wrote snapshot" in capsys.readouterr().out
+    load_memory_repository(data_path, snapshot_dir)
+    assert "Loaded memory repository snapshot" in capsys.readouterr().out
+
+
+def test_code_hash_covers_the_model_and_adapters():
+    packages = {package.name for package in snapshot.CODE_PACKAGES}
+    assert packages == {"adapters", "domainmodel"}
+    assert snapshot.code_hash() == snapshot.code_hash()